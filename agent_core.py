@@ -1,11 +1,18 @@
 import json
-from typing import Dict, Any
+import os
+from typing import TYPE_CHECKING, Dict, Any, Tuple
 from datetime import datetime, timedelta
-from agents import Agent, WebSearchTool, function_tool
 import re
-import dateparser
-from models.models import FlightQueryRequest
-from openai import OpenAI
+import metrics
+from airports import get_airport_index
+from gazetteer import get_gazetteer
+from date_resolver import DATE_TEXT_PATTERN, resolve_date
+from stages import stage
+
+# The agents SDK, openai and pydantic models are heavy; they are imported on
+# first use so the extractors stay cheap to import (see startup.py).
+if TYPE_CHECKING:
+    from agents import Agent
 
 VALID_CLASS_CODES = {"1A", "2A", "3A", "SL", "CC", "2S", "SLEEPER"}
 PHRASE_TO_CLASS = {
@@ -17,175 +24,294 @@ PHRASE_TO_CLASS = {
     "second sitting": "2S"
 }
 
-@function_tool
-def extract_train_travel_info_from_prompt(query: str) -> Dict[str, Any]:
+FLIGHT_KEYWORDS = ("flight", "fly", "flying", "airfare", "aeroplane", "airplane", "airport", "airline")
+TRAIN_KEYWORDS = ("train", "rail", "railway", "irctc", "sleeper", "berth")
+CHARS_PER_TOKEN = 4  # rough estimate used for prompt-size reporting
+
+# "business"/"first" alone are too ambiguous ("business trip", "first flight") to
+# resolve, except "in business" ending the query; elsewhere they send it to the agent
+CABIN_PATTERN = re.compile(
+    r'\b(?:(premium economy|economy)|(business|first)\s+(?:class|cabin)|in\s+(business)(?![\s-]+\w))\b'
+)
+CABIN_CUES = re.compile(r'\b(class|cabin|business|first)\b')
+FLIGHT_EXTRACTION_MODEL = os.getenv("FLIGHT_EXTRACTION_MODEL", "gpt-4o-mini")
+FLIGHT_EXTRACTION_PROMPT = """
+Extract flight search fields from the prompt and return only this JSON object:
+{"source": "<city>", "destination": "<city>", "date": "<YYYY-MM-DD>", "cabin_class": "economy|business|first"}
+Use "" for a missing city, "economy" when no cabin is given, and tomorrow when no date is given.
+"""
+
+FROM_PATTERN = re.compile(r'from\s+([a-zA-Z\s]+?)\s+to')
+TO_PATTERN = re.compile(r'to\s+([a-zA-Z\s]+?)(?:\s+in|\s+on|\s+for|$)')
+BETWEEN_PATTERN = re.compile(r'between\s+([a-zA-Z\s]+?)\s+and\s+([a-zA-Z\s]+)')
+CLASS_PATTERN = re.compile(r'\b(1A|2A|3A|SL|CC|2S|sleeper)\b', re.IGNORECASE)
+DATE_PATTERN = re.compile(r'\bon\s+([a-zA-Z0-9,\s/.-]+)')
+# Date phrases the local rules do not resolve ("in November", "first week of
+# November", "in 3 days", "next month"); bare "may" is too common a word to count
+DATE_CUES = re.compile(
+    r'\b(?:jan(?:uary)?|feb(?:ruary)?|mar(?:ch)?|apr(?:il)?|june?|july?|aug(?:ust)?|sept?(?:ember)?'
+    r'|oct(?:ober)?|nov(?:ember)?|dec(?:ember)?|\d{1,2}(?:st|nd|rd|th)?\s+may|may\s+\d{1,2}'
+    r'|in\s+\d+\s+days?|(?:next|this|coming)\s+month)\b'
+)
+
+def _free_text_route(query_lower: str) -> Tuple[str, str]:
+    """Regex fallback for places the gazetteer does not know."""
+    between_match = BETWEEN_PATTERN.search(query_lower)
+    if between_match:
+        return between_match.group(1).strip().title(), between_match.group(2).strip().title()
+    from_match = FROM_PATTERN.search(query_lower)
+    to_match = TO_PATTERN.search(query_lower)
+    return (
+        from_match.group(1).strip().title() if from_match else "",
+        to_match.group(1).strip().title() if to_match else "",
+    )
+
+def _resolve_travel_date(query_lower: str) -> Tuple[str, bool, bool]:
+    """(date, whether a date phrase was present, whether it parsed).
+
+    Tomorrow is assumed only when the query has no date text at all.
+    """
+    date_match = DATE_PATTERN.search(query_lower)
+    text_match = DATE_TEXT_PATTERN.search(query_lower)
+    for match in (date_match, text_match):
+        resolved = resolve_date(match.group(1)) if match else None
+        if resolved:
+            return resolved, True, True
+    date_cue = bool(date_match or text_match or DATE_CUES.search(query_lower))
+    return (datetime.now() + timedelta(days=1)).strftime("%Y-%m-%d"), date_cue, False
+
+def resolve_train_travel_info(query: str) -> Tuple[Dict[str, Any], Dict[str, bool]]:
+    """Extract train parameters and report which of them the query actually resolved."""
     source = ""
     destination = ""
     travel_class = "3A"
-    travel_date = (datetime.now() + timedelta(days=1)).strftime("%Y-%m-%d")
 
     query_lower = query.lower()
 
-    from_match = re.search(r'from\s+([a-zA-Z\s]+?)\s+to', query_lower)
-    to_match = re.search(r'to\s+([a-zA-Z\s]+?)(?:\s+in|\s+on|\s+for|$)', query_lower)
-    between_match = re.search(r'between\s+([a-zA-Z\s]+?)\s+and\s+([a-zA-Z\s]+)', query_lower)
-    class_match = re.search(r'(1A|2A|3A|SL|CC|2S|sleeper)', query_lower)
-    date_match = re.search(r'on\s+([a-zA-Z0-9,\s]+)', query_lower)
+    # One pass over the compiled gazetteer finds known stations and their roles
+    source_match, destination_match = get_gazetteer().resolve_route(query)
+    if source_match is None or destination_match is None:
+        source, destination = _free_text_route(query_lower)
+    if source_match is not None:
+        source = source_match.place.city
+    if destination_match is not None:
+        destination = destination_match.place.city
 
-    if between_match:
-        source = between_match.group(1).strip().title()
-        destination = between_match.group(2).strip().title()
-    else:
-        if from_match:
-            source = from_match.group(1).strip().title()
-        if to_match:
-            destination = to_match.group(1).strip().title()
+    class_match = CLASS_PATTERN.search(query_lower)
 
+    class_explicit = False
     for phrase, code in PHRASE_TO_CLASS.items():
         if phrase in query_lower:
             travel_class = code
+            class_explicit = True
             break
 
     if class_match:
         match = class_match.group(1).upper()
         if match in VALID_CLASS_CODES:
             travel_class = "SL" if match == "SLEEPER" else match
+            class_explicit = True
 
-    if date_match:
-        parsed = dateparser.parse(date_match.group(1))
-        if parsed:
-            travel_date = parsed.strftime("%Y-%m-%d")
+    travel_date, date_cue, date_parsed = _resolve_travel_date(query_lower)
 
-    return {
+    info = {
         "source": source,
         "destination": destination,
         "date": travel_date,
-        "class": travel_class
+        "class": travel_class,
+        "source_code": source_match.place.code if source_match else "",
+        "destination_code": destination_match.place.code if destination_match else "",
+    }
+    resolution = {
+        "source_known": source_match is not None,
+        "destination_known": destination_match is not None,
+        "class_explicit": class_explicit,
+        "date_cue": date_cue,
+        "date_parsed": date_parsed,
     }
+    return info, resolution
 
-@function_tool
-def extract_flight_info_from_prompt(prompt: str) -> FlightQueryRequest:
-    system_prompt = """
-You are a flight data analyser.
-
-🚨 YOUR ONLY TASK: Extract the following fields from the user query/prompt and return a JSON object in EXACTLY this format:
-{
-  "source": "<source>",
-  "destination": "<destination>",
-  "date": "<YYYY-MM-DD>",
-  "cabin_class": "Economy|Business|First"
-}
+def extract_train_travel_info(query: str) -> Dict[str, Any]:
+    with stage("extraction"):
+        return resolve_train_travel_info(query)[0]
 
-RULES:
-- ❌ DO NOT write prose, explanations, links, or commentary.
-- ❌ DO NOT include markdown, formatting, or headings.
-- ✅ ONLY return raw JSON.
-- ✅ If a field is missing, leave it as an empty string: "".
-- ✅ Default cabin_class to "Economy" if missing.
-- ✅ Default date to tomorrow (YYYY-MM-DD format) if missing.
-- 🎯 Output MUST be valid JSON, with double quotes around all keys and values.
-- ⚠️ DO NOT mix natural language with the JSON. Just the JSON output. Nothing else.
-
-Examples:
-Prompt: "I want to fly to Mumbai tomorrow in business class."
-Response:
-{
-  "source": "",
-  "destination": "Mumbai",
-  "date": "2025-04-15",
-  "cabin_class": "Business"
-}
+def extract_train_travel_info_from_prompt(query: str) -> Dict[str, Any]:
+    return extract_train_travel_info(query)
 
-Prompt: "Flights from Chennai to Delhi"
-Response:
-{
-  "source": "Chennai",
-  "destination": "Delhi",
-  "date": "2025-04-15",
-  "cabin_class": "Economy"
-}
-"""
+def resolve_flight_info(query: str) -> Tuple[Dict[str, Any], Dict[str, bool]]:
+    """Extract flight parameters from the airport index and the cabin/date rules."""
+    query_lower = query.lower()
+
+    source_match, destination_match = get_airport_index().resolve_route(query)
+    source, destination = "", ""
+    if source_match is None or destination_match is None:
+        source, destination = _free_text_route(query_lower)
+    if source_match is not None:
+        source = source_match.place.city
+    if destination_match is not None:
+        destination = destination_match.place.city
+
+    cabin_class = "economy"
+    cabin_match = CABIN_PATTERN.search(query_lower)
+    if cabin_match:
+        cabin_class = next(group for group in cabin_match.groups() if group)
+        cabin_class = "economy" if cabin_class == "premium economy" else cabin_class
+
+    travel_date, date_cue, date_parsed = _resolve_travel_date(query_lower)
+
+    info = {
+        "source": source,
+        "destination": destination,
+        "date": travel_date,
+        "cabin_class": cabin_class,
+        "source_code": source_match.place.code if source_match else "",
+        "destination_code": destination_match.place.code if destination_match else "",
+    }
+    resolution = {
+        "source_known": source_match is not None,
+        "destination_known": destination_match is not None,
+        "cabin_explicit": cabin_match is not None,
+        "cabin_cue": bool(CABIN_CUES.search(query_lower)),
+        "date_cue": date_cue,
+        "date_parsed": date_parsed,
+    }
+    return info, resolution
 
-    response = OpenAI.chat.completions.create(
-        model="gpt-4",
-        messages=[
-            {"role": "system", "content": system_prompt.strip()},
-            {"role": "user", "content": f"Prompt: {prompt.strip()}"}
-        ],
-        temperature=0,
+def flight_info_complete(info: Dict[str, Any], resolution: Dict[str, bool]) -> bool:
+    """True when every field came from the index or a rule, so no model call is needed."""
+    return (
+        resolution["source_known"]
+        and resolution["destination_known"]
+        and info["source"] != info["destination"]
+        and (resolution["date_parsed"] or not resolution["date_cue"])
+        and (resolution["cabin_explicit"] or not resolution["cabin_cue"])
     )
 
-    parsed = json.loads(response.choices[0].message.content)
-    return FlightQueryRequest(**parsed)
+async def extract_flight_info_from_prompt(prompt: str) -> Dict[str, Any]:
+    """Extract flight details locally; only prompts the rules cannot resolve go to the model."""
+    from models.models import FlightQueryRequest
 
-def create_agent() -> Agent:
-    return Agent(
-        name="Transport Booking Assistant",
-        instructions="""
-You are a transport booking assistant specializing in Indian travel.
-
-1. If the prompt includes terms related to trains (e.g., "train", "IRCTC", "railway"), use the `extract_train_travel_info` tool to extract details.
-2. If the prompt includes terms related to flights (e.g., "fly", "flight", "airfare", "aeroplane"), use the `extract_flight_info` tool instead.
-
-Then, use the WebSearchTool to fetch real-time availability from Goibibo for trains.
-https://www.goibibo.com/trains/
-
-Use web search to find flight availability from makemytrip.com for flights.
-
-3. If the prompt includes both trains and flights, prioritize the train information.
-4. Always return valid JSON with the following structure:
-5. If no availability is found, you must still return a valid JSON object with empty `trains` or `flights` list, instead of plain text explanation.
-e.g:{
-  "source": "Delhi",
-  "destination": "Leh",
-  "date": "2025-04-17",
-  "class": "3A",
-  "trains": []
-}
+    with stage("extraction"):
+        info, resolution = resolve_flight_info(prompt)
+    if flight_info_complete(info, resolution):
+        metrics.inc("flight_extractions_total", source="local")
+    else:
+        info = await _extract_flight_info_with_model(prompt, info, resolution)
+    return FlightQueryRequest.model_validate(info).model_dump()
 
+async def _extract_flight_info_with_model(
+    prompt: str, info: Dict[str, Any], resolution: Dict[str, bool]
+) -> Dict[str, Any]:
+    """Ask the model for the fields the rules left unresolved; keep the local ones on failure."""
+    from openai import OpenAIError
+    from agent_registry import get_openai_client
 
-Expected JSON response from Websearchtool for trains:
-{
-  "source": "<city>",
-  "destination": "<city>",
-  "date": "<YYYY-MM-DD>",
-  "class": "<1A|2A|3A|SL|CC|2S>",
-  "trains": [
-    {
-      "train_number": "12951",
-      "train_name": "Mumbai Rajdhani",
-      "departure": "16:25",
-      "arrival": "08:15",
-      "duration": "15h 50m",
-      "availability": "Available 42",
-      "fare": 1985
-    }
-  ]
-}
+    try:
+        with stage("model_extraction"):
+            response = await get_openai_client().chat.completions.create(
+                model=FLIGHT_EXTRACTION_MODEL,
+                messages=[
+                    {"role": "system", "content": FLIGHT_EXTRACTION_PROMPT.strip()},
+                    {"role": "user", "content": f"Prompt: {prompt.strip()}"},
+                ],
+                temperature=0,
+                response_format={"type": "json_object"},
+            )
+        parsed = json.loads(response.choices[0].message.content or "{}")
+    except (OpenAIError, json.JSONDecodeError) as e:
+        print("⚠️ Flight extraction fell back to local rules:", e)
+        metrics.inc("flight_extractions_total", source="local_fallback")
+        return info
 
-Expected JSON response for flights:
-{
-  "source": "<source>",
-  "destination": "<destination>",
-  "date": "<YYYY-MM-DD>",
-  "cabin_class": "Economy|Business|First",
-  "flights": [
-    {
-      "flight_number": "AI202",
-      "departure": "2023-10-01T10:00:00",
-      "arrival": "2023-10-01T12:30:00",
-      "duration": "2h 30m",
-      "availability": "Available 5",
-      "fare": 5000
+    metrics.inc("flight_extractions_total", source="model")
+    trusted = {
+        "source": resolution["source_known"],
+        "destination": resolution["destination_known"],
+        "date": resolution["date_parsed"],
+        "cabin_class": resolution["cabin_explicit"],
     }
-  ]
-}
+    merged = dict(info)
+    for field, keep_local in trusted.items():
+        value = parsed.get(field) if isinstance(parsed, dict) else None
+        if not keep_local and isinstance(value, str) and value.strip():
+            merged[field] = value.strip()
+    return merged
+
+# -------------------------------
+# Mode-specific agents
+# -------------------------------
+# The router picks one of these per query, so each request carries only
+# its own short prompt and tools. Train parameters are resolved locally
+# and passed in the input, so the train agent goes straight to search.
+
+TRAIN_INSTRUCTIONS = """
+You look up Indian train availability.
+The input gives the request and its resolved source, destination, date (YYYY-MM-DD) and class.
+Use web search on https://www.goibibo.com/trains/ for that route and date, and return every train found.
+Fill in any missing field from the request. Use "Unknown" for unknown availability and 0 for unknown fares.
+If no train runs, return an empty trains list.
+"""
+
+FLIGHT_INSTRUCTIONS = """
+You look up flight availability in India.
+If the input has no Resolved line, call `extract_flight_info_from_prompt` with the request first.
+Use web search on makemytrip.com for that route, date and cabin class, and return every flight found.
+Use "Unknown" for unknown availability. If there are no flights, return an empty flights list.
+"""
+
+
+def create_train_agent() -> "Agent":
+    from agents import Agent, WebSearchTool
+    from models.models import TrainAvailability
+
+    return Agent(
+        name="Train Availability Assistant",
+        instructions=TRAIN_INSTRUCTIONS.strip(),
+        tools=[WebSearchTool()],
+        output_type=TrainAvailability,
+    )
+
 
-Always return valid JSON only. No markdown, no plain text, no extra commentary.
-""",
-        tools=[
-            extract_train_travel_info_from_prompt,
-            extract_flight_info_from_prompt,
-            WebSearchTool()
-        ]
+def create_flight_agent() -> "Agent":
+    from agents import Agent, WebSearchTool, function_tool
+    from models.models import FlightAvailability
+
+    return Agent(
+        name="Flight Availability Assistant",
+        instructions=FLIGHT_INSTRUCTIONS.strip(),
+        tools=[function_tool(extract_flight_info_from_prompt), WebSearchTool()],
+        output_type=FlightAvailability,
     )
+
+
+def _resolved_input(query: str, info: Dict[str, Any], fields: Tuple[str, ...]) -> str:
+    resolved = {key: info[key] for key in fields}
+    return f"Request: {query.strip()}\nResolved: {json.dumps(resolved)}"
+
+
+def train_agent_input(query: str, info: Dict[str, Any]) -> str:
+    return _resolved_input(query, info, ("source", "destination", "date", "class"))
+
+
+def flight_agent_input(query: str, info: Dict[str, Any]) -> str:
+    return _resolved_input(query, info, ("source", "destination", "date", "cabin_class"))
+
+
+def prompt_size(agent: "Agent", agent_input: str) -> Dict[str, int]:
+    """Characters sent per model turn for instructions, tool schemas and input, plus a token estimate."""
+    from agents import FunctionTool
+
+    tool_chars = 0
+    for tool in agent.tools:
+        if isinstance(tool, FunctionTool):
+            tool_chars += len(tool.name) + len(tool.description or "") + len(json.dumps(tool.params_json_schema))
+        else:
+            tool_chars += len(tool.name)
+    instruction_chars = len(agent.instructions) if isinstance(agent.instructions, str) else 0
+    total = instruction_chars + tool_chars + len(agent_input)
+    return {
+        "instruction_chars": instruction_chars,
+        "tool_chars": tool_chars,
+        "input_chars": len(agent_input),
+        "estimated_tokens": total // CHARS_PER_TOKEN,
+    }
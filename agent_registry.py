@@ -0,0 +1,107 @@
+import asyncio
+import os
+from typing import TYPE_CHECKING, Callable, Dict, Optional
+
+if TYPE_CHECKING:
+    from agents import Agent, RunConfig
+    from openai import AsyncOpenAI
+
+# -------------------------------
+# Process-wide Agent / client registry
+# -------------------------------
+# Agents (and their tool schemas) are built once per process, and every run
+# shares one AsyncOpenAI client backed by a tuned keep-alive connection pool.
+# Pooled connections belong to the event loop that opened them, so each new
+# loop (every asyncio.run in chat, batch or tests) gets a fresh client.
+
+MAX_CONNECTIONS = int(os.getenv("OPENAI_MAX_CONNECTIONS", "100"))
+MAX_KEEPALIVE_CONNECTIONS = int(os.getenv("OPENAI_MAX_KEEPALIVE_CONNECTIONS", "20"))
+KEEPALIVE_EXPIRY = float(os.getenv("OPENAI_KEEPALIVE_EXPIRY", "30"))
+REQUEST_TIMEOUT = float(os.getenv("OPENAI_REQUEST_TIMEOUT", "60"))
+
+_agents: Dict[str, "Agent"] = {}
+_client: Optional["AsyncOpenAI"] = None
+_client_loop: Optional[asyncio.AbstractEventLoop] = None
+_run_config: Optional["RunConfig"] = None
+_run_config_client: Optional["AsyncOpenAI"] = None   # the client a default RunConfig was built on
+
+
+def get_agent(name: str, factory: Callable[[], "Agent"]) -> "Agent":
+    """Return the agent registered under `name`, building it with `factory` on first use."""
+    agent = _agents.get(name)
+    if agent is None:
+        agent = _agents[name] = factory()
+    return agent
+
+
+def _running_loop() -> Optional[asyncio.AbstractEventLoop]:
+    try:
+        return asyncio.get_running_loop()
+    except RuntimeError:
+        return None
+
+
+def get_openai_client() -> "AsyncOpenAI":
+    """Return the shared AsyncOpenAI client for the running event loop, creating it (and its pool) on first use."""
+    global _client, _client_loop
+    loop = _running_loop()
+    if _client is not None and None not in (loop, _client_loop) and loop is not _client_loop:
+        # Keep-alive connections of an earlier (closed) loop cannot be used from this one
+        _client = None
+    if _client is None:
+        import openai
+        from agents import set_default_openai_client
+        from openai import AsyncOpenAI, DefaultAsyncHttpxClient
+
+        # Pool and timeout types come from openai itself: its transport need not be the installed httpx
+        limits_type = type(openai.DEFAULT_CONNECTION_LIMITS)
+        http_client = DefaultAsyncHttpxClient(
+            limits=limits_type(
+                max_connections=MAX_CONNECTIONS,
+                max_keepalive_connections=MAX_KEEPALIVE_CONNECTIONS,
+                keepalive_expiry=KEEPALIVE_EXPIRY,
+            ),
+            timeout=openai.Timeout(REQUEST_TIMEOUT, connect=10.0),
+        )
+        _client = AsyncOpenAI(http_client=http_client)
+        _client_loop = loop
+        set_default_openai_client(_client)
+    elif _client_loop is None:
+        _client_loop = loop
+    return _client
+
+
+def get_run_config() -> "RunConfig":
+    """Return a RunConfig whose model provider reuses the shared client."""
+    global _run_config, _run_config_client
+    if _run_config_client is not None and _run_config_client is not get_openai_client():
+        _run_config = None  # built on an earlier event loop's client
+    if _run_config is None:
+        from agents import RunConfig
+        from agents.models.openai_provider import OpenAIProvider
+
+        import metrics
+
+        _run_config_client = get_openai_client()
+        provider = OpenAIProvider(openai_client=_run_config_client)
+        if metrics.enabled():
+            provider = metrics.instrument_model_provider(provider)
+        _run_config = RunConfig(model_provider=provider)
+    return _run_config
+
+
+def set_run_config(run_config: Optional["RunConfig"]) -> None:
+    """Replace the shared RunConfig, e.g. with a fake model provider; None restores the default."""
+    global _run_config, _run_config_client
+    _run_config = run_config
+    _run_config_client = None
+
+
+async def shutdown() -> None:
+    """Close the pooled connections and drop every cached agent."""
+    global _client, _client_loop, _run_config, _run_config_client
+    if _client is not None and _client_loop in (None, _running_loop()):
+        await _client.close()
+    _client = _client_loop = None
+    _run_config = _run_config_client = None
+    _agents.clear()
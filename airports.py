@@ -0,0 +1,68 @@
+from typing import List, Optional, Tuple
+
+from gazetteer import Gazetteer
+
+# -------------------------------
+# Airport / IATA index
+# -------------------------------
+# Same shape as the station gazetteer (code, city, name, aliases), so the
+# same Aho-Corasick matcher and source/destination cue rules apply. IATA
+# codes only match when written in capitals ("BOM", not "bom").
+
+AIRPORTS: List[Tuple[str, str, str, Tuple[str, ...]]] = [
+    ("DEL", "Delhi", "Indira Gandhi International", ("delhi", "new delhi", "dilli", "igi")),
+    ("BOM", "Mumbai", "Chhatrapati Shivaji Maharaj International", ("mumbai", "bombay")),
+    ("BLR", "Bangalore", "Kempegowda International", ("bangalore", "bengaluru", "kempegowda")),
+    ("MAA", "Chennai", "Chennai International", ("chennai", "madras")),
+    ("CCU", "Kolkata", "Netaji Subhas Chandra Bose International", ("kolkata", "calcutta")),
+    ("HYD", "Hyderabad", "Rajiv Gandhi International", ("hyderabad", "secunderabad", "shamshabad")),
+    ("PNQ", "Pune", "Pune", ("pune", "poona")),
+    ("AMD", "Ahmedabad", "Sardar Vallabhbhai Patel International", ("ahmedabad", "amdavad")),
+    ("JAI", "Jaipur", "Jaipur International", ("jaipur",)),
+    ("LKO", "Lucknow", "Chaudhary Charan Singh International", ("lucknow",)),
+    ("VNS", "Varanasi", "Lal Bahadur Shastri International", ("varanasi", "benaras", "banaras", "kashi")),
+    ("PAT", "Patna", "Jay Prakash Narayan", ("patna",)),
+    ("BBI", "Bhubaneswar", "Biju Patnaik International", ("bhubaneswar", "bhubaneshwar")),
+    ("TRV", "Thiruvananthapuram", "Trivandrum International", ("thiruvananthapuram", "trivandrum")),
+    ("COK", "Kochi", "Cochin International", ("kochi", "cochin", "ernakulam")),
+    ("GOI", "Goa", "Dabolim", ("goa", "dabolim")),
+    ("GOX", "Goa", "Manohar International", ("mopa", "north goa")),
+    ("IXC", "Chandigarh", "Chandigarh", ("chandigarh",)),
+    ("IXJ", "Jammu", "Jammu", ("jammu",)),
+    ("SXR", "Srinagar", "Sheikh ul-Alam International", ("srinagar", "kashmir")),
+    ("IXL", "Leh", "Kushok Bakula Rimpochee", ("leh", "ladakh")),
+    ("GAU", "Guwahati", "Lokpriya Gopinath Bordoloi International", ("guwahati", "gauhati")),
+    ("IXB", "Bagdogra", "Bagdogra", ("bagdogra", "siliguri", "darjeeling")),
+    ("BHO", "Bhopal", "Raja Bhoj", ("bhopal",)),
+    ("NAG", "Nagpur", "Dr. Babasaheb Ambedkar International", ("nagpur",)),
+    ("IDR", "Indore", "Devi Ahilya Bai Holkar", ("indore",)),
+    ("RPR", "Raipur", "Swami Vivekananda", ("raipur",)),
+    ("IXR", "Ranchi", "Birsa Munda", ("ranchi",)),
+    ("AGR", "Agra", "Agra", ("agra",)),
+    ("KNU", "Kanpur", "Kanpur", ("kanpur",)),
+    ("IXD", "Prayagraj", "Prayagraj", ("prayagraj", "allahabad")),
+    ("MYQ", "Mysore", "Mysore", ("mysore", "mysuru")),
+    ("IXE", "Mangalore", "Mangalore International", ("mangalore", "mangaluru")),
+    ("CJB", "Coimbatore", "Coimbatore International", ("coimbatore",)),
+    ("IXM", "Madurai", "Madurai", ("madurai",)),
+    ("CCJ", "Kozhikode", "Calicut International", ("kozhikode", "calicut")),
+    ("VTZ", "Visakhapatnam", "Visakhapatnam", ("visakhapatnam", "vizag")),
+    ("VGA", "Vijayawada", "Vijayawada", ("vijayawada",)),
+    ("UDR", "Udaipur", "Maharana Pratap", ("udaipur",)),
+    ("JDH", "Jodhpur", "Jodhpur", ("jodhpur",)),
+    ("ATQ", "Amritsar", "Sri Guru Ram Dass Jee International", ("amritsar",)),
+    ("DED", "Dehradun", "Jolly Grant", ("dehradun", "rishikesh", "haridwar")),
+    ("KUU", "Manali", "Kullu-Manali", ("manali", "kullu", "bhuntar")),
+    ("IXZ", "Port Blair", "Veer Savarkar International", ("port blair", "andaman")),
+]
+
+
+_airport_index: Optional[Gazetteer] = None
+
+
+def get_airport_index() -> Gazetteer:
+    """Return the process-wide airport index, compiling it on first use."""
+    global _airport_index
+    if _airport_index is None:
+        _airport_index = Gazetteer(AIRPORTS)
+    return _airport_index
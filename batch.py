@@ -0,0 +1,206 @@
+import argparse
+import asyncio
+import json
+import sys
+import time
+from typing import Any, Awaitable, Callable, Dict, IO, Iterable, Optional, Tuple
+
+from deadlines import budget_scope
+
+# -------------------------------
+# Concurrent batch mode
+# -------------------------------
+# Streams queries from JSONL (file or stdin), runs them through railway_agent
+# under a semaphore and an RPM/TPM limiter, and writes JSONL results as they
+# finish (or in input order with --ordered).
+
+AgentFn = Callable[[str], Awaitable[Dict[str, Any]]]
+
+DEFAULT_CONCURRENCY = 8
+DEFAULT_TOKENS_PER_REQUEST = 1500
+
+
+class RateLimiter:
+    """Token-bucket limiter for requests-per-minute and tokens-per-minute."""
+
+    def __init__(
+        self,
+        requests_per_minute: Optional[float] = None,
+        tokens_per_minute: Optional[float] = None,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        self.rpm = requests_per_minute
+        self.tpm = tokens_per_minute
+        self.clock = clock
+        self._request_budget = float(requests_per_minute or 0)
+        self._token_budget = float(tokens_per_minute or 0)
+        self._updated = clock()
+        self._lock = asyncio.Lock()
+
+    def _refill(self) -> None:
+        now = self.clock()
+        elapsed = now - self._updated
+        self._updated = now
+        if self.rpm:
+            self._request_budget = min(self.rpm, self._request_budget + elapsed * self.rpm / 60)
+        if self.tpm:
+            self._token_budget = min(self.tpm, self._token_budget + elapsed * self.tpm / 60)
+
+    def _wait_time(self, tokens: int) -> float:
+        wait = 0.0
+        if self.rpm and self._request_budget < 1:
+            wait = max(wait, (1 - self._request_budget) * 60 / self.rpm)
+        if self.tpm:
+            needed = min(tokens, self.tpm)
+            if self._token_budget < needed:
+                wait = max(wait, (needed - self._token_budget) * 60 / self.tpm)
+        return wait
+
+    async def acquire(self, tokens: int = 0) -> None:
+        if not self.rpm and not self.tpm:
+            return
+        async with self._lock:
+            while True:
+                self._refill()
+                wait = self._wait_time(tokens)
+                if wait <= 0:
+                    break
+                await asyncio.sleep(wait)
+            if self.rpm:
+                self._request_budget -= 1
+            if self.tpm:
+                self._token_budget -= min(tokens, self.tpm)
+
+
+def parse_query_line(line: str, index: int) -> Optional[Tuple[str, str]]:
+    """Return (id, query) for a JSONL line, or None for blank lines.
+
+    Accepts {"query": ...} / {"prompt": ...} objects, backlog-style
+    {"request_id", "title", "body"} objects, or a bare JSON string.
+    """
+    line = line.strip()
+    if not line:
+        return None
+    record = json.loads(line)
+    if isinstance(record, str):
+        return str(index), record
+    if not isinstance(record, dict):
+        raise ValueError(f"Line {index + 1}: expected an object or string")
+    query = record.get("query") or record.get("prompt") or record.get("body") or record.get("title")
+    if not query:
+        raise ValueError(f"Line {index + 1} has no query field")
+    record_id = record.get("id") or record.get("request_id") or index
+    return str(record_id), query
+
+
+async def run_batch(
+    lines: Iterable[str],
+    agent_fn: AgentFn,
+    out: IO[str],
+    concurrency: int = DEFAULT_CONCURRENCY,
+    limiter: Optional[RateLimiter] = None,
+    ordered: bool = False,
+    tokens_per_request: int = DEFAULT_TOKENS_PER_REQUEST,
+) -> Dict[str, int]:
+    """Run every query from `lines` through `agent_fn`, writing one JSONL result per query."""
+    semaphore = asyncio.Semaphore(concurrency)
+    limiter = limiter or RateLimiter()
+    pending: Dict[int, Dict[str, Any]] = {}
+    next_to_write = 0
+    summary = {"total": 0, "ok": 0, "failed": 0}
+    tasks = set()
+
+    def write(record: Dict[str, Any]) -> None:
+        out.write(json.dumps(record, ensure_ascii=False) + "\n")
+        out.flush()
+
+    def emit(index: int, record: Dict[str, Any]) -> None:
+        nonlocal next_to_write
+        if not ordered:
+            write(record)
+            return
+        pending[index] = record
+        while next_to_write in pending:
+            write(pending.pop(next_to_write))
+            next_to_write += 1
+
+    async def worker(index: int, record_id: str, query: str) -> None:
+        started = time.perf_counter()
+        try:
+            await limiter.acquire(tokens_per_request)
+            with budget_scope("batch"):
+                response = await agent_fn(query)
+            record = {"id": record_id, "query": query, "response": response}
+            summary["ok"] += 1
+        except Exception as e:
+            record = {"id": record_id, "query": query, "error": f"{type(e).__name__}: {e}"}
+            summary["failed"] += 1
+        finally:
+            semaphore.release()
+        record["elapsed_ms"] = round((time.perf_counter() - started) * 1000, 1)
+        emit(index, record)
+
+    index = 0
+    line_number = -1
+    iterator = iter(lines)
+    while True:
+        # Read off the event loop so a slow stdin producer never stalls running queries
+        line = await asyncio.to_thread(next, iterator, None)
+        if line is None:
+            break
+        line_number += 1
+        try:
+            parsed = parse_query_line(line, line_number)
+        except (json.JSONDecodeError, ValueError) as e:
+            parsed = None
+            emit(index, {"id": str(line_number), "error": f"Invalid input line: {e}"})
+            summary["failed"] += 1
+            summary["total"] += 1
+            index += 1
+        if parsed is None:
+            continue
+        # Acquire before spawning so a huge input never queues unbounded tasks
+        await semaphore.acquire()
+        task = asyncio.create_task(worker(index, *parsed))
+        tasks.add(task)
+        task.add_done_callback(tasks.discard)
+        summary["total"] += 1
+        index += 1
+
+    if tasks:
+        await asyncio.gather(*tasks)
+    return summary
+
+
+def add_batch_arguments(parser: argparse.ArgumentParser) -> None:
+    parser.add_argument("input", nargs="?", default="-", help="JSONL file of queries ('-' for stdin)")
+    parser.add_argument("-o", "--output", default="-", help="JSONL output file ('-' for stdout)")
+    parser.add_argument("-c", "--concurrency", type=int, default=DEFAULT_CONCURRENCY)
+    parser.add_argument("--rpm", type=float, default=None, help="Max requests per minute")
+    parser.add_argument("--tpm", type=float, default=None, help="Max tokens per minute")
+    parser.add_argument("--tokens-per-request", type=int, default=DEFAULT_TOKENS_PER_REQUEST,
+                        help="Token estimate charged against --tpm per query")
+    parser.add_argument("--ordered", action="store_true", help="Write results in input order")
+
+
+async def run_batch_cli(args: argparse.Namespace, agent_fn: AgentFn) -> Dict[str, int]:
+    source = sys.stdin if args.input == "-" else open(args.input, encoding="utf-8")
+    out = sys.stdout if args.output == "-" else open(args.output, "w", encoding="utf-8")
+    try:
+        summary = await run_batch(
+            source,
+            agent_fn,
+            out,
+            concurrency=args.concurrency,
+            limiter=RateLimiter(args.rpm, args.tpm),
+            ordered=args.ordered,
+            tokens_per_request=args.tokens_per_request,
+        )
+    finally:
+        if source is not sys.stdin:
+            source.close()
+        if out is not sys.stdout:
+            out.close()
+    print(f"📦 Batch finished: {summary['ok']} ok, {summary['failed']} failed, {summary['total']} total",
+          file=sys.stderr)
+    return summary
@@ -0,0 +1,525 @@
+"""Offline latency/throughput benchmark for railway_agent using a fake model provider."""
+import argparse
+import ast
+import asyncio
+import importlib
+import json
+import os
+import random
+import sys
+import time
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import TYPE_CHECKING, Any, AsyncIterator, Awaitable, Callable, Dict, List, Optional, Tuple
+
+import metrics
+from batch import parse_query_line
+from models.validators import strip_code_fence
+from stages import collect_stages, record_stage
+
+if TYPE_CHECKING:
+    from agents import Agent
+
+# -------------------------------
+# Fake model provider
+# -------------------------------
+# Implements the agents SDK Model/ModelProvider interfaces locally: each
+# turn sleeps for a configurable latency, then follows a script that
+# decides which tool to call or what final text to return. No network
+# access and no API key is needed.
+
+AGENTS = {
+    # --agent: (module, ((registry name, factory), ...))
+    "offline": ("railway_agent_openai_without_websearch", (("railway_stub", "create_agent"),)),
+    "web": ("travel_agent_openai", (("train", "create_train_agent"), ("flight", "create_flight_agent"))),
+}
+DEFAULT_RESULTS_PATH = "benchmark_results.json"
+DEFAULT_MAX_REGRESSION = 0.10
+CHARS_PER_TOKEN = 4
+REPAIR_MARKER = "Previous reply:\n"
+PROSE_PREFIX = "Here are the trains I found:\n"
+RESOLVED_MARKER = "Resolved: "
+
+
+@dataclass
+class FakeTurn:
+    """What the fake model does in one turn: call tools, or answer with text."""
+    tool_calls: List[Tuple[str, Dict[str, Any]]] = field(default_factory=list)
+    text: str = ""
+
+
+# script(user query, function tools, tool outputs so far) -> next turn
+Script = Callable[[str, List[Any], List[str]], FakeTurn]
+
+
+def _parse_tool_output(output: str) -> Dict[str, Any]:
+    # The SDK passes tool results back as str(result), i.e. a Python repr for dicts
+    for parse in (json.loads, ast.literal_eval):
+        try:
+            value = parse(output)
+        except (ValueError, SyntaxError):
+            continue
+        if isinstance(value, dict):
+            return value
+    return {}
+
+
+def default_script(query: str, tools: List[Any], tool_outputs: List[str]) -> FakeTurn:
+    """Call the train extraction tool once, then answer with fenced JSON built from its output.
+
+    Agents given already-resolved parameters in their input (see
+    agent_core.train_agent_input) are answered from those directly. A
+    tool-less repair turn (see structured.py) answers with the object
+    found in the rejected reply.
+    """
+    if not tools and REPAIR_MARKER in query:
+        rejected = query.split(REPAIR_MARKER, 1)[1]
+        start = rejected.find("{")
+        if start != -1:
+            try:
+                return FakeTurn(text=json.dumps(json.JSONDecoder().raw_decode(rejected[start:])[0]))
+            except json.JSONDecodeError:
+                pass
+    if not tool_outputs:
+        for tool in tools:
+            if tool.name.startswith("extract_") and "flight" not in tool.name:
+                argument = next(iter(tool.params_json_schema.get("properties", {})), "query")
+                return FakeTurn(tool_calls=[(tool.name, {argument: query})])
+    if tool_outputs:
+        info = _parse_tool_output(tool_outputs[-1])
+    elif RESOLVED_MARKER in query:
+        info = _parse_tool_output(query.split(RESOLVED_MARKER, 1)[1].strip())
+    else:
+        info = {}
+    response = {
+        "source": info.get("source", ""),
+        "destination": info.get("destination", ""),
+        "date": info.get("date", ""),
+        "class": info.get("class", "3A"),
+        "trains": info.get("trains", []),
+    }
+    return FakeTurn(text="```json\n" + json.dumps(response, indent=2) + "\n```")
+
+
+def _user_query(input: Any) -> str:
+    if isinstance(input, str):
+        return input
+    for item in input:
+        if isinstance(item, dict) and item.get("role") == "user":
+            content = item.get("content")
+            return content if isinstance(content, str) else json.dumps(content)
+    return ""
+
+
+def _tool_outputs(input: Any) -> List[str]:
+    if isinstance(input, str):
+        return []
+    return [str(item.get("output", "")) for item in input
+            if isinstance(item, dict) and item.get("type") == "function_call_output"]
+
+
+def _make_fake_model_classes():
+    from agents.items import ModelResponse
+    from agents.models.interface import Model, ModelProvider
+    from agents.tool import FunctionTool
+    from agents.usage import Usage
+    from openai.types.responses import (
+        Response,
+        ResponseCompletedEvent,
+        ResponseFunctionToolCall,
+        ResponseOutputMessage,
+        ResponseOutputText,
+        ResponseTextDeltaEvent,
+        ResponseUsage,
+    )
+
+    class FakeModel(Model):
+        def __init__(
+            self,
+            latency_ms: float = 300.0,
+            jitter_ms: float = 0.0,
+            script: Script = default_script,
+            seed: int = 0,
+            stream_chunk_chars: int = 24,
+            invalid_rate: float = 0.0,
+        ) -> None:
+            self.latency_ms = latency_ms
+            self.jitter_ms = jitter_ms
+            self.script = script
+            self.invalid_rate = invalid_rate
+            self.stream_chunk_chars = stream_chunk_chars
+            self.turns = 0
+            self.input_tokens = 0
+            self.output_tokens = 0
+            self._random = random.Random(seed)
+
+        def _final_text(self, text: str, output_schema, repairing: bool) -> str:
+            if output_schema is None or output_schema.is_plain_text():
+                return text
+            # Structured output: raw JSON, wrapped the way the SDK expects for non-object types
+            text = strip_code_fence(text)
+            if getattr(output_schema, "_is_wrapped", False):
+                try:
+                    value = json.loads(text)
+                    if not (isinstance(value, dict) and "response" in value):
+                        text = json.dumps({"response": value})
+                except json.JSONDecodeError:
+                    pass
+            if not repairing and self._random.random() < self.invalid_rate:
+                text = PROSE_PREFIX + text
+            return text
+
+        async def _turn(self, system_instructions, input, tools, output_schema=None) -> Tuple[list, Usage]:
+            started = time.perf_counter()
+            delay = max(0.0, self.latency_ms + self._random.uniform(-self.jitter_ms, self.jitter_ms))
+            await asyncio.sleep(delay / 1000)
+            self.turns += 1
+            function_tools = [tool for tool in tools if isinstance(tool, FunctionTool)]
+            query = _user_query(input)
+            turn = self.script(query, function_tools, _tool_outputs(input))
+            if turn.text:
+                turn.text = self._final_text(turn.text, output_schema, repairing=REPAIR_MARKER in query)
+
+            items: list = []
+            for index, (name, arguments) in enumerate(turn.tool_calls):
+                call_id = f"call_{self.turns}_{index}"
+                items.append(ResponseFunctionToolCall(
+                    id=call_id, call_id=call_id, name=name, arguments=json.dumps(arguments),
+                    type="function_call", status="completed",
+                ))
+            if turn.text or not items:
+                items.append(ResponseOutputMessage(
+                    id=f"msg_{self.turns}", role="assistant", status="completed", type="message",
+                    content=[ResponseOutputText(text=turn.text, type="output_text", annotations=[])],
+                ))
+            input_chars = len(system_instructions or "") + len(json.dumps(input, default=str))
+            output_chars = len(turn.text) + sum(len(json.dumps(args)) for _, args in turn.tool_calls)
+            usage = Usage(
+                requests=1,
+                input_tokens=input_chars // CHARS_PER_TOKEN,
+                output_tokens=output_chars // CHARS_PER_TOKEN,
+                total_tokens=(input_chars + output_chars) // CHARS_PER_TOKEN,
+            )
+            self.input_tokens += usage.input_tokens
+            self.output_tokens += usage.output_tokens
+            record_stage("model_turn", (time.perf_counter() - started) * 1000)
+            return items, usage
+
+        async def get_response(self, system_instructions, input, model_settings, tools,
+                               output_schema, handoffs, tracing) -> ModelResponse:
+            items, usage = await self._turn(system_instructions, input, tools, output_schema)
+            return ModelResponse(output=items, usage=usage, referenceable_id=None)
+
+        async def stream_response(self, system_instructions, input, model_settings, tools,
+                                  output_schema, handoffs, tracing) -> AsyncIterator[Any]:
+            items, usage = await self._turn(system_instructions, input, tools, output_schema)
+            sequence = 0
+            for item in items:
+                if not isinstance(item, ResponseOutputMessage):
+                    continue
+                text = item.content[0].text
+                for start in range(0, len(text), self.stream_chunk_chars):
+                    # model_construct keeps the fake independent of the openai version's required fields
+                    yield ResponseTextDeltaEvent.model_construct(
+                        type="response.output_text.delta", delta=text[start:start + self.stream_chunk_chars],
+                        item_id=item.id, output_index=0, content_index=0, sequence_number=sequence, logprobs=[],
+                    )
+                    sequence += 1
+            response = Response.model_construct(
+                id=f"resp_{self.turns}", object="response", created_at=time.time(), model="fake",
+                output=items, tools=[], tool_choice="auto", parallel_tool_calls=False,
+                usage=ResponseUsage.model_construct(
+                    input_tokens=usage.input_tokens, output_tokens=usage.output_tokens,
+                    total_tokens=usage.total_tokens,
+                ),
+            )
+            yield ResponseCompletedEvent.model_construct(
+                type="response.completed", response=response, sequence_number=sequence,
+            )
+
+    class FakeModelProvider(ModelProvider):
+        def __init__(self, model: FakeModel) -> None:
+            self.model = model
+
+        def get_model(self, model_name: Optional[str]) -> Model:
+            return self.model
+
+    return FakeModel, FakeModelProvider
+
+
+# Tracing setting from before install_fake_provider(), restored on uninstall
+_tracing_was_disabled: Optional[bool] = None
+
+
+def install_fake_provider(
+    latency_ms: float = 300.0,
+    jitter_ms: float = 0.0,
+    script: Script = default_script,
+    seed: int = 0,
+    invalid_rate: float = 0.0,
+):
+    """Route every agent run through a FakeModel; returns the model (for its turn and token counts).
+
+    uninstall_fake_provider() restores the default run config and tracing setting.
+    """
+    global _tracing_was_disabled
+    from agents import RunConfig, set_tracing_disabled
+    from agents.tracing import GLOBAL_TRACE_PROVIDER
+    from agent_registry import set_run_config
+
+    FakeModel, FakeModelProvider = _make_fake_model_classes()
+    model = FakeModel(latency_ms=latency_ms, jitter_ms=jitter_ms, script=script, seed=seed,
+                      invalid_rate=invalid_rate)
+    if _tracing_was_disabled is None:
+        _tracing_was_disabled = bool(getattr(GLOBAL_TRACE_PROVIDER, "_disabled", False))
+    set_tracing_disabled(True)
+    set_run_config(RunConfig(model_provider=FakeModelProvider(model), tracing_disabled=True))
+    return model
+
+
+def uninstall_fake_provider() -> None:
+    """Undo install_fake_provider()."""
+    global _tracing_was_disabled
+    from agents import set_tracing_disabled
+    from agent_registry import set_run_config
+
+    set_run_config(None)
+    if _tracing_was_disabled is not None:
+        set_tracing_disabled(_tracing_was_disabled)
+        _tracing_was_disabled = None
+
+
+def time_tool_calls(agent: "Agent") -> None:
+    """Record a tool_call stage around each function tool the agent invokes."""
+    from agents.tool import FunctionTool
+
+    for tool in agent.tools:
+        if not isinstance(tool, FunctionTool) or getattr(tool, "_benchmark_timed", False):
+            continue
+        invoke = tool.on_invoke_tool
+
+        async def timed(context, arguments, invoke=invoke):
+            started = time.perf_counter()
+            try:
+                return await invoke(context, arguments)
+            finally:
+                record_stage("tool_call", (time.perf_counter() - started) * 1000)
+
+        tool.on_invoke_tool = timed
+        tool._benchmark_timed = True
+
+
+# -------------------------------
+# Workloads
+# -------------------------------
+def load_workload(path: str) -> List[Tuple[str, str]]:
+    """(id, query) pairs from a JSONL file in any format `batch` accepts."""
+    with open(path, encoding="utf-8") as f:
+        parsed = (parse_query_line(line, index) for index, line in enumerate(f))
+        return [item for item in parsed if item is not None]
+
+
+def generate_workload(count: int, model_share: float = 0.5, seed: int = 0) -> List[Tuple[str, str]]:
+    """Train queries between known cities; `model_share` of them are too vague for the fast path."""
+    from gazetteer import STATIONS
+
+    rng = random.Random(seed)
+    cities = sorted({city for code, city, *_ in STATIONS if code})
+    classes = ["1A", "2A", "3A", "SL", "CC"]
+    dates = ["tomorrow", "next friday", "25 december", "today"]
+    confident = [
+        "trains from {a} to {b} on {date} in {cls}",
+        "show {cls} trains from {a} to {b} {date}",
+    ]
+    vague = [
+        "any way to reach {b} starting at {a}?",
+        "trains from {a} to {b} on the day after my exam",
+        "{a} {b} trains in a comfy class",
+    ]
+    workload = []
+    for index in range(count):
+        a, b = rng.sample(cities, 2)
+        templates = vague if rng.random() < model_share else confident
+        query = rng.choice(templates).format(a=a, b=b, date=rng.choice(dates), cls=rng.choice(classes))
+        workload.append((f"gen-{index}", query))
+    return workload
+
+
+# -------------------------------
+# Runner and report
+# -------------------------------
+def percentile(values: List[float], pct: float) -> float:
+    """Linear-interpolated percentile (pct in 0..100); 0.0 for no values."""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = (len(ordered) - 1) * pct / 100
+    low = int(rank)
+    high = min(low + 1, len(ordered) - 1)
+    return ordered[low] + (ordered[high] - ordered[low]) * (rank - low)
+
+
+def _summary(values: List[float]) -> Dict[str, float]:
+    return {
+        "count": len(values),
+        "mean": round(sum(values) / len(values), 3) if values else 0.0,
+        "p50": round(percentile(values, 50), 3),
+        "p95": round(percentile(values, 95), 3),
+        "p99": round(percentile(values, 99), 3),
+        "max": round(max(values), 3) if values else 0.0,
+    }
+
+
+async def run_benchmark(
+    workload: List[Tuple[str, str]],
+    agent_fn: Callable[[str], Awaitable[Dict[str, Any]]],
+    concurrency: int = 8,
+    warmup: int = 0,
+) -> Dict[str, Any]:
+    """Run every query through `agent_fn` and return latency, throughput and stage statistics."""
+    for _, query in workload[:warmup]:
+        await agent_fn(query)
+
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies: List[float] = []
+    stage_times: Dict[str, List[float]] = {}
+    errors: List[Dict[str, str]] = []
+    model_requests = 0
+
+    async def one(query_id: str, query: str) -> None:
+        nonlocal model_requests
+        async with semaphore:
+            with collect_stages() as times:
+                started = time.perf_counter()
+                try:
+                    response = await agent_fn(query)
+                    if isinstance(response, dict) and response.get("error"):
+                        errors.append({"id": query_id, "error": response["error"]})
+                except Exception as e:
+                    errors.append({"id": query_id, "error": f"{type(e).__name__}: {e}"})
+                latencies.append((time.perf_counter() - started) * 1000)
+        if "model_turn" in times:
+            model_requests += 1
+        for name, values in times.items():
+            stage_times.setdefault(name, []).extend(values)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(one(query_id, query) for query_id, query in workload))
+    wall = time.perf_counter() - started
+
+    return {
+        "requests": len(workload),
+        "errors": len(errors),
+        "error_samples": errors[:5],
+        "fast_path": len(workload) - model_requests,
+        "model_path": model_requests,
+        "wall_seconds": round(wall, 3),
+        "throughput_rps": round(len(workload) / wall, 2) if wall else 0.0,
+        "latency_ms": _summary(latencies),
+        "stages_ms": {
+            name: {**_summary(values), "total": round(sum(values), 3)}
+            for name, values in sorted(stage_times.items())
+        },
+    }
+
+
+def compare(results: Dict[str, Any], baseline: Dict[str, Any], max_regression: float) -> List[str]:
+    """Regressions beyond `max_regression` (a fraction) relative to a previous results file."""
+    regressions = []
+    for key in ("p50", "p95", "p99"):
+        old, new = baseline["latency_ms"][key], results["latency_ms"][key]
+        if old and new > old * (1 + max_regression):
+            regressions.append(f"latency {key}: {old:.1f} ms → {new:.1f} ms")
+    old, new = baseline["throughput_rps"], results["throughput_rps"]
+    if old and new < old * (1 - max_regression):
+        regressions.append(f"throughput: {old:.1f} → {new:.1f} req/s")
+    return regressions
+
+
+def print_report(results: Dict[str, Any], file=sys.stderr) -> None:
+    latency = results["latency_ms"]
+    print(f"📊 {results['requests']} requests ({results['fast_path']} fast path, "
+          f"{results['model_path']} via model), {results['errors']} errors", file=file)
+    print(f"  throughput {results['throughput_rps']:.1f} req/s over {results['wall_seconds']:.2f} s", file=file)
+    print(f"  latency p50 {latency['p50']:.1f} ms  p95 {latency['p95']:.1f} ms  p99 {latency['p99']:.1f} ms",
+          file=file)
+    tokens = results.get("tokens")
+    if tokens:
+        print(f"  tokens in {tokens['input']} out {tokens['output']} over {tokens['model_turns']} model turns "
+              f"({tokens['input_per_turn']:.0f} in per turn)", file=file)
+    for name, stats in results["stages_ms"].items():
+        print(f"  {name:<14} n={stats['count']:<6} mean {stats['mean']:8.3f} ms  p95 {stats['p95']:8.3f} ms",
+              file=file)
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--agent", choices=sorted(AGENTS), default="offline")
+    parser.add_argument("--workload", default=None, help="JSONL queries to replay (default: generated)")
+    parser.add_argument("-n", "--requests", type=int, default=200, help="Generated workload size")
+    parser.add_argument("--model-share", type=float, default=0.5,
+                        help="Fraction of generated queries too vague for the fast path")
+    parser.add_argument("-c", "--concurrency", type=int, default=16)
+    parser.add_argument("--latency-ms", type=float, default=300.0, help="Fake model latency per turn")
+    parser.add_argument("--jitter-ms", type=float, default=0.0)
+    parser.add_argument("--invalid-rate", type=float, default=0.0,
+                        help="Fraction of final answers prefixed with prose (exercises the repair pass)")
+    parser.add_argument("--warmup", type=int, default=5, help="Untimed queries run first")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("-o", "--output", default=DEFAULT_RESULTS_PATH, help="Results JSON file")
+    parser.add_argument("--baseline", default=None, help="Previous results file to compare against")
+    parser.add_argument("--max-regression", type=float, default=DEFAULT_MAX_REGRESSION)
+    parser.add_argument("--metrics", action="store_true",
+                        help="Run with metrics enabled and include the counters in the results")
+    args = parser.parse_args()
+
+    # The agent modules export OPENAI_API_KEY on import; the fake provider never uses it
+    os.environ.setdefault("OPENAI_API_KEY", "offline-benchmark")
+    module_name, agents = AGENTS[args.agent]
+    module = importlib.import_module(module_name)
+
+    from agent_registry import get_agent
+
+    workload = load_workload(args.workload) if args.workload else generate_workload(
+        args.requests, args.model_share, args.seed)
+    if args.metrics:
+        metrics.enable()
+    model = install_fake_provider(args.latency_ms, args.jitter_ms, seed=args.seed, invalid_rate=args.invalid_rate)
+    if not args.metrics:
+        # With metrics on, the run hooks already time tool calls
+        for agent_name, factory in agents:
+            time_tool_calls(get_agent(agent_name, getattr(module, factory)))
+
+    try:
+        results = asyncio.run(run_benchmark(workload, module.railway_agent, args.concurrency, args.warmup))
+    finally:
+        uninstall_fake_provider()
+    results = {
+        "timestamp": datetime.now().isoformat(timespec="seconds"),
+        "config": {key: value for key, value in vars(args).items() if key not in ("output", "baseline")},
+        **results,
+        "tokens": {
+            "model_turns": model.turns,
+            "input": model.input_tokens,
+            "output": model.output_tokens,
+            "input_per_turn": round(model.input_tokens / model.turns, 1) if model.turns else 0.0,
+        },
+    }
+    if args.metrics:
+        results["metrics"] = metrics.get_registry().snapshot()
+    print_report(results)
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(results, f, indent=2)
+    print(f"💾 Results written to {args.output}", file=sys.stderr)
+
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            regressions = compare(results, json.load(f), args.max_regression)
+        for line in regressions:
+            print(f"⚠️  Regression: {line}", file=sys.stderr)
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
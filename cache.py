@@ -0,0 +1,500 @@
+import hashlib
+import json
+import mmap
+import multiprocessing
+import os
+import sqlite3
+import struct
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple, Union
+
+import metrics
+from gazetteer import get_gazetteer
+
+# -------------------------------
+# Availability result cache
+# -------------------------------
+# Results are keyed on the normalized TrainAvailability / FlightAvailability
+# fields, never on the raw query text, so "trains from delhi to mumbai" and
+# "Delhi -> Mumbai trains" share one entry. Expired entries are kept for a
+# further `stale_ttl` seconds: ordinary lookups miss them, but get_stale()
+# still returns them for answers degraded at a deadline (see deadlines.py).
+# The second tier is either SQLite (survives restarts) or an anonymous
+# shared-memory table created before workers fork, so an answer stored by
+# one worker is a hit in all of them. Only live provider answers are cached:
+# timetable rows are already an in-memory index, and caching them would hide
+# the live answer that replaces them.
+
+TRAIN_AVAILABILITY = "train_availability"
+FLIGHT_AVAILABILITY = "flight_availability"
+
+DEFAULT_TTLS = {
+    TRAIN_AVAILABILITY: 60.0,
+    FLIGHT_AVAILABILITY: 60.0,
+}
+DEFAULT_MAX_ENTRIES = 10_000
+DEFAULT_STALE_TTL = 60 * 60.0
+DEFAULT_LOCK_TIMEOUT = 0.05   # shared tier: give up on a bucket (miss / skip) after this many seconds
+
+CacheKey = Tuple[str, str, str, str, str]
+
+
+def _norm(value: Any) -> str:
+    return " ".join(str(value or "").split()).casefold()
+
+
+def _place(name: Any, code: Any) -> str:
+    # Canonical station codes make "Bombay" and "Mumbai" share an entry
+    if code:
+        return str(code).upper()
+    place = get_gazetteer().lookup(str(name or ""))
+    if place is not None:
+        return place.code or place.city.upper()
+    return _norm(name)
+
+
+def make_key(mode: str, params: Dict[str, Any]) -> CacheKey:
+    """Build a cache key from TrainAvailability / FlightAvailability style fields."""
+    travel_class = params.get("class") or params.get("class_type") or params.get("cabin_class") or ""
+    return (
+        mode,
+        _place(params.get("source"), params.get("source_code")),
+        _place(params.get("destination"), params.get("destination_code")),
+        _norm(params.get("date")),
+        _norm(travel_class),
+    )
+
+
+class CacheStats:
+    def __init__(self) -> None:
+        self.hits: Dict[str, int] = {}
+        self.misses: Dict[str, int] = {}
+        self.persistent_hits = 0
+        self.stale_hits = 0
+
+    def hit(self, mode: str) -> None:
+        self.hits[mode] = self.hits.get(mode, 0) + 1
+        metrics.inc("cache_lookups_total", mode=mode, result="hit")
+
+    def miss(self, mode: str) -> None:
+        self.misses[mode] = self.misses.get(mode, 0) + 1
+        metrics.inc("cache_lookups_total", mode=mode, result="miss")
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {
+            "hits": dict(self.hits),
+            "misses": dict(self.misses),
+            "persistent_hits": self.persistent_hits,
+            "stale_hits": self.stale_hits,
+        }
+
+
+class TTLLRUCache:
+    """Bounded in-memory cache with per-mode TTLs and LRU eviction."""
+
+    def __init__(
+        self,
+        max_entries: int = DEFAULT_MAX_ENTRIES,
+        ttls: Optional[Dict[str, float]] = None,
+        clock: Callable[[], float] = time.monotonic,
+        stale_ttl: float = 0.0,
+    ) -> None:
+        self.max_entries = max_entries
+        self.ttls = {**DEFAULT_TTLS, **(ttls or {})}
+        self.clock = clock
+        self.stale_ttl = stale_ttl
+        self._entries: "OrderedDict[CacheKey, Tuple[float, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.evictions = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def ttl_for(self, mode: str) -> float:
+        return self.ttls.get(mode, DEFAULT_TTLS[TRAIN_AVAILABILITY])
+
+    def get(self, key: CacheKey) -> Optional[Any]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires_at, value = entry
+            if expires_at <= self.clock():
+                if expires_at + self.stale_ttl <= self.clock():
+                    del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def remaining(self, key: CacheKey) -> Optional[float]:
+        """Seconds until a live entry expires, without touching its LRU position; None when absent."""
+        entry = self._entries.get(key)
+        if entry is None or entry[0] <= self.clock():
+            return None
+        return entry[0] - self.clock()
+
+    def get_stale(self, key: CacheKey) -> Optional[Tuple[bool, Any]]:
+        """(expired, value) for a live entry or one expired less than `stale_ttl` ago."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires_at, value = entry
+            now = self.clock()
+            if expires_at + self.stale_ttl <= now:
+                del self._entries[key]
+                return None
+            return expires_at <= now, value
+
+    def set(self, key: CacheKey, value: Any, ttl: Optional[float] = None) -> None:
+        ttl = self.ttl_for(key[0]) if ttl is None else ttl
+        with self._lock:
+            self._entries[key] = (self.clock() + ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+
+class SQLiteCacheTier:
+    """Persistent second tier that survives restarts. Expiry uses wall-clock time."""
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS results ("
+            "key TEXT PRIMARY KEY, value TEXT NOT NULL, expires_at REAL NOT NULL)"
+        )
+        self._conn.commit()
+
+    @staticmethod
+    def _encode_key(key: CacheKey) -> str:
+        return json.dumps(key)
+
+    def get(self, key: CacheKey) -> Optional[Tuple[float, Any]]:
+        """Return (remaining_ttl, value) for a live entry."""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT value, expires_at FROM results WHERE key = ?", (self._encode_key(key),)
+            ).fetchone()
+        if row is None:
+            return None
+        remaining = row[1] - time.time()
+        if remaining <= 0:
+            return None
+        return remaining, json.loads(row[0])
+
+    def get_stale(self, key: CacheKey, stale_ttl: float) -> Optional[Tuple[float, Any]]:
+        """Like get(), but also entries expired less than `stale_ttl` seconds ago (remaining_ttl <= 0)."""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT value, expires_at FROM results WHERE key = ?", (self._encode_key(key),)
+            ).fetchone()
+        if row is None:
+            return None
+        remaining = row[1] - time.time()
+        if remaining <= -stale_ttl:
+            return None
+        return remaining, json.loads(row[0])
+
+    def set(self, key: CacheKey, value: Any, ttl: float) -> None:
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO results (key, value, expires_at) VALUES (?, ?, ?)",
+                (self._encode_key(key), json.dumps(value), time.time() + ttl),
+            )
+            self._conn.commit()
+
+    def purge_expired(self) -> int:
+        with self._lock:
+            deleted = self._conn.execute(
+                "DELETE FROM results WHERE expires_at <= ?", (time.time(),)
+            ).rowcount
+            self._conn.commit()
+        return deleted
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+
+class SharedMemoryCacheTier:
+    """Fixed-size, set-associative table in an anonymous shared mmap, for pre-forked workers.
+
+    Create it in the parent before forking: children inherit the mapping
+    (MAP_SHARED) and the per-bucket locks. Each bucket holds `ways` slots
+    of `slot_size` bytes; a full bucket replaces the entry expiring first.
+    Values that do not fit a slot are not shared. Expiry uses wall-clock time.
+
+    Bucket locks are taken with a `lock_timeout`: the event loop never waits
+    longer than that, and a worker killed while holding a lock only turns
+    that stripe into misses instead of hanging every other worker.
+    """
+
+    HEADER = struct.Struct("<QdI")    # key digest, expires_at, payload length
+
+    def __init__(
+        self,
+        size_bytes: int,
+        slot_size: int = 8192,
+        ways: int = 4,
+        locks: int = 64,
+        lock_timeout: float = DEFAULT_LOCK_TIMEOUT,
+    ) -> None:
+        self.slot_size = slot_size
+        self.ways = ways
+        self.lock_timeout = lock_timeout
+        self.buckets = max(1, size_bytes // (slot_size * ways))
+        self._map = mmap.mmap(-1, self.buckets * ways * slot_size)
+        self._locks = [multiprocessing.Lock() for _ in range(min(locks, self.buckets))]
+        self.oversized = 0
+        self.lock_timeouts = 0
+
+    @staticmethod
+    def _encode_key(key: CacheKey) -> bytes:
+        return json.dumps(key).encode()
+
+    @contextmanager
+    def _locked(self, lock: Any) -> Iterator[bool]:
+        """Yield whether `lock` was acquired within `lock_timeout`."""
+        if not lock.acquire(timeout=self.lock_timeout):
+            self.lock_timeouts += 1
+            metrics.inc("shared_cache_lock_timeouts_total")
+            yield False
+            return
+        try:
+            yield True
+        finally:
+            lock.release()
+
+    def _bucket(self, encoded_key: bytes) -> Tuple[int, int, Any]:
+        digest = int.from_bytes(hashlib.blake2b(encoded_key, digest_size=8).digest(), "little")
+        bucket = digest % self.buckets
+        return digest, bucket * self.ways * self.slot_size, self._locks[bucket % len(self._locks)]
+
+    def _find(self, digest: int, encoded_key: bytes, start: int) -> Optional[Tuple[float, bytes]]:
+        prefix = encoded_key + b"\n"
+        for offset in range(start, start + self.ways * self.slot_size, self.slot_size):
+            slot_digest, expires_at, length = self.HEADER.unpack_from(self._map, offset)
+            if length and slot_digest == digest:
+                payload = self._map[offset + self.HEADER.size:offset + self.HEADER.size + length]
+                if payload.startswith(prefix):
+                    return expires_at, payload[len(prefix):]
+        return None
+
+    def _read(self, key: CacheKey, stale_ttl: float) -> Optional[Tuple[float, Any]]:
+        encoded_key = self._encode_key(key)
+        digest, start, lock = self._bucket(encoded_key)
+        with self._locked(lock) as acquired:
+            found = self._find(digest, encoded_key, start) if acquired else None
+        if found is None:
+            return None
+        remaining = found[0] - time.time()
+        if remaining <= -stale_ttl:
+            return None
+        return remaining, json.loads(found[1])
+
+    def get(self, key: CacheKey) -> Optional[Tuple[float, Any]]:
+        """Return (remaining_ttl, value) for a live entry."""
+        return self._read(key, 0.0)
+
+    def get_stale(self, key: CacheKey, stale_ttl: float) -> Optional[Tuple[float, Any]]:
+        """Like get(), but also entries expired less than `stale_ttl` seconds ago (remaining_ttl <= 0)."""
+        return self._read(key, stale_ttl)
+
+    def set(self, key: CacheKey, value: Any, ttl: float) -> None:
+        encoded_key = self._encode_key(key)
+        payload = encoded_key + b"\n" + json.dumps(value).encode()
+        if self.HEADER.size + len(payload) > self.slot_size:
+            self.oversized += 1
+            metrics.inc("shared_cache_oversized_total")
+            return
+        digest, start, lock = self._bucket(encoded_key)
+        slots = range(start, start + self.ways * self.slot_size, self.slot_size)
+        with self._locked(lock) as acquired:
+            if not acquired:
+                return
+            target = None
+            for offset in slots:
+                slot_digest, _, length = self.HEADER.unpack_from(self._map, offset)
+                if length and slot_digest == digest:
+                    target = offset
+                    break
+            if target is None:
+                # Empty slots have expires_at 0, so they are taken before any live entry
+                target = min(slots, key=lambda offset: self.HEADER.unpack_from(self._map, offset)[1])
+            self.HEADER.pack_into(self._map, target, digest, time.time() + ttl, len(payload))
+            self._map[target + self.HEADER.size:target + self.HEADER.size + len(payload)] = payload
+
+    def purge_expired(self) -> int:
+        deleted = 0
+        now = time.time()
+        for bucket in range(self.buckets):
+            with self._locked(self._locks[bucket % len(self._locks)]) as acquired:
+                if not acquired:
+                    continue
+                start = bucket * self.ways * self.slot_size
+                for offset in range(start, start + self.ways * self.slot_size, self.slot_size):
+                    digest, expires_at, length = self.HEADER.unpack_from(self._map, offset)
+                    if length and expires_at <= now:
+                        self.HEADER.pack_into(self._map, offset, 0, 0.0, 0)
+                        deleted += 1
+        return deleted
+
+    def close(self) -> None:
+        # The mapping outlives any one worker; it is released with the last process
+        pass
+
+
+SecondTier = Union[SQLiteCacheTier, SharedMemoryCacheTier]
+
+
+class ResultCache:
+    """Memory tier in front of an optional second tier: persistent SQLite, or shared memory across workers."""
+
+    def __init__(
+        self,
+        memory: Optional[TTLLRUCache] = None,
+        persistent: Optional[SecondTier] = None,
+    ) -> None:
+        self.memory = memory if memory is not None else TTLLRUCache()
+        self.persistent = persistent
+        self.stats = CacheStats()
+
+    def get(self, mode: str, params: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        key = make_key(mode, params)
+        value = self.memory.get(key)
+        if value is None and self.persistent is not None:
+            entry = self.persistent.get(key)
+            if entry is not None:
+                remaining, value = entry
+                self.memory.set(key, value, ttl=remaining)
+                self.stats.persistent_hits += 1
+        if value is None:
+            self.stats.miss(mode)
+            return None
+        self.stats.hit(mode)
+        return value
+
+    def get_stale(self, mode: str, params: Dict[str, Any]) -> Optional[Tuple[Dict[str, Any], bool]]:
+        """(value, stale) including recently expired entries; for degraded answers only."""
+        key = make_key(mode, params)
+        entry = self.memory.get_stale(key)
+        if entry is None and self.persistent is not None:
+            found = self.persistent.get_stale(key, self.memory.stale_ttl)
+            if found is not None:
+                entry = (found[0] <= 0, found[1])
+        if entry is None:
+            return None
+        expired, value = entry
+        if expired:
+            self.stats.stale_hits += 1
+            metrics.inc("cache_lookups_total", mode=mode, result="stale")
+        return value, expired
+
+    def ttl_remaining(self, mode: str, params: Dict[str, Any]) -> Optional[float]:
+        """Seconds the entry stays fresh in either tier; None on a miss. Not counted as a lookup."""
+        key = make_key(mode, params)
+        remaining = self.memory.remaining(key)
+        if remaining is None and self.persistent is not None:
+            # Another worker (or an earlier run) may have refreshed it
+            entry = self.persistent.get(key)
+            remaining = entry[0] if entry is not None else None
+        return remaining
+
+    def set(self, mode: str, params: Dict[str, Any], value: Dict[str, Any]) -> None:
+        key = make_key(mode, params)
+        ttl = self.memory.ttl_for(mode)
+        self.memory.set(key, value, ttl=ttl)
+        if self.persistent is not None:
+            self.persistent.set(key, value, ttl)
+
+    def store_response(self, response: Dict[str, Any]) -> None:
+        """Cache a validated train or flight response under its own fields."""
+        if "trains" in response:
+            self.set(TRAIN_AVAILABILITY, response, response)
+        elif "flights" in response:
+            self.set(FLIGHT_AVAILABILITY, response, response)
+
+    def lookup_trains(self, info: Dict[str, Any]) -> Optional[List[Dict[str, Any]]]:
+        """Train lookup for the fast path: cached trains, or None on a miss."""
+        cached = self.get(TRAIN_AVAILABILITY, info)
+        return None if cached is None else cached["trains"]
+
+    def lookup_flights(self, info: Dict[str, Any]) -> Optional[List[Dict[str, Any]]]:
+        """Flight lookup for the fast path: cached flights, or None on a miss."""
+        # Cached responses carry city names only; IATA codes would key them differently
+        params = {key: info.get(key) for key in ("source", "destination", "date", "cabin_class")}
+        cached = self.get(FLIGHT_AVAILABILITY, params)
+        return None if cached is None else cached["flights"]
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            **self.stats.as_dict(),
+            "entries": len(self.memory),
+            "memory_evictions": self.memory.evictions,
+        }
+
+    def close(self) -> None:
+        if self.persistent is not None:
+            self.persistent.close()
+
+
+_result_cache: Optional[ResultCache] = None
+
+
+def get_result_cache() -> ResultCache:
+    """Return the process-wide cache, configured from RESULT_CACHE_* on first use."""
+    global _result_cache
+    if _result_cache is None:
+        path = os.getenv("RESULT_CACHE_PATH")
+        shared_mb = float(os.getenv("RESULT_CACHE_SHARED_MB", "0"))
+        if path:
+            second_tier: Optional[SecondTier] = SQLiteCacheTier(path)
+        elif shared_mb > 0:
+            second_tier = SharedMemoryCacheTier(int(shared_mb * 1024 * 1024))
+        else:
+            second_tier = None
+        _result_cache = ResultCache(
+            memory=TTLLRUCache(
+                max_entries=int(os.getenv("RESULT_CACHE_MAX_ENTRIES", str(DEFAULT_MAX_ENTRIES))),
+                ttls={
+                    TRAIN_AVAILABILITY: float(os.getenv("RESULT_CACHE_AVAILABILITY_TTL", "60")),
+                    FLIGHT_AVAILABILITY: float(os.getenv("RESULT_CACHE_AVAILABILITY_TTL", "60")),
+                },
+                stale_ttl=float(os.getenv("RESULT_CACHE_STALE_TTL", str(DEFAULT_STALE_TTL))),
+            ),
+            persistent=second_tier,
+        )
+    return _result_cache
+
+
+def share_result_cache(size_mb: float) -> None:
+    """Call before forking workers so they all share one second cache tier.
+
+    SQLite (RESULT_CACHE_PATH) is already shared through its file; the cache
+    is just reset so each worker opens its own connection after the fork.
+    """
+    global _result_cache
+    if os.getenv("RESULT_CACHE_PATH"):
+        _result_cache = None
+        return
+    cache = get_result_cache()
+    if cache.persistent is None:
+        cache.persistent = SharedMemoryCacheTier(int(size_mb * 1024 * 1024))
+
+
+def set_result_cache(cache: ResultCache) -> None:
+    """Swap the process-wide cache, e.g. for a persistent or differently sized one."""
+    global _result_cache
+    _result_cache = cache
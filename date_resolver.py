@@ -0,0 +1,198 @@
+import re
+from datetime import date, timedelta
+from functools import lru_cache
+from typing import List, Optional
+
+# -------------------------------
+# Date resolution
+# -------------------------------
+# Common travel phrasings are resolved directly; dateparser (slow, heavy
+# locale data) is only consulted for unusual inputs. Results are memoized
+# per (phrase, reference day).
+
+WEEKDAYS = ["monday", "tuesday", "wednesday", "thursday", "friday", "saturday", "sunday"]
+WEEKDAY_PREFIXES = {name[:3]: index for index, name in enumerate(WEEKDAYS)}
+MONTHS = {
+    "jan": 1, "feb": 2, "mar": 3, "apr": 4, "may": 5, "jun": 6,
+    "jul": 7, "aug": 8, "sep": 9, "oct": 10, "nov": 11, "dec": 12,
+}
+
+# Full names and the usual abbreviations only: "month", "monsoon", "sunset" or "marathon" are not dates
+WEEKDAY_NAMES = r"(mon(?:day)?|tue(?:s|sday)?|wed(?:nesday)?|thu(?:rs|rsday)?|fri(?:day)?|sat(?:urday)?|sun(?:day)?)"
+MONTH_NAMES = (r"(jan(?:uary)?|feb(?:ruary)?|mar(?:ch)?|apr(?:il)?|may|june?|july?|aug(?:ust)?|sept?(?:ember)?"
+               r"|oct(?:ober)?|nov(?:ember)?|dec(?:ember)?)")
+
+ISO_PATTERN = re.compile(r"^(\d{4})-(\d{1,2})-(\d{1,2})\b")
+NUMERIC_PATTERN = re.compile(r"^(\d{1,2})[/.](\d{1,2})[/.](\d{4})\b")
+RELATIVE_PATTERN = re.compile(r"^(day after tomorrow|today|tonight|tomorrow)\b")
+WEEKDAY_PATTERN = re.compile(r"^(?:(next|this|coming)\s+)?" + WEEKDAY_NAMES + r"\b")
+DAY_MONTH_PATTERN = re.compile(r"^(\d{1,2})(?:st|nd|rd|th)?\s+(?:of\s+)?" + MONTH_NAMES + r"\b,?(?:\s+(\d{4}))?")
+MONTH_DAY_PATTERN = re.compile(r"^" + MONTH_NAMES + r"\s+(\d{1,2})(?:st|nd|rd|th)?\b,?(?:\s+(\d{4}))?")
+
+# Date text anywhere in the query, with or without "on": relative days, weekdays, ISO/numeric and day-month dates
+DATE_TEXT_PATTERN = re.compile(
+    r"\b(day after tomorrow|today|tonight|tomorrow|(?:(?:next|this|coming)\s+)?" + WEEKDAY_NAMES
+    + r"|\d{4}-\d{1,2}-\d{1,2}|\d{1,2}[/.]\d{1,2}[/.]\d{4}"
+    + r"|\d{1,2}(?:st|nd|rd|th)?\s+(?:of\s+)?" + MONTH_NAMES + r"(?:\s+\d{4})?"
+    + r"|" + MONTH_NAMES + r"\s+\d{1,2}(?:st|nd|rd|th)?(?:\s+\d{4})?)\b"
+)
+
+# Words after which a greedy capture ("friday in sleeper class") stops being a date
+TRAILING_WORDS = re.compile(r"\s+(?:in|for|by|with|via|class|train|trains|flight|flights)\b.*$")
+
+# Ranges ("this weekend", "next week", "next 3 days", "18-20 april") expand to every date they cover
+WEEKEND_PATTERN = re.compile(r"\b(?:(this|next|coming)\s+)?weekend\b")
+WEEK_PATTERN = re.compile(r"\b(this|next|coming)\s+week\b")
+NEXT_DAYS_PATTERN = re.compile(r"\bnext\s+(\d{1,2})\s+days\b")
+DAY_RANGE_PATTERN = re.compile(
+    r"\b(\d{1,2})(?:st|nd|rd|th)?\s*(?:-|–|to|till|until)\s*(\d{1,2})(?:st|nd|rd|th)?\s+(?:of\s+)?" + MONTH_NAMES + r"\b"
+)
+MAX_RANGE_DAYS = 14
+
+FALLBACK_LANGUAGES = ["en"]
+FALLBACK_SETTINGS = {"PREFER_DATES_FROM": "future", "RETURN_AS_TIMEZONE_AWARE": False}
+
+_fallback_parser = None
+
+
+def _get_fallback_parser():
+    # dateparser is imported and configured once, and only if a phrase needs it
+    global _fallback_parser
+    if _fallback_parser is None:
+        from dateparser.date import DateDataParser
+        _fallback_parser = DateDataParser(languages=FALLBACK_LANGUAGES, settings=FALLBACK_SETTINGS)
+    return _fallback_parser
+
+
+def _safe_date(year: int, month: int, day: int) -> Optional[date]:
+    try:
+        return date(year, month, day)
+    except ValueError:
+        return None
+
+
+def _upcoming(month: int, day: int, year: Optional[str], reference: date) -> Optional[date]:
+    if year:
+        return _safe_date(int(year), month, day)
+    resolved = _safe_date(reference.year, month, day)
+    if resolved is not None and resolved < reference:
+        resolved = _safe_date(reference.year + 1, month, day)
+    return resolved
+
+
+def _resolve_common(phrase: str, reference: date) -> Optional[date]:
+    match = ISO_PATTERN.match(phrase)
+    if match:
+        return _safe_date(int(match.group(1)), int(match.group(2)), int(match.group(3)))
+
+    match = NUMERIC_PATTERN.match(phrase)
+    if match:
+        # Indian convention: day/month/year
+        return _safe_date(int(match.group(3)), int(match.group(2)), int(match.group(1)))
+
+    match = RELATIVE_PATTERN.match(phrase)
+    if match:
+        offsets = {"today": 0, "tonight": 0, "tomorrow": 1, "day after tomorrow": 2}
+        return reference + timedelta(days=offsets[match.group(1)])
+
+    match = WEEKDAY_PATTERN.match(phrase)
+    if match:
+        days_ahead = (WEEKDAY_PREFIXES[match.group(2)[:3]] - reference.weekday()) % 7
+        if match.group(1) == "next" and days_ahead == 0:
+            days_ahead = 7
+        return reference + timedelta(days=days_ahead)
+
+    match = DAY_MONTH_PATTERN.match(phrase)
+    if match:
+        return _upcoming(MONTHS[match.group(2)[:3]], int(match.group(1)), match.group(3), reference)
+
+    match = MONTH_DAY_PATTERN.match(phrase)
+    if match:
+        return _upcoming(MONTHS[match.group(1)[:3]], int(match.group(2)), match.group(3), reference)
+
+    return None
+
+
+@lru_cache(maxsize=4096)
+def _resolve(phrase: str, reference_iso: str, fallback: bool) -> Optional[str]:
+    reference = date.fromisoformat(reference_iso)
+    resolved = _resolve_common(phrase, reference)
+    if resolved is None and fallback:
+        trimmed = TRAILING_WORDS.sub("", phrase)
+        parsed = _get_fallback_parser().get_date_data(trimmed).date_obj if trimmed else None
+        resolved = parsed.date() if parsed else None
+    return resolved.strftime("%Y-%m-%d") if resolved else None
+
+
+def resolve_date(phrase: str, reference: Optional[date] = None, fallback: bool = True) -> Optional[str]:
+    """Resolve a date phrase to YYYY-MM-DD, or None if it is not a date.
+
+    With `fallback=False` only the common forms above are accepted; dateparser
+    also reads times and words like "now" as today.
+    """
+    normalized = " ".join(phrase.lower().replace(",", " ").split())
+    if not normalized:
+        return None
+    reference = reference or date.today()
+    return _resolve(normalized, reference.isoformat(), fallback)
+
+
+def _days(start: date, count: int) -> List[str]:
+    return [(start + timedelta(days=offset)).isoformat() for offset in range(min(count, MAX_RANGE_DAYS))]
+
+
+def _range_match(text: str) -> Optional["re.Match[str]"]:
+    for pattern in (WEEKEND_PATTERN, WEEK_PATTERN, NEXT_DAYS_PATTERN, DAY_RANGE_PATTERN):
+        match = pattern.search(text)
+        if match:
+            # "on friday this week" names one day; the range only qualifies it
+            rest = f"{text[:match.start()]} {text[match.end():]}"
+            return None if DATE_TEXT_PATTERN.search(rest) else match
+    return None
+
+
+def date_range_phrase(text: str) -> Optional[str]:
+    """The range phrase in `text` ("next week", "18-20 april"), as written, or None."""
+    match = _range_match(" ".join(text.lower().split()))
+    return match.group(0) if match else None
+
+
+def resolve_date_range(text: str, reference: Optional[date] = None) -> Optional[List[str]]:
+    """Every YYYY-MM-DD date a range phrase in `text` covers (at most MAX_RANGE_DAYS), or None.
+
+    Single-day phrases ("friday", "on 18 april"), also next to a range
+    ("friday this week"), are left to resolve_date.
+    """
+    match = _range_match(" ".join(text.lower().split()))
+    if match is None:
+        return None
+    reference = reference or date.today()
+
+    if match.re is WEEKEND_PATTERN:
+        saturday = reference + timedelta(days=(5 - reference.weekday()) % 7)
+        if reference.weekday() == 6:
+            saturday = reference - timedelta(days=1)
+        if match.group(1) == "next":
+            saturday += timedelta(days=7)
+        start = max(saturday, reference)
+        return _days(start, (saturday + timedelta(days=2) - start).days)
+
+    if match.re is WEEK_PATTERN:
+        monday = reference - timedelta(days=reference.weekday())
+        if match.group(1) == "this":
+            return _days(reference, 7 - reference.weekday())
+        return _days(monday + timedelta(days=7), 7)
+
+    if match.re is NEXT_DAYS_PATTERN:
+        count = int(match.group(1))
+        return _days(reference + timedelta(days=1), count) if count > 0 else None
+
+    first, last, month = int(match.group(1)), int(match.group(2)), MONTHS[match.group(3)[:3]]
+    start = _upcoming(month, first, None, reference)
+    if start is not None and last >= first:
+        return _days(start, last - first + 1)
+    return None
+
+
+def cache_info():
+    return _resolve.cache_info()
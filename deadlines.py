@@ -0,0 +1,188 @@
+import asyncio
+import contextvars
+import os
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, Iterator, List, Optional, Tuple
+
+import metrics
+from cache import ResultCache
+from models.modes import FLIGHT_MODE, RESULT_FIELDS, TRAIN_MODE
+from providers import CACHE_MODES
+from streaming import response_events
+
+# -------------------------------
+# Request budgets
+# -------------------------------
+# Each entry point (HTTP route, chat prompt, batch line) runs a query under
+# a budget: an absolute deadline for the whole pipeline, kept in a context
+# variable so nested steps see it without threading it through every call.
+# within_budget() runs the expensive part (agent, web search, providers)
+# until `reserve` seconds before the deadline, then cancels it and answers
+# from local data instead:
+#   fresh cache -> expired cache entries (stale) -> offline timetable ->
+#   the locally extracted parameters with no results.
+# Degraded responses carry "partial": true (cut short at the deadline) and
+# "stale": true when they come from an expired cache entry. With
+# `degrade=False` the timeout propagates (HTTP 504) instead.
+
+Response = Dict[str, Any]
+Results = List[Dict[str, Any]]
+Fallback = Callable[[], Awaitable[Optional[Response]]]
+OfflineLookup = Callable[[Dict[str, Any]], Optional[Results]]
+
+
+@dataclass(frozen=True)
+class DeadlinePolicy:
+    timeout: float          # whole-pipeline budget in seconds
+    reserve: float = 0.25   # kept back to build and send the degraded answer
+    degrade: bool = True    # answer from local data at the deadline instead of failing
+
+
+def _policy(endpoint: str, timeout: float) -> DeadlinePolicy:
+    prefix = f"DEADLINE_{endpoint.upper()}"
+    return DeadlinePolicy(
+        timeout=float(os.getenv(f"{prefix}_TIMEOUT", str(timeout))),
+        reserve=float(os.getenv(f"{prefix}_RESERVE", "0.25")),
+        degrade=os.getenv(f"{prefix}_DEGRADE", "1").lower() not in ("0", "false", "no"),
+    )
+
+
+# Per endpoint; DEADLINE_<ENDPOINT>_TIMEOUT / _RESERVE / _DEGRADE override
+ENDPOINT_POLICIES: Dict[str, DeadlinePolicy] = {
+    "trains": _policy("trains", 20.0),
+    "flights": _policy("flights", 20.0),
+    "stream": _policy("stream", 30.0),
+    "chat": _policy("chat", 45.0),
+    "batch": _policy("batch", 60.0),
+}
+
+
+def get_policy(endpoint: str) -> DeadlinePolicy:
+    return ENDPOINT_POLICIES.get(endpoint) or ENDPOINT_POLICIES["trains"]
+
+
+def set_policy(endpoint: str, policy: DeadlinePolicy) -> None:
+    ENDPOINT_POLICIES[endpoint] = policy
+
+
+@dataclass(frozen=True)
+class Budget:
+    endpoint: str
+    deadline: float         # time.monotonic()
+    policy: DeadlinePolicy
+
+    def remaining(self) -> float:
+        return self.deadline - time.monotonic()
+
+    def work_time(self) -> float:
+        """Time left for the expensive steps, before the degradation reserve."""
+        return max(0.0, self.remaining() - self.policy.reserve)
+
+
+_budget: "contextvars.ContextVar[Optional[Budget]]" = contextvars.ContextVar("budget", default=None)
+
+
+def current_budget() -> Optional[Budget]:
+    return _budget.get()
+
+
+@contextmanager
+def budget_scope(
+    endpoint: str, deadline: Optional[float] = None, policy: Optional[DeadlinePolicy] = None
+) -> Iterator[Budget]:
+    """Run the enclosed query under `endpoint`'s policy; an enclosing budget can only shorten it."""
+    policy = policy or get_policy(endpoint)
+    if deadline is None:
+        deadline = time.monotonic() + policy.timeout
+    outer = _budget.get()
+    if outer is not None:
+        deadline = min(deadline, outer.deadline)
+    budget = Budget(endpoint, deadline, policy)
+    token = _budget.set(budget)
+    try:
+        yield budget
+    finally:
+        _budget.reset(token)
+
+
+async def within_budget(work: Awaitable[Response], fallback: Fallback) -> Response:
+    """`work`'s answer, or `fallback()`'s when the budget runs out first (the work is cancelled)."""
+    budget = _budget.get()
+    if budget is None:
+        return await work
+    try:
+        return await asyncio.wait_for(work, budget.work_time())
+    except asyncio.TimeoutError:
+        if not budget.policy.degrade:
+            metrics.inc("deadline_exceeded_total", endpoint=budget.endpoint, outcome="timeout")
+            raise
+    response = await fallback()
+    if response is None:
+        metrics.inc("deadline_exceeded_total", endpoint=budget.endpoint, outcome="timeout")
+        raise asyncio.TimeoutError()
+    metrics.inc("deadline_exceeded_total", endpoint=budget.endpoint, outcome="degraded")
+    metrics.annotate(degraded=True, stale=response.get("stale", False))
+    return response
+
+
+async def stream_within_budget(events: AsyncIterator[Dict[str, Any]], fallback: Fallback) -> AsyncIterator[Dict[str, Any]]:
+    """Streaming within_budget: pass events through, then the fallback's events if the budget runs out."""
+    budget = _budget.get()
+    if budget is None:
+        async for event in events:
+            yield event
+        return
+    iterator = events.__aiter__()
+    try:
+        while True:
+            try:
+                event = await asyncio.wait_for(iterator.__anext__(), budget.work_time())
+            except StopAsyncIteration:
+                return
+            except asyncio.TimeoutError:
+                break
+            yield event
+    finally:
+        await iterator.aclose()
+    if not budget.policy.degrade:
+        metrics.inc("deadline_exceeded_total", endpoint=budget.endpoint, outcome="timeout")
+        raise asyncio.TimeoutError()
+    response = await fallback()
+    if response is None:
+        metrics.inc("deadline_exceeded_total", endpoint=budget.endpoint, outcome="timeout")
+        raise asyncio.TimeoutError()
+    metrics.inc("deadline_exceeded_total", endpoint=budget.endpoint, outcome="degraded")
+    yield {"type": "status", "stage": "deadline_degraded"}
+    for event in response_events(response):
+        yield event
+
+
+# -------------------------------
+# Local answers
+# -------------------------------
+def local_results(
+    mode: str, info: Dict[str, Any], cache: Optional[ResultCache], offline: Optional[OfflineLookup] = None
+) -> Tuple[Optional[Results], bool]:
+    """(results, stale) from the freshest local source, or (None, False) when there is none."""
+    params = info if mode == TRAIN_MODE else {**info, "source_code": "", "destination_code": ""}
+    cached = cache.get_stale(CACHE_MODES[mode], params) if cache is not None else None
+    if cached is not None:
+        response, stale = cached
+        return response[RESULT_FIELDS[mode]], stale
+    if offline is not None and mode == TRAIN_MODE:
+        return offline(info), False
+    return None, False
+
+
+def degraded_response(
+    mode: str, info: Dict[str, Any], cache: Optional[ResultCache], offline: Optional[OfflineLookup] = None
+) -> Response:
+    """A partial answer for resolved parameters: local results if any, else the parameters alone."""
+    from models.models import FlightAvailability, TrainAvailability
+
+    results, stale = local_results(mode, info, cache, offline)
+    model = FlightAvailability if mode == FLIGHT_MODE else TrainAvailability
+    response = model.model_validate({**info, RESULT_FIELDS[mode]: results or []}).model_dump(by_alias=True)
+    return {**response, "partial": True, "stale": stale}
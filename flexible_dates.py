@@ -0,0 +1,78 @@
+import asyncio
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+from models.modes import FIELD_MODES, RECORD_KEYS
+from results import RAC, ResultSet
+from router import FLIGHT_MODE, NO_DATE_REASON, FastPathDecision, classify_mode, score_flight_query, score_train_query
+
+# -------------------------------
+# Flexible-date searches
+# -------------------------------
+# "this weekend", "next week" or "18-20 april" expand to a set of dates
+# (see date_resolver.resolve_date_range). Each date is looked up
+# concurrently through the caller's per-date lookup, which shares the
+# result cache, request coalescing and the provider pool, so a week costs
+# about as much wall time as its slowest day. The response keeps every
+# per-date answer and adds a per-date summary:
+#   {source, destination, class | cabin_class, dates,
+#    summary: [{date, results, available, cheapest_fare, cheapest, fastest_minutes, error?}],
+#    by_date: {date: <TrainAvailability / FlightAvailability response>}}
+
+# Resolved parameters (with one date) -> that date's response, or None when no source has data
+DateLookup = Callable[[Dict[str, Any]], Awaitable[Optional[Dict[str, Any]]]]
+
+DATE_REASON = "date phrase not understood"
+
+
+def range_decision(query: str) -> FastPathDecision:
+    """Score the non-date parameters; the range itself replaces whatever single date was found."""
+    decision = score_flight_query(query) if classify_mode(query) == FLIGHT_MODE else score_train_query(query)
+    # A range phrase after "on" ("on the weekend") is not a failed single date, nor a missing one
+    bonus = {DATE_REASON: 0.2, NO_DATE_REASON: 0.1}
+    for reason in set(bonus) & set(decision.reasons):
+        decision = FastPathDecision(round(decision.score + bonus[reason], 2), decision.info,
+                                    [other for other in decision.reasons if other != reason])
+    return decision
+
+
+def summarize_date(travel_date: str, response: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+    summary: Dict[str, Any] = {"date": travel_date, "results": 0, "available": 0,
+                               "cheapest_fare": None, "cheapest": None, "fastest_minutes": None}
+    if response is None or response.get("error"):
+        summary["error"] = (response or {}).get("error", "No availability data")
+        return summary
+    field = next((name for name in FIELD_MODES if name in response), None)
+    if field is None:
+        return summary
+    results = ResultSet(response[field])
+    summary["results"] = len(results)
+    summary["available"] = sum(1 for status in results.status if status <= RAC)
+    cheapest = results.cheapest()
+    if len(cheapest) and cheapest[0].fare > 0:
+        summary["cheapest_fare"] = cheapest[0].fare
+        summary["cheapest"] = cheapest[0].record.get(RECORD_KEYS[FIELD_MODES[field]])
+    fastest = results.fastest()
+    if len(fastest) and fastest[0].duration >= 0:
+        summary["fastest_minutes"] = fastest[0].duration
+    return summary
+
+
+async def search_dates(dates: List[str], info: Dict[str, Any], lookup: DateLookup) -> Dict[str, Any]:
+    """Look up every date concurrently and aggregate the answers."""
+    async def one(travel_date: str) -> Optional[Dict[str, Any]]:
+        try:
+            return await lookup({**info, "date": travel_date})
+        except Exception as e:
+            print(f"❌ Lookup for {travel_date} failed: {type(e).__name__}: {e}")
+            return {"error": f"{type(e).__name__}: {e}"}
+
+    responses = await asyncio.gather(*(one(travel_date) for travel_date in dates))
+    travel_class = {"cabin_class": info["cabin_class"]} if "cabin_class" in info else {"class": info.get("class", "")}
+    return {
+        "source": info.get("source", ""),
+        "destination": info.get("destination", ""),
+        **travel_class,
+        "dates": list(dates),
+        "summary": [summarize_date(d, response) for d, response in zip(dates, responses)],
+        "by_date": {d: response for d, response in zip(dates, responses) if response is not None},
+    }
@@ -0,0 +1,223 @@
+from collections import deque
+from dataclasses import dataclass
+from typing import Dict, Iterator, List, Optional, Tuple
+
+# -------------------------------
+# Station / city gazetteer
+# -------------------------------
+# Every name, alias and station code is compiled once into an Aho-Corasick
+# automaton, so a query is scanned in a single linear pass.
+
+# (code, canonical city, station name, aliases)
+# Cities without a railhead keep an empty code so they still resolve as places.
+STATIONS: List[Tuple[str, str, str, Tuple[str, ...]]] = [
+    ("NDLS", "Delhi", "New Delhi", ("delhi", "new delhi", "dilli")),
+    ("DLI", "Delhi", "Delhi Junction", ("old delhi", "delhi junction")),
+    ("NZM", "Delhi", "Hazrat Nizamuddin", ("nizamuddin", "hazrat nizamuddin")),
+    ("CSMT", "Mumbai", "Mumbai CSMT", ("mumbai", "bombay", "mumbai cst", "csmt", "chhatrapati shivaji terminus")),
+    ("MMCT", "Mumbai", "Mumbai Central", ("mumbai central", "bombay central")),
+    ("LTT", "Mumbai", "Lokmanya Tilak Terminus", ("lokmanya tilak", "kurla")),
+    ("SBC", "Bangalore", "KSR Bengaluru", ("bangalore", "bengaluru", "bengaluru city", "ksr bengaluru")),
+    ("YPR", "Bangalore", "Yesvantpur", ("yesvantpur", "yeshwantpur")),
+    ("MAS", "Chennai", "Chennai Central", ("chennai", "madras", "chennai central")),
+    ("MS", "Chennai", "Chennai Egmore", ("egmore", "chennai egmore")),
+    ("HWH", "Kolkata", "Howrah", ("kolkata", "calcutta", "howrah")),
+    ("SDAH", "Kolkata", "Sealdah", ("sealdah",)),
+    ("PUNE", "Pune", "Pune Junction", ("pune", "poona")),
+    ("SC", "Hyderabad", "Secunderabad", ("hyderabad", "secunderabad")),
+    ("HYB", "Hyderabad", "Hyderabad Deccan", ("hyderabad deccan", "nampally")),
+    ("ADI", "Ahmedabad", "Ahmedabad Junction", ("ahmedabad", "amdavad")),
+    ("JP", "Jaipur", "Jaipur Junction", ("jaipur",)),
+    ("LKO", "Lucknow", "Lucknow Charbagh", ("lucknow",)),
+    ("BSB", "Varanasi", "Varanasi Junction", ("varanasi", "benaras", "banaras", "kashi")),
+    ("PNBE", "Patna", "Patna Junction", ("patna",)),
+    ("BBS", "Bhubaneswar", "Bhubaneswar", ("bhubaneswar", "bhubaneshwar")),
+    ("TVC", "Thiruvananthapuram", "Thiruvananthapuram Central", ("thiruvananthapuram", "trivandrum")),
+    ("ERS", "Kochi", "Ernakulam Junction", ("kochi", "cochin", "ernakulam")),
+    ("MAO", "Goa", "Madgaon", ("goa", "madgaon", "margao")),
+    ("CDG", "Chandigarh", "Chandigarh", ("chandigarh",)),
+    ("JAT", "Jammu", "Jammu Tawi", ("jammu", "jammu tawi")),
+    ("SVDK", "Katra", "Shri Mata Vaishno Devi Katra", ("katra", "vaishno devi")),
+    ("GHY", "Guwahati", "Guwahati", ("guwahati", "gauhati")),
+    ("BPL", "Bhopal", "Bhopal Junction", ("bhopal",)),
+    ("NGP", "Nagpur", "Nagpur Junction", ("nagpur",)),
+    ("AGC", "Agra", "Agra Cantt", ("agra", "agra cantt")),
+    ("CNB", "Kanpur", "Kanpur Central", ("kanpur",)),
+    ("PRYJ", "Prayagraj", "Prayagraj Junction", ("prayagraj", "allahabad")),
+    ("MYS", "Mysore", "Mysuru Junction", ("mysore", "mysuru")),
+    ("CBE", "Coimbatore", "Coimbatore Junction", ("coimbatore",)),
+    ("MDU", "Madurai", "Madurai Junction", ("madurai",)),
+    ("VSKP", "Visakhapatnam", "Visakhapatnam", ("visakhapatnam", "vizag")),
+    ("BZA", "Vijayawada", "Vijayawada Junction", ("vijayawada",)),
+    ("INDB", "Indore", "Indore Junction", ("indore",)),
+    ("UDZ", "Udaipur", "Udaipur City", ("udaipur",)),
+    ("JU", "Jodhpur", "Jodhpur Junction", ("jodhpur",)),
+    ("ASR", "Amritsar", "Amritsar Junction", ("amritsar",)),
+    ("DDN", "Dehradun", "Dehradun", ("dehradun",)),
+    ("HW", "Haridwar", "Haridwar Junction", ("haridwar",)),
+    ("SML", "Shimla", "Shimla", ("shimla", "simla")),
+    ("", "Leh", "", ("leh", "ladakh")),
+    ("", "Manali", "", ("manali",)),
+]
+
+SOURCE_CUES = {"from", "ex", "leaving", "departing"}
+DESTINATION_CUES = {"to", "towards", "till", "until", "into", "reach", "reaching"}
+
+
+@dataclass(frozen=True)
+class Place:
+    code: str
+    city: str
+    station: str
+
+
+@dataclass(frozen=True)
+class PlaceMatch:
+    place: Place
+    start: int
+    end: int
+    role: str = ""  # "source", "destination" or "" when no cue applies
+
+
+class AhoCorasick:
+    """Minimal Aho-Corasick automaton yielding (start, end, payload) for every hit."""
+
+    def __init__(self) -> None:
+        self._goto: List[Dict[str, int]] = [{}]
+        self._fail: List[int] = [0]
+        self._out: List[List[Tuple[int, object]]] = [[]]
+
+    def add(self, pattern: str, payload: object) -> None:
+        state = 0
+        for char in pattern:
+            nxt = self._goto[state].get(char)
+            if nxt is None:
+                nxt = len(self._goto)
+                self._goto.append({})
+                self._fail.append(0)
+                self._out.append([])
+                self._goto[state][char] = nxt
+            state = nxt
+        self._out[state].append((len(pattern), payload))
+
+    def build(self) -> None:
+        queue = deque(self._goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for char, nxt in self._goto[state].items():
+                queue.append(nxt)
+                fail = self._fail[state]
+                while fail and char not in self._goto[fail]:
+                    fail = self._fail[fail]
+                self._fail[nxt] = self._goto[fail].get(char, 0)
+                self._out[nxt] = self._out[nxt] + self._out[self._fail[nxt]]
+
+    def iter_matches(self, text: str) -> Iterator[Tuple[int, int, object]]:
+        state = 0
+        goto, fail, out = self._goto, self._fail, self._out
+        for index, char in enumerate(text):
+            while state and char not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(char, 0)
+            for length, payload in out[state]:
+                yield index - length + 1, index + 1, payload
+
+
+def _is_boundary(text: str, index: int) -> bool:
+    return index < 0 or index >= len(text) or not text[index].isalnum()
+
+
+class Gazetteer:
+    def __init__(self, stations=STATIONS) -> None:
+        self._automaton = AhoCorasick()
+        self._by_code: Dict[str, Place] = {}
+        self._by_alias: Dict[str, Place] = {}
+        self._codes_by_city: Dict[str, List[str]] = {}
+        for code, city, station, aliases in stations:
+            place = Place(code, city, station)
+            if code:
+                self._by_code[code] = place
+                self._codes_by_city.setdefault(city, []).append(code)
+                # Codes only count when written in capitals ("SC", not "sc")
+                self._automaton.add(code.lower(), (place, True))
+            # The first station listed for a city is its default ("delhi" -> NDLS)
+            for alias in (city.lower(), *aliases):
+                if alias in self._by_alias:
+                    continue
+                self._by_alias[alias] = place
+                self._automaton.add(alias, (place, False))
+        self._automaton.build()
+
+    def lookup(self, name: str) -> Optional[Place]:
+        """Resolve a free-text name or station code to a Place."""
+        cleaned = " ".join(name.split())
+        return self._by_alias.get(cleaned.lower()) or self._by_code.get(cleaned.upper())
+
+    def station_codes(self, place: Place) -> List[str]:
+        """Every station code serving the place's city, its own station first."""
+        codes = self._codes_by_city.get(place.city, [])
+        return sorted(codes, key=lambda code: code != place.code)
+
+    def find_places(self, query: str) -> List[PlaceMatch]:
+        """Return non-overlapping place mentions (leftmost-longest) with source/destination roles."""
+        text = query.lower()
+        candidates = []
+        for start, end, (place, needs_upper) in self._automaton.iter_matches(text):
+            if not (_is_boundary(text, start - 1) and _is_boundary(text, end)):
+                continue
+            if needs_upper and not query[start:end].isupper():
+                continue
+            candidates.append((start, end, place))
+        candidates.sort(key=lambda c: (c[0], c[0] - c[1]))
+
+        matches: List[PlaceMatch] = []
+        cursor = 0
+        for start, end, place in candidates:
+            if start >= cursor:
+                matches.append(PlaceMatch(place, start, end))
+                cursor = end
+        return self._assign_roles(text, matches)
+
+    @staticmethod
+    def _assign_roles(text: str, matches: List[PlaceMatch]) -> List[PlaceMatch]:
+        assigned: List[PlaceMatch] = []
+        between = False
+        for match in matches:
+            preceding = text[:match.start].split()
+            cue = preceding[-1] if preceding else ""
+            role = ""
+            if cue in SOURCE_CUES:
+                role = "source"
+            elif cue in DESTINATION_CUES:
+                role = "destination"
+            elif cue == "between":
+                role, between = "source", True
+            elif cue == "and" and between:
+                role = "destination"
+            assigned.append(PlaceMatch(match.place, match.start, match.end, role))
+        return assigned
+
+    def resolve_route(self, query: str) -> Tuple[Optional[PlaceMatch], Optional[PlaceMatch]]:
+        """Pick the source and destination mentions, falling back to mention order."""
+        matches = self.find_places(query)
+        source = next((m for m in matches if m.role == "source"), None)
+        destination = next((m for m in matches if m.role == "destination"), None)
+        for match in matches:
+            if match.role or match is source or match is destination:
+                continue
+            if source is None and (destination is None or match.start < destination.start):
+                source = match
+            elif destination is None:
+                destination = match
+        return source, destination
+
+
+_gazetteer: Optional[Gazetteer] = None
+
+
+def get_gazetteer() -> Gazetteer:
+    """Return the process-wide gazetteer, compiling it on first use."""
+    global _gazetteer
+    if _gazetteer is None:
+        _gazetteer = Gazetteer()
+    return _gazetteer
@@ -0,0 +1,271 @@
+import heapq
+from datetime import date, datetime, timedelta
+from functools import lru_cache
+from typing import Any, Dict, List, Optional, Tuple
+
+from gazetteer import get_gazetteer
+from timetable import MINUTES_PER_DAY, Timetable, get_timetable
+
+# -------------------------------
+# Connecting-journey search
+# -------------------------------
+# Round-based connection scan (CSA with RAPTOR-style rounds): each round
+# is one linear scan over the day's elementary connections (one per
+# consecutive stop pair), sorted by departure time, so round k yields the
+# earliest arrival using exactly k trains. Stations of the same city are
+# linked by footpaths (e.g. Mumbai CSMT <-> Mumbai Central).
+
+MIN_TRANSFER_MINUTES = 30
+CITY_TRANSFER_MINUTES = 90
+MAX_CHANGES = 2
+MAX_TRIP_DAYS = 3       # a train may reach a station up to this many days after leaving its origin
+HORIZON_DAYS = 3        # how far past the travel date a journey may arrive
+INF = float("inf")
+
+TripKey = Tuple[int, int]  # (trip, origin day offset relative to the travel date)
+
+
+class JourneyPlanner:
+    def __init__(self, timetable: Timetable) -> None:
+        self.timetable = timetable
+        t = timetable
+        connections = []
+        for trip in range(len(t.trip_numbers)):
+            for stop in range(t.trip_offsets[trip], t.trip_offsets[trip + 1] - 1):
+                connections.append((t.stop_departure[stop], t.stop_arrival[stop + 1], stop, trip))
+        connections.sort()
+        self.c_dep = [c[0] for c in connections]
+        self.c_arr = [c[1] for c in connections]
+        self.c_stop = [c[2] for c in connections]
+        self.c_trip = [c[3] for c in connections]
+        self.c_from = [t.stop_station[c[2]] for c in connections]
+        self.c_to = [t.stop_station[c[2] + 1] for c in connections]
+        self.stop_connection = {stop: ci for ci, stop in enumerate(self.c_stop)}
+        self.footpaths = self._city_footpaths()
+        self._events_for = lru_cache(maxsize=8)(self._build_events)
+
+    def _city_footpaths(self) -> Dict[int, List[Tuple[int, int]]]:
+        gazetteer = get_gazetteer()
+        by_city: Dict[str, List[int]] = {}
+        for index, code in enumerate(self.timetable.station_codes):
+            place = gazetteer.lookup(code)
+            if place is not None and place.code == code:
+                by_city.setdefault(place.city, []).append(index)
+        footpaths: Dict[int, List[Tuple[int, int]]] = {}
+        for stations in by_city.values():
+            for station in stations:
+                footpaths[station] = [(other, CITY_TRANSFER_MINUTES) for other in stations if other != station]
+        return footpaths
+
+    def _build_events(self, travel_date: date) -> List[Tuple[int, int, int]]:
+        """(absolute departure, connection, origin offset) for trains around the travel date."""
+        streams = []
+        runs_on = self.timetable.trip_runs_on
+        for offset in range(-MAX_TRIP_DAYS, HORIZON_DAYS):
+            weekday = (travel_date + timedelta(days=offset)).weekday()
+            shift = offset * MINUTES_PER_DAY
+            streams.append([
+                (self.c_dep[ci] + shift, ci, offset)
+                for ci in range(len(self.c_dep))
+                if runs_on[self.c_trip[ci]] >> weekday & 1
+            ])
+        return list(heapq.merge(*streams))
+
+    def _scan(
+        self,
+        sources: List[int],
+        targets: List[int],
+        travel_date: date,
+        earliest: int,
+        max_changes: int,
+    ) -> List[List[Tuple[TripKey, int, int]]]:
+        """Return, per number of trains, the legs (trip, board connection, alight connection)."""
+        n = self.timetable.n_stations
+        horizon = HORIZON_DAYS * MINUTES_PER_DAY
+        source_set = set(sources)
+        events = self._events_for(travel_date)
+        rounds = max_changes + 1
+        arrival = [[INF] * n for _ in range(rounds + 1)]
+        parents: List[Dict[int, Any]] = [{} for _ in range(rounds + 1)]
+
+        for r in range(1, rounds + 1):
+            boarded: Dict[TripKey, int] = {}
+            best_target = INF
+            previous, current, parent = arrival[r - 1], arrival[r], parents[r]
+            for dep, ci, offset in events:
+                if dep > best_target or dep > horizon:
+                    break
+                if dep < earliest:
+                    continue
+                key = (self.c_trip[ci], offset)
+                if key not in boarded:
+                    origin = self.c_from[ci]
+                    if r == 1:
+                        can_board = origin in source_set and dep < MINUTES_PER_DAY
+                    else:
+                        arrived_by = parents[r - 1].get(origin)
+                        same_train = isinstance(arrived_by, tuple) and arrived_by[0] == key
+                        can_board = not same_train and previous[origin] + MIN_TRANSFER_MINUTES <= dep
+                    if not can_board:
+                        continue
+                    boarded[key] = ci
+                arr = self.c_arr[ci] + offset * MINUTES_PER_DAY
+                destination = self.c_to[ci]
+                if arr < current[destination]:
+                    current[destination] = arr
+                    parent[destination] = (key, boarded[key], ci)
+                    if destination in targets:
+                        best_target = min(best_target, arr)
+            for station in [s for s in range(n) if current[s] < INF]:
+                for other, walk in self.footpaths.get(station, ()):
+                    if current[station] + walk < current[other]:
+                        current[other] = current[station] + walk
+                        parent[other] = ("walk", station)
+
+        journeys = []
+        for r in range(1, rounds + 1):
+            target = min(targets, key=lambda s: arrival[r][s])
+            if arrival[r][target] == INF:
+                journeys.append([])
+                continue
+            legs = []
+            station, k = target, r
+            while k > 0:
+                step = parents[k][station]
+                if step[0] == "walk":
+                    station = step[1]
+                    continue
+                legs.append(step)
+                station = self.c_from[step[1]]
+                k -= 1
+            journeys.append(list(reversed(legs)))
+        return journeys
+
+    def _fewer_changes(self, legs: List[Tuple[TripKey, int, int]]) -> List[Tuple[TripKey, int, int]]:
+        """Board a later train at an earlier change when it calls there in time (A, B, C -> A, C)."""
+        t = self.timetable
+        legs = list(legs)
+        i = 0
+        while i < len(legs) - 2:
+            (_, offset), _, alight_ci = legs[i]
+            ready = self.c_arr[alight_ci] + offset * MINUTES_PER_DAY + MIN_TRANSFER_MINUTES
+            station = self.c_to[alight_ci]
+            walks = {station: 0, **dict(self.footpaths.get(station, ()))}
+            for j in range(len(legs) - 1, i + 1, -1):
+                (trip, trip_offset), board_ci, last_ci = legs[j]
+                shift = trip_offset * MINUTES_PER_DAY
+                board = next((stop for stop in range(t.trip_offsets[trip], self.c_stop[board_ci])
+                              if t.stop_station[stop] in walks
+                              and ready + walks[t.stop_station[stop]] <= t.stop_departure[stop] + shift), None)
+                if board is not None:
+                    legs[i + 1:j + 1] = [((trip, trip_offset), self.stop_connection[board], last_ci)]
+                    break
+            i += 1
+        return legs
+
+    def _itinerary(
+        self, legs: List[Tuple[TripKey, int, int]], travel_date: date, travel_class: str
+    ) -> Tuple[Tuple[int, int, int], Dict[str, Any]]:
+        """Build an Itinerary dict; also returns its (arrival, duration, fare) rank."""
+        t = self.timetable
+        journey_legs = []
+        for (trip, offset), board_ci, alight_ci in legs:
+            board, alight = self.c_stop[board_ci], self.c_stop[alight_ci] + 1
+            leg_date = travel_date + timedelta(days=offset + t.stop_departure[board] // MINUTES_PER_DAY)
+            journey_legs.append({
+                **t.train_info(board, alight, travel_class),
+                "from_station": t.station_codes[t.stop_station[board]],
+                "to_station": t.station_codes[t.stop_station[alight]],
+                "departure_date": leg_date.isoformat(),
+            })
+        (_, first_offset), first_ci, _ = legs[0]
+        (_, last_offset), _, last_ci = legs[-1]
+        start = self.c_dep[first_ci] + first_offset * MINUTES_PER_DAY
+        end = self.c_arr[last_ci] + last_offset * MINUTES_PER_DAY
+        minutes = end - start
+        fare = sum(leg["fare"] for leg in journey_legs)
+        midnight = datetime.combine(travel_date, datetime.min.time())
+        itinerary = {
+            "departure": (midnight + timedelta(minutes=start)).strftime("%Y-%m-%dT%H:%M"),
+            "arrival": (midnight + timedelta(minutes=end)).strftime("%Y-%m-%dT%H:%M"),
+            "duration": f"{minutes // 60}h {minutes % 60:02d}m",
+            "changes": len(journey_legs) - 1,
+            "fare": fare,
+            "legs": journey_legs,
+        }
+        return (end, minutes, fare), itinerary
+
+    def plan(
+        self,
+        from_stations: List[int],
+        to_stations: List[int],
+        travel_date: date,
+        travel_class: str = "3A",
+        max_changes: int = MAX_CHANGES,
+        min_changes: int = 1,
+        limit: int = 3,
+    ) -> List[Dict[str, Any]]:
+        """Non-dominated itineraries departing on `travel_date`, ranked by arrival, duration and fare."""
+        if not from_stations or not to_stations:
+            return []
+        found: Dict[Tuple, Tuple[Tuple[int, int, int], Dict[str, Any]]] = {}
+        earliest = 0
+        # Re-scan from just after the earliest departure found to collect later alternatives
+        for _ in range(limit * 2):
+            departures = []
+            for legs in self._scan(from_stations, to_stations, travel_date, earliest, max_changes):
+                if not legs:
+                    continue
+                (_, offset), first_ci, _ = legs[0]
+                departures.append(self.c_dep[first_ci] + offset * MINUTES_PER_DAY)
+                legs = self._fewer_changes(legs)
+                if len(legs) - 1 < min_changes:
+                    continue
+                signature = tuple(key for key, _, _ in legs)
+                if signature not in found:
+                    found[signature] = self._itinerary(legs, travel_date, travel_class)
+            if not departures or min(departures) + 1 >= MINUTES_PER_DAY:
+                break
+            earliest = min(departures) + 1
+        # Keep the Pareto set: drop itineraries another one beats on arrival,
+        # trip length (i.e. departure), changes and fare at once
+        ranked = sorted(found.values(), key=lambda item: (item[0], item[1]["changes"]))
+        best: List[Tuple[Tuple[int, int, int, int], Dict[str, Any]]] = []
+        for (end, minutes, fare), itinerary in ranked:
+            criteria = (end, minutes, itinerary["changes"], fare)
+            if not any(all(b <= a for a, b in zip(criteria, other)) for other, _ in best):
+                best.append((criteria, itinerary))
+        return [itinerary for _, itinerary in best][:limit]
+
+    def plan_for(self, info: Dict[str, Any], limit: int = 3) -> List[Dict[str, Any]]:
+        """Plan from TrainAvailability-style params; [] when a place is unknown."""
+        from_stations = self.timetable.resolve_stations(info.get("source", ""), info.get("source_code", ""))
+        to_stations = self.timetable.resolve_stations(info.get("destination", ""), info.get("destination_code", ""))
+        try:
+            travel_date = date.fromisoformat(info.get("date", ""))
+        except ValueError:
+            travel_date = date.today() + timedelta(days=1)
+        return self.plan(from_stations or [], to_stations or [], travel_date, info.get("class", "3A"), limit=limit)
+
+
+_planner: Optional[JourneyPlanner] = None
+
+
+def get_journey_planner() -> JourneyPlanner:
+    global _planner
+    if _planner is None:
+        _planner = JourneyPlanner(get_timetable())
+    return _planner
+
+
+def attach_itineraries(response: Dict[str, Any], limit: int = 3) -> Dict[str, Any]:
+    """Add connecting itineraries to a train response that has no direct trains."""
+    if response.get("trains") or response.get("error"):
+        return response
+    itineraries = get_journey_planner().plan_for(response, limit=limit)
+    if not itineraries:
+        return response
+
+    from models.models import JourneyAvailability
+    validated = JourneyAvailability.model_validate({**response, "itineraries": itineraries})
+    return validated.model_dump(by_alias=True)
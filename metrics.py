@@ -0,0 +1,376 @@
+import asyncio
+import functools
+import inspect
+import json
+import os
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import TYPE_CHECKING, Any, Callable, Dict, IO, Iterator, List, Optional, Tuple
+
+from stages import collect_stages, collecting_into, current_stages, record_stage, stage
+
+if TYPE_CHECKING:
+    from agents import RunHooks
+    from agents.models.interface import ModelProvider
+
+# -------------------------------
+# Metrics and tracing
+# -------------------------------
+# Off unless METRICS_ENABLED=1 (or enable() is called). When off, every
+# helper returns after one global check, and traced() calls the wrapped
+# function directly. When on:
+#   - counters and latency histograms accumulate in-process and render as
+#     Prometheus text (serve_metrics() / METRICS_PORT exposes /metrics),
+#   - each traced request appends one JSON line (METRICS_JSONL) with its
+#     duration, per-stage spans (see stages.py) and token usage.
+
+PREFIX = "travel_agent_"
+LATENCY_BUCKETS_MS = (1, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000, 30000, 60000)
+
+Labels = Tuple[Tuple[str, str], ...]
+
+_enabled = os.getenv("METRICS_ENABLED", "").lower() in ("1", "true", "yes")
+_trace: ContextVar[Optional[Dict[str, Any]]] = ContextVar("metrics_trace", default=None)
+
+
+class Histogram:
+    def __init__(self, buckets: Tuple[float, ...] = LATENCY_BUCKETS_MS) -> None:
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)  # last slot is +Inf
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+
+class MetricsRegistry:
+    def __init__(self) -> None:
+        self.counters: Dict[str, Dict[Labels, float]] = {}
+        self.histograms: Dict[str, Dict[Labels, Histogram]] = {}
+        self._lock = threading.Lock()  # the /metrics thread reads while the event loop writes
+
+    def inc(self, name: str, amount: float = 1, **labels: str) -> None:
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            series = self.counters.setdefault(name, {})
+            series[key] = series.get(key, 0) + amount
+
+    def observe(self, name: str, value: float, **labels: str) -> None:
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            series = self.histograms.setdefault(name, {})
+            histogram = series.get(key)
+            if histogram is None:
+                histogram = series[key] = Histogram()
+            histogram.observe(value)
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "counters": {name: {_label_text(k): v for k, v in series.items()}
+                             for name, series in self.counters.items()},
+                "histograms": {name: {_label_text(k): {"count": h.count, "sum": round(h.sum, 3)}
+                                      for k, h in series.items()}
+                               for name, series in self.histograms.items()},
+            }
+
+    def render_prometheus(self) -> str:
+        lines: List[str] = []
+        with self._lock:
+            for name, series in sorted(self.counters.items()):
+                lines.append(f"# TYPE {PREFIX}{name} counter")
+                for labels, value in sorted(series.items()):
+                    lines.append(f"{PREFIX}{name}{_label_text(labels)} {value:g}")
+            for name, series in sorted(self.histograms.items()):
+                lines.append(f"# TYPE {PREFIX}{name} histogram")
+                for labels, histogram in sorted(series.items()):
+                    cumulative = 0
+                    for bound, count in zip(histogram.buckets + (float("inf"),), histogram.counts):
+                        cumulative += count
+                        le = "+Inf" if bound == float("inf") else f"{bound:g}"
+                        lines.append(f"{PREFIX}{name}_bucket{_label_text(labels + (('le', le),))} {cumulative}")
+                    lines.append(f"{PREFIX}{name}_sum{_label_text(labels)} {histogram.sum:.3f}")
+                    lines.append(f"{PREFIX}{name}_count{_label_text(labels)} {histogram.count}")
+        return "\n".join(lines) + "\n"
+
+
+def _label_text(labels: Labels) -> str:
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{key}="{value}"' for key, value in labels) + "}"
+
+
+class JsonlExporter:
+    """Appends one JSON object per line; the file is opened lazily and line-buffered."""
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+        self._file: Optional[IO[str]] = None
+
+    def write(self, record: Dict[str, Any]) -> None:
+        if self._file is None:
+            self._file = open(self.path, "a", encoding="utf-8", buffering=1)
+        self._file.write(json.dumps(record, default=str) + "\n")
+
+    def close(self) -> None:
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+
+_registry = MetricsRegistry()
+_exporter: Optional[JsonlExporter] = JsonlExporter(os.environ["METRICS_JSONL"]) if os.getenv("METRICS_JSONL") else None
+
+
+def enabled() -> bool:
+    return _enabled
+
+
+def enable(jsonl_path: Optional[str] = None) -> None:
+    global _enabled, _exporter
+    _enabled = True
+    if jsonl_path is not None:
+        if _exporter is not None:
+            _exporter.close()
+        _exporter = JsonlExporter(jsonl_path)
+
+
+def disable() -> None:
+    global _enabled, _exporter
+    _enabled = False
+    if _exporter is not None:
+        _exporter.close()
+    _exporter = None
+
+
+def get_registry() -> MetricsRegistry:
+    return _registry
+
+
+def reset() -> None:
+    """Drop all collected series (tests, benchmarks)."""
+    global _registry
+    _registry = MetricsRegistry()
+
+
+def inc(name: str, amount: float = 1, **labels: str) -> None:
+    if _enabled:
+        _registry.inc(name, amount, **labels)
+
+
+def observe(name: str, value: float, **labels: str) -> None:
+    if _enabled:
+        _registry.observe(name, value, **labels)
+
+
+def annotate(**fields: Any) -> None:
+    """Attach fields to the current request's trace record (no-op outside a trace)."""
+    record = _trace.get() if _enabled else None
+    if record is not None:
+        record.update(fields)
+
+
+def record_usage(input_tokens: int, output_tokens: int) -> None:
+    if not _enabled:
+        return
+    _registry.inc("tokens_total", input_tokens, kind="input")
+    _registry.inc("tokens_total", output_tokens, kind="output")
+    record = _trace.get()
+    if record is not None:
+        tokens = record.setdefault("tokens", {"input": 0, "output": 0})
+        tokens["input"] += input_tokens
+        tokens["output"] += output_tokens
+
+
+# -------------------------------
+# Request traces
+# -------------------------------
+def _finish(name: str, record: Dict[str, Any], spans: Dict[str, List[float]], started: float, status: str) -> None:
+    duration = (time.perf_counter() - started) * 1000
+    _registry.inc("requests_total", agent=name, status=status)
+    _registry.observe("request_duration_ms", duration, agent=name)
+    for span, values in spans.items():
+        for value in values:
+            _registry.observe("stage_duration_ms", value, stage=span)
+    if _exporter is not None:
+        _exporter.write({
+            **record,
+            "duration_ms": round(duration, 3),
+            "status": status,
+            "spans": {span: [round(v, 3) for v in values] for span, values in spans.items()},
+        })
+
+
+@contextmanager
+def _tracing(record: Dict[str, Any]) -> Iterator[None]:
+    token = _trace.set(record)
+    try:
+        yield
+    finally:
+        _trace.reset(token)
+
+
+def traced(name: str) -> Callable:
+    """Trace an async function or async generator as one request named `name`."""
+    def decorate(fn: Callable) -> Callable:
+        if inspect.isasyncgenfunction(fn):
+            @functools.wraps(fn)
+            async def generator_wrapper(*args, **kwargs):
+                if not _enabled:
+                    async for item in fn(*args, **kwargs):
+                        yield item
+                    return
+                record = {"ts": time.time(), "name": name}
+                spans = current_stages()
+                if spans is None:
+                    spans = {}
+                started, status = time.perf_counter(), "error"
+                iterator = fn(*args, **kwargs).__aiter__()
+                try:
+                    while True:
+                        # Set and reset the context per step, never across a yield:
+                        # the consumer may drive each step in a new task (asyncio.wait_for)
+                        with _tracing(record), collecting_into(spans):
+                            try:
+                                item = await iterator.__anext__()
+                            except StopAsyncIteration:
+                                break
+                        yield item
+                    status = "ok"
+                finally:
+                    with _tracing(record), collecting_into(spans):
+                        await iterator.aclose()
+                    _finish(name, record, spans, started, status)
+            return generator_wrapper
+
+        @functools.wraps(fn)
+        async def wrapper(*args, **kwargs):
+            if not _enabled:
+                return await fn(*args, **kwargs)
+            record = {"ts": time.time(), "name": name}
+            token = _trace.set(record)
+            started, status = time.perf_counter(), "error"
+            try:
+                with collect_stages() as spans:
+                    result = await fn(*args, **kwargs)
+                status = "error" if isinstance(result, dict) and result.get("error") else "ok"
+                return result
+            finally:
+                _trace.reset(token)
+                _finish(name, record, spans, started, status)
+        return wrapper
+    return decorate
+
+
+# -------------------------------
+# Agents SDK integration
+# -------------------------------
+def instrument_model_provider(provider: "ModelProvider") -> "ModelProvider":
+    """Wrap a ModelProvider so every model turn is a model_turn span and reports token usage."""
+    from agents.models.interface import Model, ModelProvider
+    from openai.types.responses import ResponseCompletedEvent
+
+    class InstrumentedModel(Model):
+        def __init__(self, model: Model) -> None:
+            self.model = model
+
+        async def get_response(self, *args, **kwargs):
+            with stage("model_turn"):
+                response = await self.model.get_response(*args, **kwargs)
+            record_usage(response.usage.input_tokens, response.usage.output_tokens)
+            return response
+
+        async def stream_response(self, *args, **kwargs):
+            with stage("model_turn"):
+                async for event in self.model.stream_response(*args, **kwargs):
+                    if isinstance(event, ResponseCompletedEvent) and event.response.usage:
+                        record_usage(event.response.usage.input_tokens, event.response.usage.output_tokens)
+                    yield event
+
+    class InstrumentedModelProvider(ModelProvider):
+        def get_model(self, model_name: Optional[str]) -> Model:
+            return InstrumentedModel(provider.get_model(model_name))
+
+    return InstrumentedModelProvider()
+
+
+_hooks: Optional["RunHooks"] = None
+
+
+def run_hooks() -> Optional["RunHooks"]:
+    """RunHooks timing function tool calls as tool_call spans; None when metrics are off."""
+    global _hooks
+    if not _enabled:
+        return None
+    if _hooks is None:
+        from agents import RunHooks
+
+        class ToolTimingHooks(RunHooks):
+            def __init__(self) -> None:
+                self._started: Dict[Tuple[int, str], float] = {}
+
+            async def on_tool_start(self, context, agent, tool) -> None:
+                self._started[(id(asyncio.current_task()), tool.name)] = time.perf_counter()
+
+            async def on_tool_end(self, context, agent, tool, result) -> None:
+                started = self._started.pop((id(asyncio.current_task()), tool.name), None)
+                inc("tool_calls_total", tool=tool.name)
+                if started is not None:
+                    record_stage("tool_call", (time.perf_counter() - started) * 1000)
+
+        _hooks = ToolTimingHooks()
+    return _hooks
+
+
+def count_hosted_tool_calls(result: Any) -> None:
+    """Count hosted tool calls (e.g. WebSearchTool) in a finished run; they bypass RunHooks."""
+    if not _enabled:
+        return
+    for item in getattr(result, "new_items", ()):
+        raw_type = getattr(getattr(item, "raw_item", None), "type", "")
+        if raw_type == "web_search_call":
+            _registry.inc("tool_calls_total", tool="web_search")
+
+
+# -------------------------------
+# /metrics endpoint
+# -------------------------------
+def serve_metrics(port: int, host: str = "127.0.0.1"):
+    """Serve Prometheus text at http://host:port/metrics from a daemon thread."""
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self) -> None:
+            if self.path.split("?")[0] != "/metrics":
+                self.send_error(404)
+                return
+            body = get_registry().render_prometheus().encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format: str, *args: Any) -> None:
+            pass
+
+    server = ThreadingHTTPServer((host, port), Handler)
+    threading.Thread(target=server.serve_forever, name="metrics", daemon=True).start()
+    return server
+
+
+def maybe_serve_metrics(worker: int = 0) -> None:
+    """Start the /metrics endpoint when METRICS_PORT is set and metrics are enabled.
+
+    Each pre-forked server worker has its own registry and serves it on
+    METRICS_PORT + its worker index; scrape every port and sum.
+    """
+    port = os.getenv("METRICS_PORT")
+    if port and _enabled:
+        serve_metrics(int(port) + worker)
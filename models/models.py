@@ -1,6 +1,6 @@
 from pydantic import BaseModel
 from typing import Literal, List, Optional
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, Field, field_validator
 
 # -------------------------------
 # Pydantic Output Schema
@@ -21,12 +21,37 @@ class TrainAvailability(BaseModel):
     class_type: str = Field(..., alias="class")
     trains: List[TrainInfo]
 
+class JourneyLeg(TrainInfo):
+    from_station: str
+    to_station: str
+    departure_date: str  # Format: YYYY-MM-DD, the date this leg departs
+
+class Itinerary(BaseModel):
+    departure: str  # Format: YYYY-MM-DDTHH:MM
+    arrival: str
+    duration: str
+    changes: int
+    fare: int
+    legs: List[JourneyLeg]
+
+class JourneyAvailability(TrainAvailability):
+    itineraries: List[Itinerary] = []
+
 class FlightQueryRequest(BaseModel):
     source: str
     destination: str
     date: str  # Format: YYYY-MM-DD
     cabin_class: Literal["economy", "business", "first"] = "economy"
 
+    @field_validator("cabin_class", mode="before")
+    @classmethod
+    def normalize_cabin_class(cls, value):
+        # Models and users write "Economy", "Business Class", "premium economy"
+        if isinstance(value, str):
+            value = value.strip().lower().removesuffix(" class")
+            return "economy" if value in ("", "premium economy", "premium_economy") else value
+        return value
+
 from pydantic import BaseModel
 from typing import List
 
@@ -0,0 +1,14 @@
+# -------------------------------
+# Transport modes and their response fields
+# -------------------------------
+# Kept free of pydantic so the router, providers and streaming code can
+# import them without loading the schemas in models.models.
+
+TRAIN_MODE = "train"
+FLIGHT_MODE = "flight"
+
+# mode -> response field holding its results, and the key naming one result
+RESULT_FIELDS = {TRAIN_MODE: "trains", FLIGHT_MODE: "flights"}
+RECORD_KEYS = {TRAIN_MODE: "train_number", FLIGHT_MODE: "flight_number"}
+# response field -> mode (also the event type of a streamed record)
+FIELD_MODES = {field: mode for mode, field in RESULT_FIELDS.items()}
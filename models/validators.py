@@ -0,0 +1,50 @@
+from functools import lru_cache
+from typing import Any, Union
+
+from pydantic import BaseModel, TypeAdapter
+
+from models.models import FlightAvailability, TrainAvailability
+
+# -------------------------------
+# Prebuilt validators
+# -------------------------------
+# Building a validator is the expensive part of pydantic validation, so
+# each output type gets one TypeAdapter for the life of the process.
+# JSON text is validated straight from the string (no json.loads pass).
+
+TransportOutput = Union[TrainAvailability, FlightAvailability]
+
+
+@lru_cache(maxsize=None)
+def get_validator(output_type: Any) -> TypeAdapter:
+    return TypeAdapter(output_type)
+
+
+def strip_code_fence(text: str) -> str:
+    """Remove a ```json ... ``` (or bare ```) wrapper around model text."""
+    text = text.strip()
+    if text.startswith("```json"):
+        return text.replace("```json", "").replace("```", "").strip()
+    if text.startswith("```"):
+        return text.replace("```", "").strip()
+    return text
+
+
+def validate_output(output: Any, output_type: Any = TransportOutput) -> Any:
+    """Validate agent output (model instance, dict or JSON text) into `output_type`.
+
+    Instances produced by a structured-output run are returned as they are.
+    Raises pydantic.ValidationError, with type "json_invalid" for non-JSON text.
+    """
+    if isinstance(output, BaseModel) and isinstance(output, _model_types(output_type)):
+        return output
+    validator = get_validator(output_type)
+    if isinstance(output, str):
+        return validator.validate_json(strip_code_fence(output))
+    return validator.validate_python(output)
+
+
+@lru_cache(maxsize=None)
+def _model_types(output_type: Any) -> tuple:
+    members = getattr(output_type, "__args__", None) or (output_type,)
+    return tuple(member for member in members if isinstance(member, type))
@@ -0,0 +1,220 @@
+import asyncio
+import os
+import time
+from array import array
+from datetime import date, timedelta
+from typing import Any, Awaitable, Callable, Dict, Hashable, List, Optional, Tuple
+
+import metrics
+from cache import CacheKey, ResultCache, get_result_cache, make_key
+from providers import CACHE_MODES
+from router import FLIGHT_MODE
+
+# -------------------------------
+# Popularity tracking and cache prewarming
+# -------------------------------
+# Every confidently resolved query feeds a PopularityTracker: a count-min
+# sketch with exponential decay (recent traffic counts most) plus a small
+# candidate set for top-k. Routes are tracked with the date as an offset
+# from today, so "Delhi -> Mumbai tomorrow in 3A" stays one hot entry
+# from one day to the next. A Prewarmer periodically takes the top-N
+# (route, date, class) combinations and refreshes the ones whose cache
+# entry is missing or expires within `refresh_ahead` seconds, spending at
+# most `max_requests` lookups per cycle. It counts the user requests later
+# served from an entry it stored (prewarm_served_total). With pre-forked
+# server workers it runs in worker 0 only, against the shared cache: its
+# tracker sees that worker's share of the traffic, which ranks the same
+# routes, and the request budget is not multiplied by the worker count.
+
+DEFAULT_HALF_LIFE = float(os.getenv("PREWARM_HALF_LIFE", str(6 * 60 * 60)))
+DEFAULT_TOP_N = int(os.getenv("PREWARM_TOP_N", "20"))
+DEFAULT_INTERVAL = float(os.getenv("PREWARM_INTERVAL", "30"))
+DEFAULT_MAX_REQUESTS = int(os.getenv("PREWARM_MAX_REQUESTS", "10"))
+DEFAULT_REFRESH_AHEAD = float(os.getenv("PREWARM_REFRESH_AHEAD", "20"))
+DEFAULT_CONCURRENCY = int(os.getenv("PREWARM_CONCURRENCY", "4"))
+MAX_DAY_OFFSET = 30
+RESCALE_AT = 2.0 ** 40
+
+# (mode, resolved parameters with the date to look up) -> response, or None without data
+RefreshFn = Callable[[str, Dict[str, Any]], Awaitable[Optional[Dict[str, Any]]]]
+RouteKey = Tuple[str, str, str, int, str]    # mode, source, destination, day offset, class
+
+
+class PopularityTracker:
+    """Decayed count-min sketch with a bounded set of top-k candidates."""
+
+    def __init__(
+        self,
+        width: int = 2048,
+        depth: int = 4,
+        half_life: float = DEFAULT_HALF_LIFE,
+        capacity: int = 256,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        self.width = width
+        self.half_life = half_life
+        self.capacity = capacity
+        self.clock = clock
+        self._rows = [array("d", [0.0]) * width for _ in range(depth)]
+        self._epoch = clock()
+        # Route -> the latest parameters seen for it (without the date)
+        self._candidates: Dict[RouteKey, Dict[str, Any]] = {}
+
+    def _weight(self) -> float:
+        # Forward decay: new events weigh 2^(age/half_life) more than events at the epoch
+        return 2.0 ** ((self.clock() - self._epoch) / self.half_life)
+
+    def _rescale(self, weight: float) -> None:
+        for row in self._rows:
+            for index in range(self.width):
+                row[index] /= weight
+        self._epoch = self.clock()
+
+    def _cells(self, key: Hashable) -> List[int]:
+        return [hash((seed, key)) % self.width for seed in range(len(self._rows))]
+
+    def add(self, key: RouteKey, params: Dict[str, Any]) -> None:
+        weight = self._weight()
+        if weight > RESCALE_AT:
+            self._rescale(weight)
+            weight = 1.0
+        for row, index in zip(self._rows, self._cells(key)):
+            row[index] += weight
+        self._candidates[key] = params
+        if len(self._candidates) > 2 * self.capacity:
+            keep = sorted(self._candidates, key=self.estimate, reverse=True)[:self.capacity]
+            self._candidates = {route: self._candidates[route] for route in keep}
+
+    def estimate(self, key: RouteKey) -> float:
+        """Decayed request count (an overestimate bounded by the sketch width)."""
+        return min(row[index] for row, index in zip(self._rows, self._cells(key))) / self._weight()
+
+    def top(self, n: int) -> List[Tuple[float, RouteKey, Dict[str, Any]]]:
+        ranked = sorted(((self.estimate(key), key, params) for key, params in self._candidates.items()),
+                        key=lambda item: item[0], reverse=True)
+        return ranked[:n]
+
+
+def _cache_params(mode: str, info: Dict[str, Any]) -> Dict[str, Any]:
+    # Flight responses are cached under city names only (see ResultCache.lookup_flights)
+    if mode == FLIGHT_MODE:
+        return {**info, "source_code": "", "destination_code": ""}
+    return info
+
+
+class Prewarmer:
+    def __init__(
+        self,
+        tracker: Optional[PopularityTracker] = None,
+        cache: Optional[ResultCache] = None,
+        top_n: int = DEFAULT_TOP_N,
+        interval: float = DEFAULT_INTERVAL,
+        max_requests: int = DEFAULT_MAX_REQUESTS,
+        refresh_ahead: float = DEFAULT_REFRESH_AHEAD,
+        concurrency: int = DEFAULT_CONCURRENCY,
+        today: Callable[[], date] = date.today,
+    ) -> None:
+        self.tracker = tracker or PopularityTracker()
+        self._cache = cache
+        self.top_n = top_n
+        self.interval = interval
+        self.max_requests = max_requests
+        self.refresh_ahead = refresh_ahead
+        self.concurrency = concurrency
+        self.today = today
+        self.stats = {"cycles": 0, "refreshed": 0, "fresh": 0, "no_data": 0, "failed": 0,
+                      "over_budget": 0, "served": 0}
+        self._prewarmed: Dict[CacheKey, bool] = {}
+
+    @property
+    def cache(self) -> ResultCache:
+        return self._cache if self._cache is not None else get_result_cache()
+
+    def _route(self, mode: str, info: Dict[str, Any]) -> Optional[RouteKey]:
+        try:
+            offset = (date.fromisoformat(info.get("date", "")) - self.today()).days
+        except ValueError:
+            return None
+        if not 0 <= offset <= MAX_DAY_OFFSET:
+            return None
+        _, source, destination, _, travel_class = make_key(CACHE_MODES[mode], _cache_params(mode, info))
+        return mode, source, destination, offset, travel_class
+
+    def observe(self, mode: str, info: Dict[str, Any], cached: bool) -> None:
+        """Record a resolved user query; `cached` when it was answered from the cache."""
+        route = self._route(mode, info)
+        if route is not None:
+            self.tracker.add(route, {key: value for key, value in info.items() if key != "date"})
+        key = make_key(CACHE_MODES[mode], _cache_params(mode, info))
+        if not cached:
+            # A miss means the prewarmed entry (if any) expired unused
+            self._prewarmed.pop(key, None)
+        elif self._prewarmed.get(key):
+            self.stats["served"] += 1
+            metrics.inc("prewarm_served_total", mode=mode)
+
+    def due(self) -> List[Tuple[str, Dict[str, Any]]]:
+        """The top-N combinations whose cache entry is missing or about to expire, hottest first."""
+        due = []
+        for _, (mode, _, _, offset, _), params in self.tracker.top(self.top_n):
+            info = {**params, "date": (self.today() + timedelta(days=offset)).isoformat()}
+            remaining = self.cache.ttl_remaining(CACHE_MODES[mode], _cache_params(mode, info))
+            if remaining is not None and remaining > self.refresh_ahead:
+                self.stats["fresh"] += 1
+                continue
+            due.append((mode, info))
+        return due
+
+    async def prewarm_once(self, refresh: RefreshFn) -> int:
+        """One cycle: refresh due entries within the request budget. Returns how many were stored."""
+        due = self.due()
+        if len(due) > self.max_requests:
+            self.stats["over_budget"] += len(due) - self.max_requests
+            metrics.inc("prewarm_requests_total", len(due) - self.max_requests, outcome="over_budget")
+            due = due[:self.max_requests]
+        semaphore = asyncio.Semaphore(self.concurrency)
+
+        async def one(mode: str, info: Dict[str, Any]) -> bool:
+            async with semaphore:
+                try:
+                    response = await refresh(mode, info)
+                except Exception as e:
+                    print(f"⚠️  Prewarm {info.get('source')} → {info.get('destination')} failed: "
+                          f"{type(e).__name__}: {e}")
+                    outcome = "failed"
+                else:
+                    outcome = "refreshed" if response is not None and not response.get("error") else "no_data"
+            self.stats[outcome] += 1
+            metrics.inc("prewarm_requests_total", outcome=outcome)
+            if outcome == "refreshed":
+                self._prewarmed[make_key(CACHE_MODES[mode], _cache_params(mode, info))] = True
+            return outcome == "refreshed"
+
+        refreshed = await asyncio.gather(*(one(mode, info) for mode, info in due))
+        self.stats["cycles"] += 1
+        return sum(refreshed)
+
+    async def run(self, refresh: RefreshFn) -> None:
+        """Prewarm every `interval` seconds until cancelled."""
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                await self.prewarm_once(refresh)
+            except Exception as e:
+                print(f"⚠️  Prewarm cycle failed: {type(e).__name__}: {e}")
+
+
+_prewarmer: Optional[Prewarmer] = None
+
+
+def get_prewarmer() -> Prewarmer:
+    """The process-wide tracker/prewarmer; queries are always tracked, the loop runs only when started."""
+    global _prewarmer
+    if _prewarmer is None:
+        _prewarmer = Prewarmer()
+    return _prewarmer
+
+
+def set_prewarmer(prewarmer: Optional[Prewarmer]) -> None:
+    global _prewarmer
+    _prewarmer = prewarmer
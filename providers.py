@@ -0,0 +1,330 @@
+import asyncio
+import os
+from abc import ABC, abstractmethod
+import time
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+import metrics
+from cache import FLIGHT_AVAILABILITY, TRAIN_AVAILABILITY, CacheKey, make_key
+from models.modes import FLIGHT_MODE, RECORD_KEYS, RESULT_FIELDS, TRAIN_MODE
+from stages import stage
+
+# -------------------------------
+# Availability providers
+# -------------------------------
+# A provider answers one resolved lookup (mode + train/flight parameters)
+# with a list of TrainInfo / FlightInfo dicts, or None when it has no data
+# for the route. A ProviderPool queries several providers:
+#   - "first": start the primary, hedge to the next provider after
+#     `hedge_delay` seconds (or at once when one fails) and return the
+#     first non-empty answer, cancelling the rest,
+#   - "merge": query every provider concurrently and merge their rows.
+# Providers without live availability (the offline timetable: schedule
+# only, availability "Unknown") never race the live ones. In "first" they
+# are asked only when every live provider failed, timed out or had no
+# data; their answers (and merges that include them) are marked not
+# `live`, so callers do not cache them as availability. The default pool
+# (web search + timetable) therefore has one live provider and does not
+# hedge; hedging applies once a second live provider is configured.
+# Every call has a per-provider timeout, and a circuit breaker per
+# provider skips sources that keep failing until their reset timeout.
+
+FIRST, MERGE = "first", "merge"
+
+DEFAULT_HEDGE_DELAY = float(os.getenv("PROVIDER_HEDGE_DELAY", "5"))
+DEFAULT_STRATEGY = os.getenv("PROVIDER_STRATEGY", FIRST)
+WEB_SEARCH_TIMEOUT = float(os.getenv("PROVIDER_WEB_TIMEOUT", "25"))
+BREAKER_FAILURES = int(os.getenv("PROVIDER_BREAKER_FAILURES", "5"))
+BREAKER_RESET = float(os.getenv("PROVIDER_BREAKER_RESET", "30"))
+
+CACHE_MODES = {TRAIN_MODE: TRAIN_AVAILABILITY, FLIGHT_MODE: FLIGHT_AVAILABILITY}
+
+Results = List[Dict[str, Any]]
+
+
+class CircuitBreaker:
+    """Opens after `failure_threshold` consecutive failures; lets one trial call through per `reset_timeout`."""
+
+    def __init__(
+        self,
+        failure_threshold: int = BREAKER_FAILURES,
+        reset_timeout: float = BREAKER_RESET,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.clock = clock
+        self.failures = 0
+        self.opened_at: Optional[float] = None
+
+    @property
+    def state(self) -> str:
+        if self.opened_at is None:
+            return "closed"
+        return "half_open" if self.clock() - self.opened_at >= self.reset_timeout else "open"
+
+    def allow(self) -> bool:
+        state = self.state
+        if state == "half_open":
+            # One trial call; further calls wait for its outcome (or the next reset period)
+            self.opened_at = self.clock()
+            return True
+        return state == "closed"
+
+    def record_success(self) -> None:
+        self.failures = 0
+        self.opened_at = None
+
+    def record_failure(self) -> None:
+        self.failures += 1
+        if self.opened_at is not None or self.failures >= self.failure_threshold:
+            self.opened_at = self.clock()
+
+
+class Provider(ABC):
+    """Base class: subclasses implement `lookup` for the modes they list."""
+
+    name = "provider"
+    modes: Tuple[str, ...] = (TRAIN_MODE, FLIGHT_MODE)
+    live = True     # answers carry real availability, not just a schedule
+
+    def __init__(self, timeout: float = 10.0, breaker: Optional[CircuitBreaker] = None) -> None:
+        self.timeout = timeout
+        self.breaker = breaker or CircuitBreaker()
+
+    @abstractmethod
+    async def lookup(self, mode: str, query: str, info: Dict[str, Any]) -> Optional[Results]:
+        """Rows for the resolved parameters, or None when this source has no data for the route."""
+
+
+class TimetableProvider(Provider):
+    """Direct trains from the offline timetable (schedule only; availability "Unknown")."""
+
+    name = "timetable"
+    modes = (TRAIN_MODE,)
+    live = False
+
+    def __init__(self, timetable=None, timeout: float = 1.0, breaker: Optional[CircuitBreaker] = None) -> None:
+        super().__init__(timeout, breaker)
+        self._timetable = timetable
+
+    async def lookup(self, mode: str, query: str, info: Dict[str, Any]) -> Optional[Results]:
+        if self._timetable is None:
+            from timetable import get_timetable
+
+            self._timetable = get_timetable()
+        return self._timetable.lookup_trains(info)
+
+
+class StaticProvider(Provider):
+    """Canned responses keyed on their own fields: offline stub data, or a stand-in source in tests.
+
+    `delay` and `error` simulate a slow or failing source.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        responses: Iterable[Dict[str, Any]] = (),
+        delay: float = 0.0,
+        error: Optional[Exception] = None,
+        timeout: float = 10.0,
+        breaker: Optional[CircuitBreaker] = None,
+    ) -> None:
+        super().__init__(timeout, breaker)
+        self.name = name
+        self.delay = delay
+        self.error = error
+        self.calls = 0
+        self._responses: Dict[CacheKey, Results] = {}
+        for response in responses:
+            self.add(response)
+
+    def add(self, response: Dict[str, Any]) -> None:
+        for mode, field_name in RESULT_FIELDS.items():
+            if field_name in response:
+                self._responses[make_key(CACHE_MODES[mode], response)] = response[field_name]
+
+    async def lookup(self, mode: str, query: str, info: Dict[str, Any]) -> Optional[Results]:
+        self.calls += 1
+        if self.delay:
+            await asyncio.sleep(self.delay)
+        if self.error is not None:
+            raise self.error
+        # Stored responses carry city names only, so key on those
+        params = {**info, "source_code": "", "destination_code": ""}
+        return self._responses.get(make_key(CACHE_MODES[mode], params))
+
+
+class WebSearchProvider(Provider):
+    """The slim train / flight agent with WebSearchTool, given already-resolved parameters."""
+
+    name = "web_search"
+
+    def __init__(self, timeout: float = WEB_SEARCH_TIMEOUT, breaker: Optional[CircuitBreaker] = None) -> None:
+        super().__init__(timeout, breaker)
+
+    async def lookup(self, mode: str, query: str, info: Dict[str, Any]) -> Optional[Results]:
+        from agent_core import create_flight_agent, create_train_agent, flight_agent_input, train_agent_input
+        from agent_registry import get_agent, get_run_config
+        from models.models import FlightAvailability, TrainAvailability
+        from models.validators import validate_output
+        from structured import run_structured
+
+        if mode == FLIGHT_MODE:
+            agent, agent_input, output_type = (
+                get_agent("flight", create_flight_agent), flight_agent_input(query, info), FlightAvailability)
+        else:
+            agent, agent_input, output_type = (
+                get_agent("train", create_train_agent), train_agent_input(query, info), TrainAvailability)
+        output = await run_structured(agent, agent_input, get_run_config(), metrics.run_hooks())
+        # A ValidationError here counts as a provider failure
+        response = validate_output(output, output_type).model_dump(by_alias=True)
+        return response[RESULT_FIELDS[mode]]
+
+
+@dataclass
+class ProviderResult:
+    results: Results
+    providers: List[str]                       # the providers whose rows were used
+    errors: Dict[str, str] = field(default_factory=dict)
+    live: bool = True                          # every row source had live availability (safe to cache)
+
+
+_NO_DATA = object()
+
+
+class ProviderPool:
+    def __init__(
+        self,
+        providers: Sequence[Provider],
+        strategy: str = DEFAULT_STRATEGY,
+        hedge_delay: float = DEFAULT_HEDGE_DELAY,
+    ) -> None:
+        if strategy not in (FIRST, MERGE):
+            raise ValueError(f"Unknown provider strategy {strategy!r}; use {FIRST!r} or {MERGE!r}")
+        self.providers = list(providers)
+        self.strategy = strategy
+        self.hedge_delay = hedge_delay
+
+    async def lookup(self, mode: str, query: str, info: Dict[str, Any]) -> Optional[ProviderResult]:
+        """Answer from the providers serving `mode`; None when none of them had data."""
+        providers = [provider for provider in self.providers if mode in provider.modes]
+        if not providers:
+            return None
+        with stage("providers"):
+            if self.strategy == MERGE:
+                return await self._merge(providers, mode, query, info)
+            errors: Dict[str, str] = {}
+            found = await self._first([p for p in providers if p.live], mode, query, info, errors)
+            if found is None:
+                # Schedule-only sources are a fallback, never a hedge against live availability
+                found = await self._first([p for p in providers if not p.live], mode, query, info, errors)
+            return found
+
+    async def _call(self, provider: Provider, mode: str, query: str, info: Dict[str, Any]) -> Any:
+        """The provider's results, _NO_DATA, or the exception it failed with. Never raises."""
+        if not provider.breaker.allow():
+            metrics.inc("provider_requests_total", provider=provider.name, outcome="circuit_open")
+            return RuntimeError("circuit open")
+        started = time.perf_counter()
+        outcome = "ok"
+        try:
+            results = await asyncio.wait_for(provider.lookup(mode, query, info), provider.timeout)
+        except asyncio.TimeoutError as e:
+            outcome, results = "timeout", e
+        except Exception as e:
+            outcome, results = "error", e
+        finally:
+            metrics.observe("provider_duration_ms", (time.perf_counter() - started) * 1000, provider=provider.name)
+        if outcome == "ok":
+            provider.breaker.record_success()
+            if results is None:
+                outcome, results = "no_data", _NO_DATA
+        else:
+            provider.breaker.record_failure()
+        metrics.inc("provider_requests_total", provider=provider.name, outcome=outcome)
+        return results
+
+    async def _first(
+        self, providers: List[Provider], mode: str, query: str, info: Dict[str, Any], errors: Dict[str, str]
+    ) -> Optional[ProviderResult]:
+        waiting = list(providers)
+        running: Dict["asyncio.Task[Any]", Provider] = {}
+        empty: Optional[Provider] = None
+        if not waiting:
+            return None
+
+        def launch() -> None:
+            provider = waiting.pop(0)
+            running[asyncio.ensure_future(self._call(provider, mode, query, info))] = provider
+
+        launch()
+        try:
+            while running or waiting:
+                if not running:
+                    # Everything started so far failed: move on without waiting
+                    launch()
+                done, _ = await asyncio.wait(
+                    running, timeout=self.hedge_delay if waiting else None, return_when=asyncio.FIRST_COMPLETED)
+                if not done:
+                    metrics.inc("provider_hedges_total")
+                    launch()
+                    continue
+                for task in done:
+                    provider = running.pop(task)
+                    outcome = task.result()
+                    if isinstance(outcome, list) and outcome:
+                        return ProviderResult(outcome, [provider.name], errors, provider.live)
+                    if isinstance(outcome, list):
+                        # "No trains" only stands if nobody still running has rows
+                        empty = empty or provider
+                    elif isinstance(outcome, BaseException):
+                        errors[provider.name] = f"{type(outcome).__name__}: {outcome}"
+        finally:
+            for task in running:
+                task.cancel()
+        return ProviderResult([], [empty.name], errors, empty.live) if empty is not None else None
+
+    async def _merge(
+        self, providers: List[Provider], mode: str, query: str, info: Dict[str, Any]
+    ) -> Optional[ProviderResult]:
+        outcomes = await asyncio.gather(*(self._call(provider, mode, query, info) for provider in providers))
+        key = RECORD_KEYS[mode]
+        merged: Dict[Any, Dict[str, Any]] = {}
+        used: List[str] = []
+        errors: Dict[str, str] = {}
+        live = True
+        for provider, outcome in zip(providers, outcomes):
+            if isinstance(outcome, BaseException):
+                errors[provider.name] = f"{type(outcome).__name__}: {outcome}"
+                continue
+            if not isinstance(outcome, list):
+                continue
+            used.append(provider.name)
+            live = live and provider.live
+            # Earlier providers win on duplicates; later ones only add rows
+            for record in outcome:
+                merged.setdefault(record.get(key) or id(record), record)
+        if not used:
+            return None
+        results = sorted(merged.values(), key=lambda record: str(record.get("departure", "")))
+        return ProviderResult(results, used, errors, live)
+
+
+_provider_pool: Optional[ProviderPool] = None
+
+
+def get_provider_pool() -> ProviderPool:
+    """The process-wide pool: web search, falling back to the offline timetable for trains when it fails."""
+    global _provider_pool
+    if _provider_pool is None:
+        _provider_pool = ProviderPool([WebSearchProvider(), TimetableProvider()])
+    return _provider_pool
+
+
+def set_provider_pool(pool: Optional[ProviderPool]) -> None:
+    """Swap the process-wide pool (tests, benchmarks); None restores the default."""
+    global _provider_pool
+    _provider_pool = pool
@@ -1,11 +1,29 @@
+import argparse
 import asyncio
 import os
 import json
 from datetime import datetime, timedelta
 from dotenv import load_dotenv
-from typing import Dict, Any, List
+from typing import Dict, Any, AsyncIterator, List, Optional
 from pydantic import BaseModel, Field, ValidationError
-from agents import Agent, Runner, function_tool
+from models.validators import strip_code_fence, validate_output
+from agent_core import extract_train_travel_info
+from router import TRAIN_MODE, classify_mode, score_train_query, try_fast_path
+from date_resolver import resolve_date_range
+from flexible_dates import range_decision, search_dates
+from timetable import get_timetable
+from journey_planner import attach_itineraries
+import metrics
+from agent_registry import get_agent, get_run_config, shutdown
+from batch import add_batch_arguments, run_batch_cli
+from server import add_server_arguments, run_server_cli
+from startup import profile_startup
+from stages import stage
+from singleflight import get_single_flight, request_key
+from structured import run_structured
+from streaming import print_stream_event, response_events, stream_agent_events
+from session import Session, stream_in_session
+from deadlines import budget_scope, degraded_response, stream_within_budget, within_budget
 
 # Load OpenAI key
 load_dotenv()
@@ -30,81 +48,27 @@ class TrainAvailability(BaseModel):
     class_type: str = Field(..., alias="class")
     trains: List[TrainInfo]
 
+# -------------------------------
+# Offline train data
+# -------------------------------
+def lookup_offline_trains(info: Dict[str, Any]) -> Optional[List[Dict[str, Any]]]:
+    # Indexed offline timetable (data/timetable.csv, or TIMETABLE_PATH)
+    return get_timetable().lookup_trains(info)
+
 # -------------------------------
 # Tool: Extract info and simulate train data
 # -------------------------------
-@function_tool
 def extract_travel_info(query: str) -> Dict[str, Any]:
-    import re
-    import dateparser
-
-    source = ""
-    destination = ""
-    travel_class = "3A"
-    travel_date = (datetime.now() + timedelta(days=1)).strftime("%Y-%m-%d")
-
-    # Improved regex to handle many formats
-    from_match = re.search(r'from\s+([a-zA-Z\s]+?)\s+to', query, re.IGNORECASE)
-    to_match = re.search(r'to\s+([a-zA-Z\s]+?)(?:\s+in|\s+on|\s+for|$)', query, re.IGNORECASE)
-    class_match = re.search(r'(1A|2A|3A|SL|2S|sleeper)', query.lower())
-    date_match = re.search(r'on\s+([a-zA-Z0-9,\s]+)', query.lower())
-    # Fallback for "between X and Y" phrasing
-    between_match = re.search(r'between\s+([a-zA-Z\s]+?)\s+and\s+([a-zA-Z\s]+)', query, re.IGNORECASE)
-    
-    if between_match:
-        source = between_match.group(1).strip().title()
-        destination = between_match.group(2).strip().title()
-    if from_match:
-        source = from_match.group(1).strip().title()
-    if to_match:
-        destination = to_match.group(1).strip().title()
-    if class_match:
-        match = class_match.group(1).upper()
-        travel_class = "SL" if match == "SLEEPER" else match
-    if date_match:
-        parsed = dateparser.parse(date_match.group(1))
-        if parsed:
-            travel_date = parsed.strftime("%Y-%m-%d")
-
-    trains = []
-    if source == "Delhi" and destination == "Mumbai":
-        trains = [
-            {
-                "train_number": "12951",
-                "train_name": "Mumbai Rajdhani",
-                "departure": "16:25",
-                "arrival": "08:15",
-                "duration": "15h 50m",
-                "availability": "Available 42",
-                "fare": 1985
-            }
-        ]
-    elif source == "Chennai" and destination == "Bangalore":
-        trains = [
-            {
-                "train_number": "12607",
-                "train_name": "Lalbagh Express",
-                "departure": "15:30",
-                "arrival": "21:00",
-                "duration": "5h 30m",
-                "availability": "Available 23",
-                "fare": 310
-            }
-        ]
-
-    return {
-        "source": source,
-        "destination": destination,
-        "date": travel_date,
-        "class": travel_class,
-        "trains": trains
-    }
+    info = extract_train_travel_info(query)
+    return {**info, "trains": lookup_offline_trains(info) or []}
 
 # -------------------------------
 # Main Agent Logic
 # -------------------------------
-async def railway_agent(user_query: str) -> Dict[str, Any]:
-    agent = Agent(
+def create_agent():
+    from agents import Agent, function_tool
+
+    return Agent(
         name="Railway Booking Assistant",
         instructions="""
 Your ONLY job is to extract travel details (source, destination, date, and class) from the user's query using the `extract_travel_info` tool.
@@ -120,25 +84,97 @@ Return a valid JSON using this structure:
 
 Do NOT explain. Do NOT add extra words. Do NOT narrate. JUST return valid JSON.
 """,
-        tools=[extract_travel_info]
+        tools=[function_tool(extract_travel_info)],
+        output_type=TrainAvailability,
     )
 
-    result = await Runner.run(agent, user_query)
-
-    output = result.final_output
-
-    # 🔍 Clean up LLM output (strip markdown code blocks like ```json ... ```)
-    if isinstance(output, str):
-        output = output.strip()
-        if output.startswith("```json"):
-            output = output.replace("```json", "").replace("```", "").strip()
-        elif output.startswith("```"):
-            output = output.replace("```", "").strip()
-
-        try:
-            output = json.loads(output)
-        except json.JSONDecodeError:
+async def lookup_offline_date(info: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    trains = lookup_offline_trains(info)
+    if trains is None:
+        return None
+    return attach_itineraries(TrainAvailability.model_validate({**info, "trains": trains}).model_dump(by_alias=True))
+
+async def date_range_answer(user_query: str) -> Optional[Dict[str, Any]]:
+    # 📅 "this weekend" / "next week": every date is looked up in the timetable concurrently
+    dates = resolve_date_range(user_query)
+    if not dates or classify_mode(user_query) != TRAIN_MODE:
+        return None
+    decision = range_decision(user_query)
+    if not decision.is_confident():
+        return None
+    return await search_dates(dates, decision.info, lookup_offline_date)
+
+@metrics.traced("railway_stub")
+async def railway_agent(user_query: str) -> Dict[str, Any]:
+    # ⏱️ Under a request budget, an agent run still going near the deadline is cancelled
+    return await within_budget(answer_query(user_query), lambda: degraded_answer(user_query))
+
+async def answer_query(user_query: str) -> Dict[str, Any]:
+    ranged = await date_range_answer(user_query)
+    if ranged is not None:
+        return ranged
+
+    # ⚡ Confident queries are answered from the offline timetable without an LLM round-trip
+    fast = try_fast_path(user_query, lookup_offline_trains)
+    if fast is not None:
+        return attach_itineraries(fast)
+
+    # 🔁 Equivalent queries already being answered share that agent run
+    key = ("railway_stub", request_key(user_query))
+    return await get_single_flight().do(key, lambda: run_agent(user_query))
+
+async def degraded_answer(user_query: str) -> Optional[Dict[str, Any]]:
+    """The locally extracted parameters with timetable trains, marked partial."""
+    info = score_train_query(user_query).info
+    if not info.get("source") or not info.get("destination"):
+        return None
+    return attach_itineraries(degraded_response(TRAIN_MODE, info, None, lookup_offline_trains))
+
+async def run_agent(user_query: str) -> Dict[str, Any]:
+    agent = get_agent("railway_stub", create_agent)
+    output = await run_structured(agent, user_query, get_run_config(), metrics.run_hooks())
+    return attach_itineraries(finalize_output(output))
+
+@metrics.traced("railway_stub_stream")
+async def stream_railway_agent(user_query: str) -> AsyncIterator[Dict[str, Any]]:
+    """Streaming variant of railway_agent: yields progress events and records as they arrive."""
+    async for event in stream_within_budget(stream_answer(user_query), lambda: degraded_answer(user_query)):
+        yield event
+
+async def stream_answer(user_query: str) -> AsyncIterator[Dict[str, Any]]:
+    fast = await date_range_answer(user_query)
+    if fast is None:
+        fast = try_fast_path(user_query, lookup_offline_trains)
+        if fast is not None:
+            fast = attach_itineraries(fast)
+    if fast is not None:
+        for event in response_events(fast):
+            yield event
+        return
+
+    key = ("railway_stub", request_key(user_query))
+    if get_single_flight().in_flight(key):
+        shared = await get_single_flight().do(key, lambda: run_agent(user_query))
+        for event in response_events(shared):
+            yield event
+        return
+
+    agent = get_agent("railway_stub", create_agent)
+    async for event in stream_agent_events(agent, user_query, run_config=get_run_config()):
+        if event["type"] == "final_output":
+            yield {"type": "done", "response": attach_itineraries(finalize_output(event["output"]))}
+        else:
+            yield event
+
+def finalize_output(output: Any) -> Dict[str, Any]:
+    # ✅ Structured runs return a validated TrainAvailability; text is validated straight from JSON
+    try:
+        with stage("validation"):
+            return validate_output(output, TrainAvailability).model_dump(by_alias=True)
+    except ValidationError as ve:
+        if isinstance(output, str) and ve.errors()[0]["type"] == "json_invalid":
             print("🔴 Agent returned plain text:\n", output)
+            metrics.inc("plain_text_fallbacks_total")
             return {
                 "source": "",
                 "destination": "",
@@ -147,12 +183,12 @@ Do NOT explain. Do NOT add extra words. Do NOT narrate. JUST return valid JSON.
                 "trains": [],
                 "error": "Agent did not return valid JSON."
             }
-
-    # ✅ Validate structured data
-    try:
-        validated = TrainAvailability.model_validate(output)
-    except ValidationError as ve:
         print("❌ Validation error:", ve)
+        metrics.inc("validation_failures_total", kind="train")
+        if isinstance(output, str):
+            output = json.loads(strip_code_fence(output))
+        if not isinstance(output, dict):
+            output = {}
         return {
             "source": output.get("source", ""),
             "destination": output.get("destination", ""),
@@ -162,19 +198,50 @@ Do NOT explain. Do NOT add extra words. Do NOT narrate. JUST return valid JSON.
             "error": "Response was invalid or incomplete"
         }
 
-    return validated.dict(by_alias=True)
-
 # -------------------------------
 # Manual CLI for Debugging
 # -------------------------------
 async def main():
     print("🚆 Railway Booking Assistant 🚆")
-    while True:
-        query = input("\nAsk me about trains (or type 'exit'): ")
-        if query.lower() in ["exit", "quit"]:
-            break
-        response = await railway_agent(query)
-        print(json.dumps(response, indent=2))
+    session = Session()
+    try:
+        while True:
+            query = input("\nAsk me about trains (or type 'exit'): ")
+            if query.lower() in ["exit", "quit"]:
+                break
+            with budget_scope("chat"):
+                async for event in stream_in_session(session, query, stream_railway_agent):
+                    print_stream_event(event)
+    finally:
+        await shutdown()
+
+def cli() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--profile-startup", action="store_true",
+                        help="Print an import/warm-up time breakdown before starting")
+    subcommands = parser.add_subparsers(dest="command")
+    subcommands.add_parser("chat", help="Interactive prompt (default)")
+    add_batch_arguments(subcommands.add_parser("batch", help="Run queries from a JSONL file concurrently"))
+    add_server_arguments(subcommands.add_parser("serve", help="Serve /trains, /flights and /stream over HTTP"))
+    args = parser.parse_args()
+
+    if args.profile_startup:
+        profile_startup()
+    if args.command != "serve":
+        # Server workers start their own endpoint after forking
+        metrics.maybe_serve_metrics()
+
+    if args.command == "batch":
+        async def run() -> None:
+            try:
+                await run_batch_cli(args, railway_agent)
+            finally:
+                await shutdown()
+        asyncio.run(run())
+    elif args.command == "serve":
+        run_server_cli(args, railway_agent, stream_railway_agent, None, shutdown)
+    else:
+        asyncio.run(main())
 
 if __name__ == "__main__":
-    asyncio.run(main())
+    cli()
@@ -0,0 +1,291 @@
+import heapq
+import re
+from array import array
+from dataclasses import dataclass
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Tuple, Union
+
+# -------------------------------
+# Compact, sortable result sets
+# -------------------------------
+# TrainInfo / FlightInfo records keep availability, duration and times as
+# display strings. A ResultSet parses them once into parallel int arrays:
+# availability status and seat count, minutes since midnight for
+# departure/arrival, duration in minutes and fare. Sorting, filtering and
+# top-k then work on those columns without re-parsing. The original
+# records are kept alongside, so results serialize to the same JSON shape.
+
+# Availability statuses, ordered from most to least bookable
+AVAILABLE, RAC, WAITLIST, UNKNOWN, NOT_AVAILABLE = range(5)
+STATUS_NAMES = ("available", "rac", "waitlist", "unknown", "not_available")
+
+MISSING = -1              # unparseable time, duration, fare or seat count
+LAST = 2 ** 31 - 1        # sort key for missing values, so they rank last
+
+WAITLIST_PATTERN = re.compile(r"\b(?:gn|rl|pq|tq|ck|rs)?wl\s*[-:#]?\s*(\d+)")
+RAC_PATTERN = re.compile(r"\brac\s*[-:#]?\s*(\d+)")
+AVAILABLE_PATTERN = re.compile(r"\b(?:available|avl|avbl|curr_avbl|cnf|confirmed)\b\s*[-:#]?\s*(\d+)?")
+SEATS_LEFT_PATTERN = re.compile(r"\b(\d+)\s+(?:seats?|berths?)\s+(?:left|available)")
+NOT_AVAILABLE_PATTERN = re.compile(r"\b(?:regret|not available|sold out|no seats|no room|full)\b")
+DURATION_PATTERN = re.compile(
+    r"^(?:(\d+)\s*d(?:ays?)?)?\s*(?:(\d+)\s*h(?:rs?|ours?)?)?\s*(?:(\d+)\s*m(?:ins?|inutes?)?)?$"
+)
+CLOCK_PATTERN = re.compile(r"(\d{1,2}):(\d{2})(?::\d{2})?\s*([ap]\.?m\.?)?")
+
+# sort=... aliases accepted by ResultQuery
+SORT_ALIASES = {"cheapest": "fare", "fastest": "duration", "earliest": "departure"}
+COLUMNS = ("departure", "arrival", "duration", "fare", "status", "seats")
+
+
+def sort_column(key: str) -> str:
+    """Resolve a sort key or alias ("cheapest") to a column name; raises ValueError."""
+    column = SORT_ALIASES.get(key, key)
+    if column not in COLUMNS:
+        raise ValueError(f"Unknown sort key {key!r}; use one of {', '.join((*SORT_ALIASES, *COLUMNS))}")
+    return column
+
+
+def parse_availability(text: Any) -> Tuple[int, int]:
+    """("Available 42" -> (AVAILABLE, 42)), ("GNWL12/WL5" -> (WAITLIST, 5)); seats is MISSING if not given."""
+    text = str(text or "").strip().lower()
+    if not text or text == "unknown":
+        return UNKNOWN, MISSING
+    # Booking-time and current status ("GNWL12/WL5"): the last one is current
+    waitlist = WAITLIST_PATTERN.findall(text)
+    if waitlist:
+        return WAITLIST, int(waitlist[-1])
+    rac = RAC_PATTERN.findall(text)
+    if rac:
+        return RAC, int(rac[-1])
+    if NOT_AVAILABLE_PATTERN.search(text):
+        return NOT_AVAILABLE, 0
+    seats_left = SEATS_LEFT_PATTERN.search(text)
+    if seats_left:
+        return AVAILABLE, int(seats_left.group(1))
+    available = AVAILABLE_PATTERN.search(text)
+    if available:
+        return AVAILABLE, int(available.group(1)) if available.group(1) else MISSING
+    return UNKNOWN, MISSING
+
+
+def parse_clock(text: Any) -> int:
+    """Minutes since midnight for "16:25", "4:25 PM" or an ISO datetime; MISSING otherwise."""
+    text = str(text or "")
+    if "T" in text:
+        text = text.split("T", 1)[1]
+    match = CLOCK_PATTERN.search(text.lower())
+    if not match:
+        return MISSING
+    hours, minutes = int(match.group(1)), int(match.group(2))
+    meridiem = match.group(3)
+    if meridiem:
+        hours = hours % 12 + (12 if meridiem.startswith("p") else 0)
+    if hours > 23 or minutes > 59:
+        return MISSING
+    return hours * 60 + minutes
+
+
+def parse_duration(text: Any) -> int:
+    """Minutes for "15h 50m", "2 hrs", "45m", "1d 2h" or "15:50"; MISSING otherwise."""
+    text = str(text or "").strip().lower()
+    if not text:
+        return MISSING
+    clock = re.fullmatch(r"(\d+):(\d{2})", text)
+    if clock:
+        return int(clock.group(1)) * 60 + int(clock.group(2))
+    match = DURATION_PATTERN.match(text)
+    if not match or not any(match.groups()):
+        return MISSING
+    days, hours, minutes = (int(group or 0) for group in match.groups())
+    return days * 24 * 60 + hours * 60 + minutes
+
+
+def parse_fare(value: Any) -> int:
+    """Fare as int ("₹1,985" -> 1985); zero, None and unparseable fares are MISSING."""
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return int(value) if value > 0 else MISSING
+    digits = re.sub(r"[^\d.]", "", str(value or "")).split(".")[0]
+    return int(digits) if digits and int(digits) > 0 else MISSING
+
+
+class Result:
+    """One row of a ResultSet: the parsed columns plus the original record."""
+
+    __slots__ = ("record", "departure", "arrival", "duration", "fare", "status", "seats")
+
+    def __init__(self, record: Dict[str, Any], departure: int, arrival: int, duration: int,
+                 fare: int, status: int, seats: int) -> None:
+        self.record = record
+        self.departure = departure
+        self.arrival = arrival
+        self.duration = duration
+        self.fare = fare
+        self.status = status
+        self.seats = seats
+
+    @property
+    def status_name(self) -> str:
+        return STATUS_NAMES[self.status]
+
+    def __repr__(self) -> str:
+        number = self.record.get("train_number") or self.record.get("flight_number") or "?"
+        return f"Result({number}, fare={self.fare}, duration={self.duration}, {self.status_name})"
+
+
+class ResultSet:
+    """Column-oriented train or flight results; every query returns a new ResultSet."""
+
+    __slots__ = ("records",) + COLUMNS
+
+    def __init__(self, records: Sequence[Dict[str, Any]]) -> None:
+        self.records: List[Dict[str, Any]] = list(records)
+        for name in COLUMNS:
+            setattr(self, name, array("i"))
+        for record in self.records:
+            departure = parse_clock(record.get("departure"))
+            arrival = parse_clock(record.get("arrival"))
+            duration = parse_duration(record.get("duration"))
+            if duration == MISSING and MISSING not in (departure, arrival):
+                duration = (arrival - departure) % (24 * 60)
+            status, seats = parse_availability(record.get("availability"))
+            self.departure.append(departure)
+            self.arrival.append(arrival)
+            self.duration.append(duration)
+            self.fare.append(parse_fare(record.get("fare")))
+            self.status.append(status)
+            self.seats.append(seats)
+
+    @classmethod
+    def _from_columns(cls, records: List[Dict[str, Any]], columns: Dict[str, array]) -> "ResultSet":
+        subset = cls.__new__(cls)
+        subset.records = records
+        for name in COLUMNS:
+            setattr(subset, name, columns[name])
+        return subset
+
+    def _take(self, indices: Sequence[int]) -> "ResultSet":
+        records = self.records
+        columns = {}
+        for name in COLUMNS:
+            column = getattr(self, name)
+            columns[name] = array("i", [column[i] for i in indices])
+        return self._from_columns([records[i] for i in indices], columns)
+
+    def __len__(self) -> int:
+        return len(self.records)
+
+    def __getitem__(self, index: int) -> Result:
+        return Result(self.records[index], *(getattr(self, name)[index] for name in COLUMNS))
+
+    def __iter__(self) -> Iterator[Result]:
+        return (self[index] for index in range(len(self.records)))
+
+    # -------------------------------
+    # Queries
+    # -------------------------------
+    def _sort_key(self, key: str) -> List[int]:
+        key = sort_column(key)
+        column = getattr(self, key)
+        if key == "status":
+            return list(column)
+        return [LAST if value == MISSING else value for value in column]
+
+    def sort_by(self, key: str, reverse: bool = False) -> "ResultSet":
+        """Stable sort on a column; rows with a missing value stay last either way."""
+        values = self._sort_key(key)
+        order = sorted(range(len(values)), key=values.__getitem__)
+        if reverse:
+            known = [i for i in order if values[i] != LAST]
+            order = known[::-1] + order[len(known):]
+        return self._take(order)
+
+    def top_k(self, k: int, key: str = "fare") -> "ResultSet":
+        """The k smallest rows by `key` without sorting the whole set."""
+        values = self._sort_key(key)
+        return self._take(heapq.nsmallest(k, range(len(values)), key=values.__getitem__))
+
+    def head(self, k: int) -> "ResultSet":
+        return self._take(range(min(k, len(self.records))))
+
+    def cheapest(self, k: int = 1) -> "ResultSet":
+        return self.top_k(k, "fare")
+
+    def fastest(self, k: int = 1) -> "ResultSet":
+        return self.top_k(k, "duration")
+
+    def departs_after(self, when: Union[int, str]) -> "ResultSet":
+        """Rows departing at or after `when` (minutes since midnight or "HH:MM")."""
+        minutes = when if isinstance(when, int) else parse_clock(when)
+        if minutes == MISSING:
+            raise ValueError(f"Unrecognised time {when!r}; use HH:MM")
+        departure = self.departure
+        return self._take([i for i in range(len(departure)) if departure[i] >= minutes])
+
+    def available_only(self, include_rac: bool = False) -> "ResultSet":
+        """Rows with confirmed seats (or RAC too, when `include_rac`)."""
+        worst = RAC if include_rac else AVAILABLE
+        status = self.status
+        return self._take([i for i in range(len(status)) if status[i] <= worst])
+
+    def to_list(self) -> List[Dict[str, Any]]:
+        """The original records, in this set's order (the existing JSON shape)."""
+        return list(self.records)
+
+
+@dataclass
+class ResultQuery:
+    """Filtering and ranking requested by a client (see server.py query parameters)."""
+
+    sort: Optional[str] = None
+    departs_after: Optional[str] = None
+    available_only: bool = False
+    limit: Optional[int] = None
+
+    @classmethod
+    def from_params(cls, params: Dict[str, List[str]]) -> "ResultQuery":
+        """Build from parsed query parameters: sort, after, available, limit. Raises ValueError."""
+        def first(name: str) -> Optional[str]:
+            values = params.get(name)
+            return values[0] if values else None
+
+        query = cls(sort=first("sort"), departs_after=first("after"),
+                    available_only=(first("available") or "").lower() in ("1", "true", "yes"))
+        limit = first("limit")
+        if limit is not None:
+            if not limit.isdigit() or int(limit) < 1:
+                raise ValueError("limit must be a positive integer")
+            query.limit = int(limit)
+        if query.sort is not None:
+            sort_column(query.sort)
+        if query.departs_after is not None and parse_clock(query.departs_after) == MISSING:
+            raise ValueError(f"Unrecognised time {query.departs_after!r}; use HH:MM")
+        return query
+
+    def is_empty(self) -> bool:
+        return self.sort is None and self.departs_after is None and not self.available_only and self.limit is None
+
+    def apply(self, response: Dict[str, Any]) -> Dict[str, Any]:
+        """Filter and rank a train or flight response, or each date of a flexible-date response.
+
+        Other responses are returned unchanged.
+        """
+        if "by_date" in response and not self.is_empty():
+            from flexible_dates import summarize_date  # flexible_dates imports this module
+
+            by_date = {day: self.apply(answer) for day, answer in response["by_date"].items()}
+            summary = [summarize_date(entry["date"], by_date.get(entry["date"])) for entry in response["summary"]]
+            return {**response, "by_date": by_date, "summary": summary}
+        field = "trains" if "trains" in response else "flights" if "flights" in response else None
+        if self.is_empty() or field is None or response.get("error"):
+            return response
+        results = ResultSet(response[field])
+        if self.available_only:
+            results = results.available_only()
+        if self.departs_after is not None:
+            results = results.departs_after(self.departs_after)
+        if self.sort is not None and self.limit is not None:
+            results = results.top_k(self.limit, self.sort)
+        elif self.sort is not None:
+            results = results.sort_by(self.sort)
+        elif self.limit is not None:
+            results = results.head(self.limit)
+        return {**response, field: results.to_list()}
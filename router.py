@@ -0,0 +1,193 @@
+import re
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, List, Optional
+
+import metrics
+from agent_core import FLIGHT_KEYWORDS, TRAIN_KEYWORDS, resolve_flight_info, resolve_train_travel_info
+from models.modes import FLIGHT_MODE, TRAIN_MODE
+from stages import stage
+
+# -------------------------------
+# Local pre-router (fast path)
+# -------------------------------
+# Queries the regex extractor (or, for flights, the airport index) resolves
+# completely are answered locally; only ambiguous ones are handed to the agent.
+
+FAST_PATH_THRESHOLD = 0.9
+NO_DATE_REASON = "no date given, assuming tomorrow"
+
+# Return the trains / flights for resolved parameters, or None when no local answer exists
+TrainLookup = Callable[[Dict[str, Any]], Optional[List[Dict[str, Any]]]]
+FlightLookup = Callable[[Dict[str, Any]], Optional[List[Dict[str, Any]]]]
+
+PLACE_PATTERN = re.compile(r"^[A-Za-z]+(?: [A-Za-z]+){0,2}$")
+NOISE_WORDS = {
+    "in", "on", "for", "by", "at", "class", "train", "trains", "any", "the",
+    "today", "tomorrow", "next", "this", "and", "or", "with",
+}
+CLASS_CUES = re.compile(r"\b(class|ac|coach|tier|berth|seat|seats)\b")
+FLIGHT_PATTERN = re.compile(r"\b(" + "|".join(FLIGHT_KEYWORDS) + r")s?\b")
+TRAIN_PATTERN = re.compile(r"\b(" + "|".join(TRAIN_KEYWORDS) + r")s?\b")
+
+def classify_mode(query: str) -> str:
+    """Pick the agent for a query: flight only on flight keywords without train ones."""
+    query_lower = query.lower()
+    if FLIGHT_PATTERN.search(query_lower) and not TRAIN_PATTERN.search(query_lower):
+        return FLIGHT_MODE
+    return TRAIN_MODE
+
+
+@dataclass
+class FastPathDecision:
+    score: float
+    info: Dict[str, Any]
+    reasons: List[str] = field(default_factory=list)
+
+    def is_confident(self, threshold: float = FAST_PATH_THRESHOLD) -> bool:
+        return self.score >= threshold
+
+
+def _is_clean_place(name: str) -> bool:
+    if not PLACE_PATTERN.match(name):
+        return False
+    return not any(word in NOISE_WORDS for word in name.lower().split())
+
+
+def score_train_query(query: str) -> FastPathDecision:
+    """Score how completely the regex extractor resolved a train query (0.0 - 1.0)."""
+    info, resolution = resolve_train_travel_info(query)
+    query_lower = query.lower()
+    reasons: List[str] = []
+
+    if FLIGHT_PATTERN.search(query_lower):
+        return FastPathDecision(0.0, info, ["flight keywords present"])
+
+    score = 0.0
+    if info["source"] and (resolution["source_known"] or _is_clean_place(info["source"])):
+        score += 0.3
+    else:
+        reasons.append("source unresolved")
+    if info["destination"] and (resolution["destination_known"] or _is_clean_place(info["destination"])):
+        score += 0.3
+    else:
+        reasons.append("destination unresolved")
+    if info["source"] and (info["source"], info["source_code"]) == (info["destination"], info["destination_code"]):
+        score = min(score, 0.3)
+        reasons.append("source equals destination")
+
+    if resolution["date_parsed"]:
+        score += 0.2
+    elif not resolution["date_cue"]:
+        # Nothing that looks like a date: tomorrow is assumed, with less confidence
+        score += 0.1
+        reasons.append(NO_DATE_REASON)
+    else:
+        reasons.append("date phrase not understood")
+
+    if resolution["class_explicit"] or not CLASS_CUES.search(query_lower):
+        score += 0.2
+    else:
+        reasons.append("class phrase not understood")
+
+    return FastPathDecision(round(score, 2), info, reasons)
+
+
+def score_flight_query(query: str) -> FastPathDecision:
+    """Score how completely the airport index and cabin/date rules resolved a flight query."""
+    info, resolution = resolve_flight_info(query)
+    reasons: List[str] = []
+
+    score = 0.0
+    if resolution["source_known"]:
+        score += 0.3
+    else:
+        reasons.append("source airport unresolved")
+    if resolution["destination_known"]:
+        score += 0.3
+    else:
+        reasons.append("destination airport unresolved")
+    if info["source"] and info["source"] == info["destination"]:
+        score = min(score, 0.3)
+        reasons.append("source equals destination")
+
+    if resolution["date_parsed"]:
+        score += 0.2
+    elif not resolution["date_cue"]:
+        # Nothing that looks like a date: tomorrow is assumed, with less confidence
+        score += 0.1
+        reasons.append(NO_DATE_REASON)
+    else:
+        reasons.append("date phrase not understood")
+
+    if resolution["cabin_explicit"] or not resolution["cabin_cue"]:
+        score += 0.2
+    else:
+        reasons.append("cabin phrase not understood")
+
+    return FastPathDecision(round(score, 2), info, reasons)
+
+
+def try_fast_path(
+    query: str,
+    lookup: Optional[TrainLookup],
+    threshold: float = FAST_PATH_THRESHOLD,
+) -> Optional[Dict[str, Any]]:
+    """Answer a confident train query locally, or return None to fall back to the agent."""
+    if lookup is None:
+        return None
+
+    with stage("extraction"):
+        decision = score_train_query(query)
+
+    from models.models import TrainAvailability
+
+    return _serve_locally(decision, lookup, threshold, TrainAvailability, "trains", TRAIN_MODE)
+
+
+def try_flight_fast_path(
+    query: str,
+    lookup: Optional[FlightLookup],
+    threshold: float = FAST_PATH_THRESHOLD,
+) -> Optional[Dict[str, Any]]:
+    """Answer a confident flight query from local data (the cache), or return None."""
+    if lookup is None:
+        return None
+
+    with stage("extraction"):
+        decision = score_flight_query(query)
+
+    from models.models import FlightAvailability
+
+    return _serve_locally(decision, lookup, threshold, FlightAvailability, "flights", FLIGHT_MODE)
+
+
+def _serve_locally(
+    decision: FastPathDecision,
+    lookup: Callable[[Dict[str, Any]], Optional[List[Dict[str, Any]]]],
+    threshold: float,
+    model: Any,
+    results_field: str,
+    mode: str,
+) -> Optional[Dict[str, Any]]:
+    if not decision.is_confident(threshold):
+        metrics.inc("fast_path_total", outcome="not_confident", mode=mode)
+        return None
+
+    with stage("lookup"):
+        results = lookup(decision.info)
+    if results is None:
+        metrics.inc("fast_path_total", outcome="no_local_data", mode=mode)
+        return None
+
+    from pydantic import ValidationError
+
+    try:
+        with stage("validation"):
+            validated = model.model_validate({**decision.info, results_field: results})
+            response = validated.model_dump(by_alias=True)
+    except ValidationError as ve:
+        print("❌ Fast path validation error:", ve)
+        metrics.inc("validation_failures_total", kind="fast_path")
+        return None
+    metrics.inc("fast_path_total", outcome="served", mode=mode)
+    return response
@@ -0,0 +1,606 @@
+import argparse
+import asyncio
+import gc
+import json
+import math
+import os
+import signal
+import socket
+import sys
+import time
+from dataclasses import dataclass, field
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, List, Optional, Sequence, Set
+from urllib.parse import parse_qs, urlsplit
+
+import metrics
+from deadlines import budget_scope, get_policy
+from results import ResultQuery
+from router import FLIGHT_MODE, TRAIN_MODE, classify_mode
+
+# -------------------------------
+# HTTP service
+# -------------------------------
+# A small asyncio HTTP/1.1 server (no extra dependencies):
+#   GET|POST /trains   ?q=... or {"query": ...}  -> one JSON response
+#                      optional &sort=cheapest|fastest|earliest|<column>
+#                      &after=HH:MM &available=1 &limit=K (see results.py)
+#   GET|POST /flights  same, for flight queries (each route answers 400 for
+#                      queries of the other mode rather than answer them)
+#   GET|POST /stream   same, NDJSON stream events (chunked)
+#   GET /healthz, GET /metrics
+# At most `max_concurrency` queries run at once and up to `max_queue` wait;
+# beyond that requests get 429 immediately. Each route runs under its
+# deadline policy (deadlines.py): near the deadline the agent is cancelled
+# and a partial answer from local data is returned with 200; queued
+# requests whose deadline passes get 503, running ones without a local
+# answer 504. SIGTERM stops accepting, lets in-flight
+# requests finish (up to the drain timeout) and then exits. --workers N
+# forks N processes that share one listening socket, the read-only tables
+# loaded before the fork (copy-on-write) and one shared-memory result cache;
+# workers that die are restarted with exponential backoff, and a worker that
+# keeps crashing stops the whole server instead of being forked in a loop.
+
+AgentFn = Callable[[str], Awaitable[Dict[str, Any]]]
+StreamFn = Callable[[str], AsyncIterator[Dict[str, Any]]]
+BackgroundFn = Callable[[], Awaitable[None]]
+
+DEFAULT_HOST = os.getenv("SERVER_HOST", "127.0.0.1")
+DEFAULT_PORT = int(os.getenv("SERVER_PORT", "8080"))
+DEFAULT_MAX_CONCURRENCY = int(os.getenv("SERVER_MAX_CONCURRENCY", "64"))
+DEFAULT_MAX_QUEUE = int(os.getenv("SERVER_MAX_QUEUE", "256"))
+# Unset: each route's deadline policy decides (see deadlines.ENDPOINT_POLICIES)
+DEFAULT_REQUEST_TIMEOUT = float(os.environ["SERVER_REQUEST_TIMEOUT"]) if os.getenv("SERVER_REQUEST_TIMEOUT") else None
+DEFAULT_KEEPALIVE_TIMEOUT = float(os.getenv("SERVER_KEEPALIVE_TIMEOUT", "5"))
+DEFAULT_DRAIN_TIMEOUT = float(os.getenv("SERVER_DRAIN_TIMEOUT", "20"))
+DEFAULT_SHARED_CACHE_MB = float(os.getenv("SERVER_SHARED_CACHE_MB", "64"))
+MAX_HEADER_BYTES = 16 * 1024
+MAX_BODY_BYTES = 64 * 1024
+MAX_CLIENT_TIMEOUT = 120.0
+RESTART_BACKOFF = float(os.getenv("SERVER_RESTART_BACKOFF", "0.5"))
+MAX_RESTART_BACKOFF = float(os.getenv("SERVER_MAX_RESTART_BACKOFF", "30"))
+# More than this many exits of one worker within the window is a crash loop
+CRASH_LOOP_RESTARTS = int(os.getenv("SERVER_CRASH_LOOP_RESTARTS", "5"))
+CRASH_LOOP_WINDOW = float(os.getenv("SERVER_CRASH_LOOP_WINDOW", "60"))
+ROUTE_MODES = {"/trains": TRAIN_MODE, "/flights": FLIGHT_MODE}
+
+REASONS = {
+    200: "OK", 400: "Bad Request", 404: "Not Found", 405: "Method Not Allowed",
+    413: "Payload Too Large", 429: "Too Many Requests", 431: "Request Header Fields Too Large",
+    500: "Internal Server Error", 502: "Bad Gateway", 503: "Service Unavailable", 504: "Gateway Timeout",
+}
+
+
+class HTTPError(Exception):
+    def __init__(self, status: int, message: str, retry_after: Optional[int] = None) -> None:
+        super().__init__(message)
+        self.status = status
+        self.message = message
+        self.retry_after = retry_after
+
+
+@dataclass
+class Request:
+    method: str
+    path: str
+    query: Dict[str, List[str]]
+    headers: Dict[str, str]
+    body: bytes = b""
+    received: float = field(default_factory=time.monotonic)
+    keep_alive: bool = True
+
+    def user_query(self) -> str:
+        if self.query.get("q"):
+            return self.query["q"][0]
+        if self.body:
+            try:
+                payload = json.loads(self.body)
+            except json.JSONDecodeError:
+                raise HTTPError(400, "Body must be JSON")
+            if isinstance(payload, dict) and isinstance(payload.get("query"), str):
+                return payload["query"]
+        raise HTTPError(400, "Missing query: use ?q=... or a JSON body {\"query\": ...}")
+
+    @property
+    def endpoint(self) -> str:
+        return self.path.strip("/")
+
+    def deadline(self, default_timeout: float) -> float:
+        """Absolute monotonic deadline; clients may shorten (or modestly extend) it with X-Timeout."""
+        timeout = default_timeout
+        if "x-timeout" in self.headers:
+            try:
+                timeout = float(self.headers["x-timeout"])
+            except ValueError:
+                timeout = math.nan
+            if not math.isfinite(timeout) or timeout <= 0:
+                raise HTTPError(400, "X-Timeout must be a positive number of seconds")
+            timeout = min(timeout, MAX_CLIENT_TIMEOUT)
+        return self.received + timeout
+
+
+async def read_request(reader: asyncio.StreamReader) -> Optional[Request]:
+    """Parse one request; None when the client closed the connection between requests."""
+    try:
+        head = await reader.readuntil(b"\r\n\r\n")
+    except asyncio.IncompleteReadError as e:
+        if not e.partial.strip():
+            return None
+        raise HTTPError(400, "Incomplete request")
+    except asyncio.LimitOverrunError:
+        raise HTTPError(431, "Request headers too large")
+
+    lines = head.decode("latin-1").split("\r\n")
+    try:
+        method, target, _version = lines[0].split(" ", 2)
+    except ValueError:
+        raise HTTPError(400, "Malformed request line")
+    headers = {}
+    for line in lines[1:]:
+        if line:
+            name, _, value = line.partition(":")
+            headers[name.strip().lower()] = value.strip()
+
+    body = b""
+    if "transfer-encoding" in headers:
+        raise HTTPError(400, "Chunked request bodies are not supported")
+    try:
+        length = int(headers.get("content-length", "0") or 0)
+    except ValueError:
+        raise HTTPError(400, "Invalid Content-Length")
+    if length > MAX_BODY_BYTES:
+        raise HTTPError(413, "Request body too large")
+    if length:
+        body = await reader.readexactly(length)
+
+    url = urlsplit(target)
+    keep_alive = headers.get("connection", "").lower() != "close"
+    return Request(method.upper(), url.path, parse_qs(url.query), headers, body, keep_alive=keep_alive)
+
+
+class Admission:
+    """Bounded concurrency with a bounded wait queue."""
+
+    def __init__(self, max_concurrency: int, max_queue: int) -> None:
+        self.max_concurrency = max_concurrency
+        self.max_queue = max_queue
+        self.active = 0
+        self.queued = 0
+        self.draining = False
+        self._slots = asyncio.Semaphore(max_concurrency)
+        self._idle = asyncio.Event()
+        self._idle.set()
+
+    async def acquire(self, deadline: float) -> None:
+        if self.draining:
+            raise HTTPError(503, "Server is shutting down", retry_after=1)
+        if self.active >= self.max_concurrency and self.queued >= self.max_queue:
+            metrics.inc("http_rejections_total", reason="queue_full")
+            raise HTTPError(429, "Too many requests in flight", retry_after=1)
+        self.queued += 1
+        try:
+            await asyncio.wait_for(self._slots.acquire(), max(0.0, deadline - time.monotonic()))
+        except asyncio.TimeoutError:
+            metrics.inc("http_rejections_total", reason="queue_timeout")
+            raise HTTPError(503, "Timed out waiting for capacity", retry_after=1)
+        finally:
+            self.queued -= 1
+        self.active += 1
+        self._idle.clear()
+
+    def release(self) -> None:
+        self.active -= 1
+        self._slots.release()
+        if self.active == 0:
+            self._idle.set()
+
+    async def drain(self, timeout: float) -> bool:
+        """Stop admitting and wait for running requests; False if some were still running."""
+        self.draining = True
+        try:
+            await asyncio.wait_for(self._idle.wait(), timeout)
+            return True
+        except asyncio.TimeoutError:
+            return False
+
+
+@dataclass
+class ServerConfig:
+    host: str = DEFAULT_HOST
+    port: int = DEFAULT_PORT
+    max_concurrency: int = DEFAULT_MAX_CONCURRENCY
+    max_queue: int = DEFAULT_MAX_QUEUE
+    request_timeout: Optional[float] = DEFAULT_REQUEST_TIMEOUT
+    keepalive_timeout: float = DEFAULT_KEEPALIVE_TIMEOUT
+    drain_timeout: float = DEFAULT_DRAIN_TIMEOUT
+    workers: int = 1
+    shared_cache_mb: float = DEFAULT_SHARED_CACHE_MB
+
+
+class TravelServer:
+    def __init__(
+        self,
+        trains: AgentFn,
+        stream: Optional[StreamFn] = None,
+        flights: Optional[AgentFn] = None,
+        config: Optional[ServerConfig] = None,
+        background: Sequence[BackgroundFn] = (),
+    ) -> None:
+        self.config = config or ServerConfig()
+        self.background = list(background)
+        self._background_tasks: List[asyncio.Task] = []
+        self.routes: Dict[str, Callable[[Request, asyncio.StreamWriter], Awaitable[None]]] = {
+            "/trains": lambda request, writer: self._answer(trains, request, writer, TRAIN_MODE),
+            "/healthz": self._health,
+            "/metrics": self._metrics,
+        }
+        if flights is not None:
+            self.routes["/flights"] = lambda request, writer: self._answer(flights, request, writer, FLIGHT_MODE)
+        if stream is not None:
+            self.routes["/stream"] = lambda request, writer: self._stream(stream, request, writer)
+        self.admission = Admission(self.config.max_concurrency, self.config.max_queue)
+        self._server: Optional[asyncio.AbstractServer] = None
+        self._connections: Set[asyncio.Task] = set()
+
+    # -------------------------------
+    # Lifecycle
+    # -------------------------------
+    async def start(self, sock: Optional[socket.socket] = None) -> None:
+        if sock is not None:
+            self._server = await asyncio.start_server(self._connection, sock=sock, limit=MAX_HEADER_BYTES)
+        else:
+            self._server = await asyncio.start_server(
+                self._connection, self.config.host, self.config.port, limit=MAX_HEADER_BYTES)
+        # Background jobs (e.g. cache prewarming) run until shutdown, in worker 0 only
+        self._background_tasks = [asyncio.ensure_future(job()) for job in self.background]
+
+    @property
+    def port(self) -> int:
+        return self._server.sockets[0].getsockname()[1]
+
+    async def shutdown(self) -> None:
+        """Graceful drain: stop accepting, finish running requests, then close idle connections."""
+        if self._server is not None:
+            self._server.close()
+        for task in self._background_tasks:
+            task.cancel()
+        await asyncio.gather(*self._background_tasks, return_exceptions=True)
+        finished = await self.admission.drain(self.config.drain_timeout)
+        if not finished:
+            print(f"⚠️  Drain timeout: cancelling {self.admission.active} running request(s)", file=sys.stderr)
+        for task in list(self._connections):
+            task.cancel()
+        await asyncio.gather(*self._connections, return_exceptions=True)
+        if self._server is not None:
+            await self._server.wait_closed()
+
+    async def serve_until_signalled(self, sock: Optional[socket.socket] = None) -> None:
+        await self.start(sock)
+        stop = asyncio.Event()
+        loop = asyncio.get_running_loop()
+        for signum in (signal.SIGTERM, signal.SIGINT):
+            loop.add_signal_handler(signum, stop.set)
+        print(f"🌐 Worker {os.getpid()} serving on http://{self.config.host}:{self.port}", file=sys.stderr)
+        await stop.wait()
+        await self.shutdown()
+
+    # -------------------------------
+    # Connections
+    # -------------------------------
+    async def _connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        task = asyncio.current_task()
+        self._connections.add(task)
+        try:
+            while True:
+                try:
+                    request = await asyncio.wait_for(read_request(reader), self.config.keepalive_timeout)
+                except asyncio.TimeoutError:
+                    break
+                except HTTPError as e:
+                    await self._send_json(writer, e.status, {"error": e.message}, keep_alive=False)
+                    break
+                if request is None:
+                    break
+                request.keep_alive = request.keep_alive and not self.admission.draining
+                handler = self.routes.get(request.path)
+                started = time.perf_counter()
+                status = 200
+                try:
+                    if handler is None:
+                        raise HTTPError(404, f"No route for {request.path}")
+                    if request.method not in ("GET", "POST"):
+                        raise HTTPError(405, "Use GET or POST")
+                    await handler(request, writer)
+                except HTTPError as e:
+                    status = e.status
+                    headers = {"Retry-After": str(e.retry_after)} if e.retry_after else {}
+                    await self._send_json(writer, e.status, {"error": e.message}, request.keep_alive, headers)
+                metrics.inc("http_requests_total", route=request.path if handler else "other", status=str(status))
+                metrics.observe("http_request_duration_ms", (time.perf_counter() - started) * 1000,
+                                route=request.path if handler else "other")
+                if not request.keep_alive or self.admission.draining:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            self._connections.discard(task)
+            writer.close()
+
+    async def _send(self, writer: asyncio.StreamWriter, status: int, body: bytes, content_type: str,
+                    keep_alive: bool, headers: Optional[Dict[str, str]] = None) -> None:
+        lines = [f"HTTP/1.1 {status} {REASONS.get(status, 'Unknown')}",
+                 f"Content-Type: {content_type}",
+                 f"Content-Length: {len(body)}",
+                 "Connection: keep-alive" if keep_alive else "Connection: close"]
+        if keep_alive:
+            lines.append(f"Keep-Alive: timeout={int(self.config.keepalive_timeout)}")
+        lines.extend(f"{name}: {value}" for name, value in (headers or {}).items())
+        writer.write(("\r\n".join(lines) + "\r\n\r\n").encode("latin-1") + body)
+        await writer.drain()
+
+    async def _send_json(self, writer: asyncio.StreamWriter, status: int, payload: Any, keep_alive: bool,
+                         headers: Optional[Dict[str, str]] = None) -> None:
+        body = json.dumps(payload).encode()
+        await self._send(writer, status, body, "application/json", keep_alive, headers)
+
+    # -------------------------------
+    # Handlers
+    # -------------------------------
+    async def _health(self, request: Request, writer: asyncio.StreamWriter) -> None:
+        status = 503 if self.admission.draining else 200
+        await self._send_json(writer, status, {
+            "status": "draining" if self.admission.draining else "ok",
+            "active": self.admission.active,
+            "queued": self.admission.queued,
+        }, request.keep_alive)
+
+    async def _metrics(self, request: Request, writer: asyncio.StreamWriter) -> None:
+        body = metrics.get_registry().render_prometheus().encode()
+        await self._send(writer, 200, body, "text/plain; version=0.0.4", request.keep_alive)
+
+    def _deadline(self, request: Request) -> float:
+        timeout = self.config.request_timeout
+        return request.deadline(get_policy(request.endpoint).timeout if timeout is None else timeout)
+
+    async def _answer(
+        self, agent_fn: AgentFn, request: Request, writer: asyncio.StreamWriter, mode: str
+    ) -> None:
+        query = request.user_query()
+        asked = classify_mode(query)
+        if asked != mode:
+            # The agents pick their mode from the query, so a mismatch would answer the wrong route
+            other = next((path for path, route_mode in ROUTE_MODES.items() if route_mode == asked), None)
+            hint = f"; send it to {other}" if other in self.routes else ""
+            raise HTTPError(400, f"{request.endpoint} answers {mode} queries, this is a {asked} query{hint}")
+        try:
+            result_query = ResultQuery.from_params(request.query)
+        except ValueError as e:
+            raise HTTPError(400, str(e))
+        deadline = self._deadline(request)
+        await self.admission.acquire(deadline)
+        try:
+            # The agent degrades to local data just before the deadline; wait_for is the backstop
+            with budget_scope(request.endpoint, deadline):
+                response = await asyncio.wait_for(agent_fn(query), max(0.0, deadline - time.monotonic()))
+        except asyncio.TimeoutError:
+            raise HTTPError(504, "Deadline exceeded")
+        except Exception as e:
+            print(f"❌ Request failed: {type(e).__name__}: {e}", file=sys.stderr)
+            raise HTTPError(500, "Internal error")
+        finally:
+            self.admission.release()
+        # Agent-level failures (unparseable model output) are upstream errors
+        status = 502 if isinstance(response, dict) and response.get("error") else 200
+        if status == 200 and isinstance(response, dict):
+            response = result_query.apply(response)
+        await self._send_json(writer, status, response, request.keep_alive)
+
+    async def _stream(self, stream_fn: StreamFn, request: Request, writer: asyncio.StreamWriter) -> None:
+        query = request.user_query()
+        deadline = self._deadline(request)
+        await self.admission.acquire(deadline)
+        events = stream_fn(query).__aiter__()
+        # Events run in this task, so the budget must stay set while they are consumed
+        with budget_scope(request.endpoint, deadline):
+            try:
+                head = ["HTTP/1.1 200 OK", "Content-Type: application/x-ndjson", "Transfer-Encoding: chunked",
+                        "Cache-Control: no-cache", "Connection: keep-alive" if request.keep_alive else "Connection: close"]
+                writer.write(("\r\n".join(head) + "\r\n\r\n").encode("latin-1"))
+                while True:
+                    try:
+                        event = await asyncio.wait_for(events.__anext__(), max(0.0, deadline - time.monotonic()))
+                    except StopAsyncIteration:
+                        break
+                    except asyncio.TimeoutError:
+                        event = {"type": "error", "error": "Deadline exceeded"}
+                        self._write_chunk(writer, event)
+                        break
+                    except Exception as e:
+                        print(f"❌ Stream failed: {type(e).__name__}: {e}", file=sys.stderr)
+                        self._write_chunk(writer, {"type": "error", "error": "Internal error"})
+                        break
+                    self._write_chunk(writer, event)
+                    await writer.drain()
+                writer.write(b"0\r\n\r\n")
+                await writer.drain()
+            finally:
+                await events.aclose()
+                self.admission.release()
+
+    @staticmethod
+    def _write_chunk(writer: asyncio.StreamWriter, event: Dict[str, Any]) -> None:
+        data = (json.dumps(event, default=str) + "\n").encode()
+        writer.write(f"{len(data):x}\r\n".encode() + data + b"\r\n")
+
+
+# -------------------------------
+# Workers
+# -------------------------------
+def bind_socket(host: str, port: int) -> socket.socket:
+    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((host, port))
+    sock.listen(1024)
+    sock.setblocking(False)
+    return sock
+
+
+@dataclass
+class RestartPolicy:
+    """Backoff before restarting a dead worker, and crash-loop detection."""
+    backoff: float = RESTART_BACKOFF
+    max_backoff: float = MAX_RESTART_BACKOFF
+    max_restarts: int = CRASH_LOOP_RESTARTS
+    window: float = CRASH_LOOP_WINDOW
+    exits: Dict[int, List[float]] = field(default_factory=dict)   # worker index -> recent exit times
+
+    def delay(self, index: int, now: float) -> Optional[float]:
+        """Seconds to wait before restarting worker `index`, or None when it is crash looping."""
+        recent = [t for t in self.exits.get(index, []) if now - t < self.window] + [now]
+        self.exits[index] = recent
+        if len(recent) > self.max_restarts:
+            return None
+        return min(self.max_backoff, self.backoff * 2 ** (len(recent) - 1))
+
+
+def _worker(
+    make_server: Callable[[], TravelServer],
+    sock: socket.socket,
+    cleanup: Callable[[], Awaitable[None]],
+    index: int = 0,
+) -> None:
+    # Metrics live in each worker's own registry, so each worker exposes them
+    metrics.maybe_serve_metrics(index)
+
+    server = make_server()
+    if index != 0:
+        # Workers share the result cache: one prewarmer is enough, more would multiply its request budget
+        server.background = []
+
+    async def run() -> None:
+        try:
+            await server.serve_until_signalled(sock)
+        finally:
+            await cleanup()
+    asyncio.run(run())
+
+
+def run_workers(
+    make_server: Callable[[], TravelServer],
+    config: ServerConfig,
+    cleanup: Callable[[], Awaitable[None]],
+) -> None:
+    """Serve with `config.workers` processes sharing one listening socket.
+
+    The parent binds and warms up before forking so children inherit the
+    socket, the loaded tables and the shared result cache; it forwards
+    SIGTERM/SIGINT and replaces workers that die unexpectedly.
+    """
+    from cache import share_result_cache
+    from startup import warmup
+    from timetable import share_timetable
+
+    sock = bind_socket(config.host, config.port)
+    forking = config.workers > 1 and hasattr(os, "fork")
+    if forking:
+        share_result_cache(config.shared_cache_mb)
+        share_timetable()
+    warmup(preload_sdk=True, preload_dateparser=forking)
+    if not forking:
+        _worker(make_server, sock, cleanup)
+        return
+    # Keep the warmed-up objects out of the collector so children do not touch (and copy) their pages
+    gc.freeze()
+
+    children: Dict[int, int] = {}   # pid -> worker index
+    restarts = RestartPolicy()
+    stopping = False
+    crash_loop = False
+
+    def spawn(index: int) -> None:
+        pid = os.fork()
+        if pid == 0:
+            signal.signal(signal.SIGTERM, signal.SIG_DFL)
+            signal.signal(signal.SIGINT, signal.SIG_DFL)
+            try:
+                _worker(make_server, sock, cleanup, index)
+            finally:
+                os._exit(0)
+        children[pid] = index
+
+    def stop(signum: int, frame: Any) -> None:
+        nonlocal stopping
+        stopping = True
+        for pid in children:
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, stop)
+    for index in range(config.workers):
+        spawn(index)
+    print(f"🌐 {config.workers} workers on http://{config.host}:{config.port}", file=sys.stderr)
+    while children:
+        try:
+            pid, status = os.wait()
+        except ChildProcessError:
+            break
+        except InterruptedError:
+            continue
+        index = children.pop(pid, None)
+        if stopping or index is None:
+            continue
+        delay = restarts.delay(index, time.monotonic())
+        if delay is None:
+            print(f"❌ Worker {index} exited {restarts.max_restarts + 1} times within "
+                  f"{restarts.window:g}s; stopping the server", file=sys.stderr)
+            crash_loop = True
+            stop(signal.SIGTERM, None)
+            continue
+        print(f"⚠️  Worker {pid} exited ({status}); restarting in {delay:g}s", file=sys.stderr)
+        # Sleep in slices so a SIGTERM during the backoff is not delayed by it
+        restart_at = time.monotonic() + delay
+        while not stopping and time.monotonic() < restart_at:
+            time.sleep(max(0.0, min(0.1, restart_at - time.monotonic())))
+        if not stopping:
+            spawn(index)
+    if crash_loop:
+        raise SystemExit(1)
+
+
+def add_server_arguments(parser: argparse.ArgumentParser) -> None:
+    parser.add_argument("--host", default=DEFAULT_HOST)
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("--workers", type=int, default=int(os.getenv("SERVER_WORKERS", "1")))
+    parser.add_argument("--max-concurrency", type=int, default=DEFAULT_MAX_CONCURRENCY,
+                        help="Queries running at once per worker")
+    parser.add_argument("--max-queue", type=int, default=DEFAULT_MAX_QUEUE,
+                        help="Queries waiting per worker before 429")
+    parser.add_argument("--timeout", type=float, default=DEFAULT_REQUEST_TIMEOUT,
+                        help="Per-request deadline in seconds for every route, instead of the per-route "
+                             "DEADLINE_<ROUTE>_TIMEOUT policies (X-Timeout header overrides)")
+    parser.add_argument("--drain-timeout", type=float, default=DEFAULT_DRAIN_TIMEOUT)
+    parser.add_argument("--shared-cache-mb", type=float, default=DEFAULT_SHARED_CACHE_MB,
+                        help="Size of the result cache shared by --workers processes")
+
+
+def run_server_cli(
+    args: argparse.Namespace,
+    trains: AgentFn,
+    stream: Optional[StreamFn],
+    flights: Optional[AgentFn],
+    cleanup: Callable[[], Awaitable[None]],
+    background: Sequence[BackgroundFn] = (),
+) -> None:
+    config = ServerConfig(
+        host=args.host,
+        port=args.port,
+        max_concurrency=args.max_concurrency,
+        max_queue=args.max_queue,
+        request_timeout=args.timeout,
+        drain_timeout=args.drain_timeout,
+        workers=args.workers,
+        shared_cache_mb=args.shared_cache_mb,
+    )
+    run_workers(lambda: TravelServer(trains, stream, flights, config, background), config, cleanup)
@@ -0,0 +1,202 @@
+import os
+import re
+from collections import deque
+from dataclasses import dataclass
+from typing import Any, AsyncIterator, Awaitable, Callable, Deque, Dict, Optional
+
+import metrics
+from agent_core import resolve_flight_info, resolve_train_travel_info
+from date_resolver import date_range_phrase, resolve_date
+from results import ResultQuery
+from router import FLIGHT_MODE, FLIGHT_PATTERN, TRAIN_MODE, TRAIN_PATTERN
+from streaming import response_events
+
+# -------------------------------
+# Conversation sessions
+# -------------------------------
+# A Session remembers the last few answered turns (parameters + response).
+# A follow-up such as "what about sleeper?", "and on Sunday?", "the return
+# trip?" or "which is cheapest?" is resolved locally against the last turn:
+#   - parameter deltas (class, date or range, one place, direction, train
+#     <-> flight) become an explicit query, so it runs through the usual
+#     cache -> fast path -> providers pipeline and only what changed is
+#     looked up again,
+#   - pure refinements (cheapest, fastest, earliest, available only, after
+#     a time) are answered from the last results without any lookup.
+# Only `max_turns` turns are kept; older ones are evicted.
+
+DEFAULT_MAX_TURNS = int(os.getenv("SESSION_MAX_TURNS", "8"))
+
+FOLLOW_UP_PREFIX = re.compile(r"^\s*(?:(?:and|so|ok|okay|then|what about|how about|same for|same)\b[\s,]*)+")
+SWAP_PATTERN = re.compile(r"\b(return|returning|way back|coming back|reverse|other way|opposite direction)\b")
+SORT_PATTERNS = (
+    ("cheapest", re.compile(r"\b(cheapest|cheaper|lowest fare|least expensive)\b")),
+    ("fastest", re.compile(r"\b(fastest|quickest|shortest)\b")),
+    ("earliest", re.compile(r"\b(earliest|first one)\b")),
+)
+AVAILABLE_ONLY_PATTERN = re.compile(r"\b(only available|available only|with seats|confirmed)\b")
+AFTER_PATTERN = re.compile(r"\bafter\s+(\d{1,2})(?::(\d{2}))?\s*([ap])?\.?m?\b")
+
+AnswerFn = Callable[[str], Awaitable[Dict[str, Any]]]
+StreamFn = Callable[[str], AsyncIterator[Dict[str, Any]]]
+
+
+@dataclass
+class Turn:
+    query: str
+    mode: str
+    params: Dict[str, Any]      # source, destination, date (or dates), class / cabin_class
+    response: Dict[str, Any]
+
+
+@dataclass
+class FollowUp:
+    query: Optional[str]                 # explicit query to run, or None to refine the last results
+    refine: Optional[ResultQuery] = None
+
+
+def _refinement(text: str) -> Optional[ResultQuery]:
+    query = ResultQuery()
+    for sort, pattern in SORT_PATTERNS:
+        if pattern.search(text):
+            query.sort = sort
+            break
+    query.available_only = bool(AVAILABLE_ONLY_PATTERN.search(text))
+    after = AFTER_PATTERN.search(text)
+    if after:
+        hours = int(after.group(1)) % 12 + (12 if after.group(3) == "p" else 0) if after.group(3) else int(after.group(1))
+        if hours < 24:
+            query.departs_after = f"{hours:02d}:{after.group(2) or '00'}"
+    return None if query.is_empty() else query
+
+
+def _params(response: Dict[str, Any]) -> Dict[str, Any]:
+    params = {key: response[key] for key in ("source", "destination", "class", "cabin_class") if key in response}
+    if "dates" in response:
+        params["dates"] = list(response["dates"])
+        params["date"] = response["dates"][0] if response["dates"] else ""
+    else:
+        params["date"] = response.get("date", "")
+    return params
+
+
+def explicit_query(mode: str, params: Dict[str, Any], range_phrase: Optional[str] = None) -> str:
+    """A query the local extractors resolve completely (see router.score_*_query)."""
+    if mode == FLIGHT_MODE:
+        text = f"Flights from {params['source']} to {params['destination']} in {params.get('cabin_class') or 'economy'} class"
+    else:
+        text = f"Trains from {params['source']} to {params['destination']} in {params.get('class') or '3A'}"
+    return f"{text} {range_phrase}" if range_phrase else f"{text} on {params['date']}"
+
+
+class Session:
+    def __init__(self, max_turns: int = DEFAULT_MAX_TURNS) -> None:
+        self.turns: Deque[Turn] = deque(maxlen=max_turns)
+
+    @property
+    def last(self) -> Optional[Turn]:
+        return self.turns[-1] if self.turns else None
+
+    def record(self, query: str, response: Any) -> None:
+        """Remember an answered turn; errors and responses without a route are not follow-up targets."""
+        if not isinstance(response, dict) or response.get("error") or not response.get("source"):
+            return
+        mode = FLIGHT_MODE if "flights" in response or "cabin_class" in response else TRAIN_MODE
+        self.turns.append(Turn(query, mode, _params(response), response))
+
+    def follow_up(self, query: str) -> Optional[FollowUp]:
+        """Resolve `query` against the last turn, or None when it is a new query."""
+        last = self.last
+        if last is None:
+            return None
+        text = " ".join(query.lower().split())
+        remainder = FOLLOW_UP_PREFIX.sub("", text).strip(" ?.!")
+
+        mode = last.mode
+        if last.mode == TRAIN_MODE and FLIGHT_PATTERN.search(text) and not TRAIN_PATTERN.search(text):
+            mode = FLIGHT_MODE
+        elif last.mode == FLIGHT_MODE and TRAIN_PATTERN.search(text):
+            mode = TRAIN_MODE
+
+        if mode == FLIGHT_MODE:
+            info, resolution = resolve_flight_info(query)
+            class_key, class_explicit = "cabin_class", resolution["cabin_explicit"]
+        else:
+            info, resolution = resolve_train_travel_info(query)
+            class_key, class_explicit = "class", resolution["class_explicit"]
+        if resolution["source_known"] and resolution["destination_known"]:
+            return None  # a complete new route
+
+        params = {key: value for key, value in last.params.items() if key != "dates"}
+        if mode != last.mode:
+            params.pop("class" if mode == FLIGHT_MODE else "cabin_class", None)
+        changed = mode != last.mode
+
+        if SWAP_PATTERN.search(text):
+            params["source"], params["destination"] = params["destination"], params["source"]
+            changed = True
+        if resolution["source_known"] and " from " in f" {text} ":
+            params["source"] = info["source"]
+            changed = True
+        elif resolution["source_known"] or resolution["destination_known"]:
+            # A lone place ("what about Pune?") replaces the destination
+            params["destination"] = info["destination"] or info["source"]
+            changed = True
+        if class_explicit:
+            params[class_key] = info[class_key]
+            changed = True
+
+        range_phrase = date_range_phrase(text)
+        if range_phrase:
+            changed = True
+        elif resolution["date_parsed"]:
+            params["date"] = info["date"]
+            changed = True
+        elif remainder and resolve_date(remainder, fallback=False):
+            # A bare date ("and sunday?") has no "on" cue for the extractor; the
+            # dateparser fallback would read "after 6pm" or "now" as today
+            params["date"] = resolve_date(remainder, fallback=False)
+            changed = True
+        elif "dates" in last.params and changed:
+            range_phrase = date_range_phrase(last.query)
+
+        refine = _refinement(text)
+        if not changed:
+            return FollowUp(None, refine) if refine is not None else None
+        if params["source"] == params["destination"]:
+            return None
+        metrics.inc("follow_ups_total", kind="rewritten")
+        return FollowUp(explicit_query(mode, params, range_phrase), refine)
+
+
+async def answer_in_session(session: Session, query: str, answer: AnswerFn) -> Dict[str, Any]:
+    """Answer `query` with `answer`, resolving follow-ups against the session first."""
+    plan = session.follow_up(query)
+    if plan is not None and plan.query is None:
+        metrics.inc("follow_ups_total", kind="refined")
+        return plan.refine.apply(session.last.response)
+    effective = plan.query if plan is not None else query
+    response = await answer(effective)
+    session.record(effective, response)
+    if plan is not None and plan.refine is not None and isinstance(response, dict):
+        response = plan.refine.apply(response)
+    return response
+
+
+async def stream_in_session(session: Session, query: str, stream: StreamFn) -> AsyncIterator[Dict[str, Any]]:
+    """Streaming variant of answer_in_session, for the interactive main() loops."""
+    plan = session.follow_up(query)
+    if plan is not None and plan.query is None:
+        metrics.inc("follow_ups_total", kind="refined")
+        for event in response_events(plan.refine.apply(session.last.response)):
+            yield event
+        return
+    effective = plan.query if plan is not None else query
+    if plan is not None:
+        yield {"type": "status", "stage": "follow_up", "query": effective}
+    async for event in stream(effective):
+        if event["type"] == "done":
+            session.record(effective, event["response"])
+            if plan is not None and plan.refine is not None and isinstance(event["response"], dict):
+                event = {**event, "response": plan.refine.apply(event["response"])}
+        yield event
@@ -0,0 +1,99 @@
+import asyncio
+import copy
+import re
+from typing import Any, Awaitable, Callable, Dict, Hashable, Optional
+
+import metrics
+from cache import FLIGHT_AVAILABILITY, TRAIN_AVAILABILITY, make_key
+from router import FLIGHT_MODE, classify_mode, score_flight_query, score_train_query
+
+# -------------------------------
+# Request coalescing (single-flight)
+# -------------------------------
+# Concurrent equivalent requests share one agent run: the first caller
+# starts it as a task, later callers await the same task and all receive
+# its result or its exception. The run is only cancelled once every
+# waiter has given up, so one impatient client cannot fail the others.
+
+WHITESPACE = re.compile(r"\s+")
+
+
+class SingleFlightStats:
+    def __init__(self) -> None:
+        self.started = 0     # computations actually run
+        self.joined = 0      # callers served by someone else's computation
+        self.abandoned = 0   # computations cancelled because every waiter left
+
+    def as_dict(self) -> Dict[str, int]:
+        return {"started": self.started, "joined": self.joined, "abandoned": self.abandoned}
+
+
+class _Call:
+    def __init__(self, task: "asyncio.Task[Any]") -> None:
+        self.task = task
+        self.waiters = 0
+
+
+class SingleFlight:
+    def __init__(self) -> None:
+        self._calls: Dict[Hashable, _Call] = {}
+        self.stats = SingleFlightStats()
+
+    def in_flight(self, key: Hashable) -> bool:
+        return key in self._calls
+
+    async def do(self, key: Hashable, fn: Callable[[], Awaitable[Any]]) -> Any:
+        """Run `fn()` once per key at a time; concurrent callers with the same key share it.
+
+        Callers other than the one that started the run get a deep copy of
+        the result, so mutating a response never leaks into another caller.
+        """
+        call = self._calls.get(key)
+        leader = call is None
+        if leader:
+            call = self._calls[key] = _Call(asyncio.ensure_future(fn()))
+            call.task.add_done_callback(lambda _, key=key, call=call: self._forget(key, call))
+            self.stats.started += 1
+        else:
+            self.stats.joined += 1
+            metrics.inc("coalesced_requests_total")
+
+        call.waiters += 1
+        try:
+            # shield: cancelling this caller must not cancel the shared run
+            result = await asyncio.shield(call.task)
+        finally:
+            call.waiters -= 1
+            if call.waiters == 0 and not call.task.done():
+                self._forget(key, call)
+                call.task.cancel()
+                self.stats.abandoned += 1
+                metrics.inc("abandoned_runs_total")
+        return result if leader else copy.deepcopy(result)
+
+    def _forget(self, key: Hashable, call: _Call) -> None:
+        if self._calls.get(key) is call:
+            del self._calls[key]
+
+
+def request_key(query: str) -> Hashable:
+    """Coalescing key: resolved train or flight parameters when confident, else the normalized text."""
+    if classify_mode(query) == FLIGHT_MODE:
+        decision = score_flight_query(query)
+        if decision.is_confident():
+            return make_key(FLIGHT_AVAILABILITY, decision.info)
+    else:
+        decision = score_train_query(query)
+        if decision.is_confident():
+            return make_key(TRAIN_AVAILABILITY, decision.info)
+    return ("query", WHITESPACE.sub(" ", query.strip().lower()))
+
+
+_single_flight: Optional[SingleFlight] = None
+
+
+def get_single_flight() -> SingleFlight:
+    global _single_flight
+    if _single_flight is None:
+        _single_flight = SingleFlight()
+    return _single_flight
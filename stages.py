@@ -0,0 +1,70 @@
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, Iterator, List, Optional
+
+# -------------------------------
+# Per-request stage timing
+# -------------------------------
+# Code marks its stages with `with stage("validation"):`. Timings are only
+# recorded inside collect_stages() (the benchmark harness); elsewhere a
+# stage costs one context-variable lookup. Stages may nest, e.g. a tool
+# call includes the extraction it performs.
+
+StageTimes = Dict[str, List[float]]
+
+_collector: ContextVar[Optional[StageTimes]] = ContextVar("stage_collector", default=None)
+
+
+@contextmanager
+def stage(name: str) -> Iterator[None]:
+    times = _collector.get()
+    if times is None:
+        yield
+        return
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        times.setdefault(name, []).append((time.perf_counter() - started) * 1000)
+
+
+def record_stage(name: str, elapsed_ms: float) -> None:
+    """Record a stage measured elsewhere (e.g. around a callback we do not own)."""
+    times = _collector.get()
+    if times is not None:
+        times.setdefault(name, []).append(elapsed_ms)
+
+
+@contextmanager
+def collect_stages() -> Iterator[StageTimes]:
+    """Collect stage timings (milliseconds) for everything run in this context.
+
+    Tasks spawned inside inherit the collector, so tool calls the agents SDK
+    runs concurrently are recorded too. Nested collectors share the
+    outermost one's timings.
+    """
+    outer = _collector.get()
+    if outer is not None:
+        yield outer
+        return
+    times: StageTimes = {}
+    token = _collector.set(times)
+    try:
+        yield times
+    finally:
+        _collector.reset(token)
+
+
+def current_stages() -> Optional[StageTimes]:
+    return _collector.get()
+
+
+@contextmanager
+def collecting_into(times: StageTimes) -> Iterator[StageTimes]:
+    """Collect into an existing `times`, for work resumed step by step (async generators)."""
+    token = _collector.set(times)
+    try:
+        yield times
+    finally:
+        _collector.reset(token)
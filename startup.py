@@ -0,0 +1,84 @@
+import importlib
+import os
+import sys
+import time
+from typing import IO, Callable, Dict, List, Optional, Tuple
+
+# -------------------------------
+# Warm-up and cold-start profiling
+# -------------------------------
+# Entry modules import only the light extraction code. Heavy dependencies
+# load on first use, or up front through warmup() - ideally in a parent
+# process before workers fork, so children share the pages copy-on-write.
+
+HEAVY_MODULES = ("pydantic", "models.models", "httpx", "openai", "agents")
+STARTUP_BUDGET_MS = float(os.getenv("STARTUP_BUDGET_MS", "1500"))
+
+
+def _import(name: str) -> Callable[[], None]:
+    return lambda: importlib.import_module(name)
+
+
+def _build_tables() -> None:
+    from airports import get_airport_index
+    from gazetteer import get_gazetteer
+    get_gazetteer()
+    get_airport_index()
+
+
+def _load_timetable() -> None:
+    from timetable import get_timetable
+    get_timetable()
+
+
+def _prime_extractors() -> None:
+    # Compiles the remaining regexes and exercises the date fast path once
+    from agent_core import extract_train_travel_info
+    extract_train_travel_info("trains from Delhi to Mumbai on friday in sleeper class")
+
+
+def _load_dateparser() -> None:
+    from date_resolver import _get_fallback_parser
+    _get_fallback_parser()
+
+
+def warmup_steps(preload_sdk: bool = True, preload_dateparser: bool = False) -> List[Tuple[str, Callable[[], None]]]:
+    steps = [
+        ("build gazetteer", _build_tables),
+        ("load timetable", _load_timetable),
+        ("prime extractors", _prime_extractors),
+    ]
+    if preload_sdk:
+        steps = [(f"import {name}", _import(name)) for name in HEAVY_MODULES] + steps
+    if preload_dateparser:
+        steps.append(("load dateparser fallback", _load_dateparser))
+    return steps
+
+
+def warmup(preload_sdk: bool = True, preload_dateparser: bool = False) -> Dict[str, float]:
+    """Load heavy modules and build lookup tables; returns milliseconds per step."""
+    timings: Dict[str, float] = {}
+    for label, step in warmup_steps(preload_sdk, preload_dateparser):
+        started = time.perf_counter()
+        step()
+        timings[label] = (time.perf_counter() - started) * 1000
+    return timings
+
+
+def profile_startup(budget_ms: Optional[float] = None, file: IO[str] = sys.stderr) -> Dict[str, float]:
+    """Run the warm-up with every optional step and print a per-step time breakdown."""
+    budget_ms = STARTUP_BUDGET_MS if budget_ms is None else budget_ms
+    already_loaded = [name for name in HEAVY_MODULES if name in sys.modules]
+    timings = warmup(preload_sdk=True, preload_dateparser=True)
+    total = sum(timings.values())
+
+    print("⏱️  Startup profile", file=file)
+    for label, elapsed in sorted(timings.items(), key=lambda item: -item[1]):
+        share = elapsed / total * 100 if total else 0
+        print(f"  {label:<28} {elapsed:8.1f} ms  {share:5.1f}%", file=file)
+    print(f"  {'total':<28} {total:8.1f} ms  (budget {budget_ms:.0f} ms)", file=file)
+    if already_loaded:
+        print(f"  already imported before profiling: {', '.join(already_loaded)}", file=file)
+    if total > budget_ms:
+        print(f"⚠️  Cold start exceeds budget by {total - budget_ms:.0f} ms", file=file)
+    return timings
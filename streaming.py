@@ -0,0 +1,185 @@
+import json
+from typing import TYPE_CHECKING, Any, AsyncIterator, Dict, List, Optional
+
+import metrics
+from models.modes import FIELD_MODES
+
+if TYPE_CHECKING:
+    from agents import Agent, RunConfig
+
+# -------------------------------
+# Streaming results
+# -------------------------------
+# Events yielded to callers (all plain dicts, JSON-serializable):
+#   {"type": "status", "stage": ...}              progress (agent started, tool called, ...)
+#   {"type": "params", "params": {...}}           resolved source/destination/date/class
+#   {"type": "train" | "flight", "record": {...}} one result as soon as it is parsed
+#   {"type": "done", "response": {...}}           the complete validated response
+
+
+class IncrementalRecordParser:
+    """Pulls header params and individual train/flight objects out of a partial JSON stream.
+
+    Text is scanned once; each array element is decoded as soon as its
+    closing brace arrives, long before the whole document is valid JSON.
+    """
+
+    def __init__(self) -> None:
+        self.buffer = ""
+        self.record_type: Optional[str] = None
+        self.params_emitted = False
+        self._scan = 0          # next index to scan inside the array
+        self._depth = 0
+        self._in_string = False
+        self._escaped = False
+        self._object_start = -1
+        self._array_done = False
+        self._key_index = -1
+
+    def feed(self, delta: str) -> List[Dict[str, Any]]:
+        self.buffer += delta
+        events: List[Dict[str, Any]] = []
+        if self.record_type is None and not self._find_array():
+            return events
+        if not self.params_emitted:
+            params = self._parse_params()
+            if params is not None:
+                events.append({"type": "params", "params": params})
+            self.params_emitted = True
+        if not self._array_done:
+            events.extend(self._scan_records())
+        return events
+
+    def _find_array(self) -> bool:
+        for key, record_type in FIELD_MODES.items():
+            key_index = self.buffer.find(f'"{key}"')
+            if key_index == -1:
+                continue
+            bracket = self.buffer.find("[", key_index)
+            if bracket == -1:
+                return False
+            self.record_type = record_type
+            self._key_index = key_index
+            self._scan = bracket + 1
+            return True
+        return False
+
+    def _parse_params(self) -> Optional[Dict[str, Any]]:
+        # The object holding the records; structured output may wrap it as {"response": {...}}
+        start = self.buffer.rfind("{", 0, self._key_index)
+        if start == -1:
+            return None
+        head = self.buffer[start:self._key_index].rstrip().rstrip(",") + "}"
+        try:
+            return json.loads(head)
+        except json.JSONDecodeError:
+            return None
+
+    def _scan_records(self) -> List[Dict[str, Any]]:
+        events = []
+        text = self.buffer
+        for index in range(self._scan, len(text)):
+            char = text[index]
+            if self._in_string:
+                if self._escaped:
+                    self._escaped = False
+                elif char == "\\":
+                    self._escaped = True
+                elif char == '"':
+                    self._in_string = False
+                continue
+            if char == '"':
+                self._in_string = True
+            elif char == "{":
+                if self._depth == 0:
+                    self._object_start = index
+                self._depth += 1
+            elif char == "}":
+                self._depth -= 1
+                if self._depth == 0 and self._object_start != -1:
+                    try:
+                        record = json.loads(text[self._object_start:index + 1])
+                        events.append({"type": self.record_type, "record": record})
+                    except json.JSONDecodeError:
+                        pass
+                    self._object_start = -1
+            elif char == "]" and self._depth == 0:
+                self._array_done = True
+                self._scan = index + 1
+                return events
+        self._scan = len(text)
+        return events
+
+
+async def stream_agent_events(
+    agent: "Agent",
+    user_query: str,
+    run_config: Optional["RunConfig"] = None,
+) -> AsyncIterator[Dict[str, Any]]:
+    """Run `agent` with Runner.run_streamed, yielding progress and parsed records.
+
+    The last event is {"type": "final_output", "output": ...} carrying the raw
+    final output, which the caller validates into a "done" event.
+    """
+    from agents import Runner
+    from agents.exceptions import ModelBehaviorError
+    from structured import is_invalid_output, repair_output
+
+    parser = IncrementalRecordParser()
+    yield {"type": "status", "stage": "agent_started"}
+    result = Runner.run_streamed(agent, user_query, run_config=run_config, hooks=metrics.run_hooks())
+    try:
+        async for event in result.stream_events():
+            if event.type == "raw_response_event":
+                if getattr(event.data, "type", "") == "response.output_text.delta":
+                    for parsed in parser.feed(event.data.delta):
+                        yield parsed
+            elif event.type == "run_item_stream_event":
+                if event.name == "tool_called":
+                    raw = event.item.raw_item
+                    tool = getattr(raw, "name", None) or getattr(raw, "type", "tool")
+                    yield {"type": "status", "stage": "tool_called", "tool": tool}
+                elif event.name == "tool_output":
+                    yield {"type": "status", "stage": "tool_output"}
+    except ModelBehaviorError as e:
+        if not is_invalid_output(e):
+            raise
+        yield {"type": "status", "stage": "repairing_output"}
+        yield {"type": "final_output", "output": await repair_output(agent, user_query, e, run_config)}
+        return
+    metrics.count_hosted_tool_calls(result)
+    yield {"type": "final_output", "output": result.final_output}
+
+
+def response_events(response: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """Events for a response that was produced without the agent (fast path, cache)."""
+    events: List[Dict[str, Any]] = []
+    for key, record_type in FIELD_MODES.items():
+        if key in response:
+            params = {k: v for k, v in response.items() if k != key}
+            events.append({"type": "params", "params": params})
+            events.extend({"type": record_type, "record": record} for record in response[key])
+    events.append({"type": "done", "response": response})
+    return events
+
+
+def print_stream_event(event: Dict[str, Any]) -> None:
+    """Progressive console rendering used by the interactive main() loops."""
+    if event["type"] == "status":
+        detail = event.get("tool") or event.get("query")
+        suffix = f" ({detail})" if detail else ""
+        print(f"⏳ {event['stage'].replace('_', ' ')}{suffix}")
+    elif event["type"] == "params":
+        params = event["params"]
+        travel_class = params.get("class") or params.get("cabin_class", "")
+        print(f"🔎 {params.get('source', '?')} → {params.get('destination', '?')} on {params.get('date', '?')} [{travel_class}]")
+    elif event["type"] == "train":
+        record = event["record"]
+        print(f"🚆 {record.get('train_number', '')} {record.get('train_name', '')} "
+              f"{record.get('departure', '')}→{record.get('arrival', '')} {record.get('availability', '')}")
+    elif event["type"] == "flight":
+        record = event["record"]
+        print(f"✈️  {record.get('flight_number', '')} {record.get('departure', '')}→{record.get('arrival', '')} "
+              f"{record.get('availability', '')}")
+    elif event["type"] == "done":
+        print(json.dumps(event["response"], indent=2))
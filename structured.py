@@ -0,0 +1,103 @@
+import json
+from typing import TYPE_CHECKING, Any, Optional
+
+import metrics
+from agent_registry import get_agent
+
+if TYPE_CHECKING:
+    from agents import Agent, RunConfig, RunHooks
+    from agents.exceptions import ModelBehaviorError
+
+# -------------------------------
+# Structured output with one repair pass
+# -------------------------------
+# Agents declare their response model as output_type, so the SDK requests
+# schema-constrained JSON and returns a validated instance. If the model
+# still produces something the schema rejects, a tool-less clone of the
+# agent gets exactly one chance to return the corrected object. There is
+# no further retry.
+
+REPAIR_INSTRUCTIONS = """
+Your previous reply did not match the required JSON schema.
+Return the same answer as a single JSON object that matches the schema exactly.
+Do not add or remove results, do not explain, do not use markdown.
+"""
+
+
+def is_invalid_output(error: "ModelBehaviorError") -> bool:
+    """Whether the model's output failed schema validation (and not, e.g., a missing tool)."""
+    from pydantic import ValidationError
+
+    cause = error.__cause__ or error.__context__
+    return isinstance(cause, (ValidationError, json.JSONDecodeError))
+
+
+def _rejected_text(error: "ModelBehaviorError") -> str:
+    """The rejected reply, read from the validation error that caused `error`."""
+    from pydantic import ValidationError
+
+    cause = error.__cause__ or error.__context__
+    if isinstance(cause, json.JSONDecodeError):
+        return cause.doc
+    if isinstance(cause, ValidationError):
+        # Errors about the whole document (not JSON, wrong type) carry the reply itself as input;
+        # field errors only carry the field's value, so those fall back to the SDK's full message
+        for detail in cause.errors():
+            if not detail["loc"]:
+                value = detail["input"]
+                return value if isinstance(value, str) else json.dumps(value)
+    return str(error)
+
+
+def repair_prompt(user_query: str, error: "ModelBehaviorError") -> str:
+    details = str(error.__cause__) if error.__cause__ is not None else str(error)
+    return (
+        f"Original request:\n{user_query}\n\n"
+        f"Previous reply:\n{_rejected_text(error)}\n\n"
+        f"Validation errors:\n{details}"
+    )
+
+
+async def repair_output(
+    agent: "Agent",
+    user_query: str,
+    error: "ModelBehaviorError",
+    run_config: Optional["RunConfig"] = None,
+) -> Any:
+    """One repair turn; returns the validated output or, if that fails too, the rejected text."""
+    from agents import Runner
+    from agents.exceptions import ModelBehaviorError
+
+    metrics.inc("repair_attempts_total", agent=agent.name)
+    repairer = get_agent(
+        f"{agent.name} (repair)",
+        lambda: agent.clone(name=f"{agent.name} (repair)", instructions=REPAIR_INSTRUCTIONS, tools=[]),
+    )
+    try:
+        result = await Runner.run(repairer, repair_prompt(user_query, error), run_config=run_config)
+    except ModelBehaviorError as second:
+        if not is_invalid_output(second):
+            raise
+        metrics.inc("repair_failures_total", agent=agent.name)
+        return _rejected_text(second)
+    return result.final_output
+
+
+async def run_structured(
+    agent: "Agent",
+    user_query: str,
+    run_config: Optional["RunConfig"] = None,
+    hooks: Optional["RunHooks"] = None,
+) -> Any:
+    """Runner.run returning final_output, with a single repair pass on schema violations."""
+    from agents import Runner
+    from agents.exceptions import ModelBehaviorError
+
+    try:
+        result = await Runner.run(agent, user_query, run_config=run_config, hooks=hooks)
+    except ModelBehaviorError as e:
+        if not is_invalid_output(e):
+            raise
+        return await repair_output(agent, user_query, e, run_config)
+    metrics.count_hosted_tool_calls(result)
+    return result.final_output
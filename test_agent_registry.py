@@ -0,0 +1,73 @@
+import asyncio
+
+import pytest
+
+
+def test_shared_client_reports_connection_errors(monkeypatch):
+    """Test that a request through the pooled client fails as an APIConnectionError, not a TypeError"""
+    from openai import APIConnectionError
+
+    import agent_registry
+
+    monkeypatch.setenv("OPENAI_API_KEY", "offline-test")
+    monkeypatch.setenv("OPENAI_BASE_URL", "http://127.0.0.1:9/v1")
+
+    async def request():
+        try:
+            client = agent_registry.get_openai_client().with_options(max_retries=0)
+            await client.chat.completions.create(model="gpt-4o-mini", messages=[{"role": "user", "content": "hi"}])
+        finally:
+            await agent_registry.shutdown()
+
+    with pytest.raises(APIConnectionError):
+        asyncio.run(request())
+
+
+COMPLETION = {
+    "id": "chatcmpl-test", "object": "chat.completion", "created": 0, "model": "gpt-4o-mini",
+    "choices": [{"index": 0, "message": {"role": "assistant", "content": "hi"}, "finish_reason": "stop"}],
+}
+
+
+def test_each_event_loop_gets_its_own_client(monkeypatch):
+    """Test that a second asyncio.run does not reuse keep-alive connections of the first, closed loop"""
+    import json
+    import threading
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    import agent_registry
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def do_POST(self):
+            self.rfile.read(int(self.headers["Content-Length"]))
+            body = json.dumps(COMPLETION).encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    monkeypatch.setenv("OPENAI_API_KEY", "offline-test")
+    monkeypatch.setenv("OPENAI_BASE_URL", f"http://127.0.0.1:{server.server_address[1]}/v1")
+
+    async def request():
+        client = agent_registry.get_openai_client()
+        response = await client.with_options(max_retries=0).chat.completions.create(
+            model="gpt-4o-mini", messages=[{"role": "user", "content": "hi"}])
+        assert agent_registry.get_openai_client() is client
+        return client, response.choices[0].message.content
+
+    try:
+        first, answer = asyncio.run(request())
+        second, again = asyncio.run(request())
+        assert answer == again == "hi" and first is not second
+    finally:
+        asyncio.run(agent_registry.shutdown())
+        server.shutdown()
@@ -0,0 +1,94 @@
+import asyncio
+from datetime import date
+
+import agent_core
+from agent_core import extract_flight_info_from_prompt, flight_info_complete, resolve_flight_info
+from airports import get_airport_index
+from cache import ResultCache
+from models.models import FlightQueryRequest
+from router import try_flight_fast_path
+
+FLIGHTS = {
+    "source": "Delhi",
+    "destination": "Goa",
+    "date": "2025-04-18",
+    "cabin_class": "Economy",
+    "flights": [{"flight_number": "6E 2041", "departure": "06:10", "arrival": "08:45",
+                 "duration": "2h 35m", "availability": "Available", "fare": 5200}],
+}
+
+
+def _route(query):
+    source, destination = get_airport_index().resolve_route(query)
+    return (source and source.place.code, destination and destination.place.code)
+
+
+def test_airport_index_resolves_cities_aliases_and_codes():
+    """Test that city names, aliases and capitalised IATA codes resolve to airports"""
+    assert _route("Flights from Bombay to Bengaluru") == ("BOM", "BLR")
+    assert _route("BOM to DEL tomorrow") == ("BOM", "DEL")
+    assert _route("fly del to goa") == (None, "GOI"), "lowercase codes must not match"
+
+
+def test_cabin_class_and_date_rules():
+    """Test that cabin phrases map to FlightQueryRequest values and dates resolve locally"""
+    info, resolution = resolve_flight_info("Business class flights from Delhi to Mumbai on 18 April 2026")
+    assert info["cabin_class"] == "business" and resolution["cabin_explicit"]
+    assert info["date"] == "2026-04-18" and resolution["date_parsed"]
+    assert resolve_flight_info("fly to Goa for a business meeting")[0]["cabin_class"] == "economy"
+    assert resolve_flight_info("Flights from Delhi to Goa in first cabin")[0]["cabin_class"] == "first"
+
+
+def test_first_week_is_not_a_cabin_class():
+    """Test that "in first week of November" does not select first class"""
+    info, resolution = resolve_flight_info("Flights from Delhi to Goa in first week of November")
+    assert info["cabin_class"] == "economy" and not resolution["cabin_explicit"]
+
+
+def test_cabin_class_casing_is_normalized():
+    """Test that "Economy" / "Business Class" from a model or user validate"""
+    request = FlightQueryRequest(source="Delhi", destination="Goa", date="2025-04-18", cabin_class="Economy")
+    assert request.cabin_class == "economy"
+    assert FlightQueryRequest(source="", destination="", date="", cabin_class="Business Class").cabin_class == "business"
+
+
+def test_flight_extraction_escalates_only_ambiguous_prompts(monkeypatch):
+    """Test that resolved prompts never reach the model and ambiguous ones merge its answer"""
+    calls = []
+
+    async def fake_model(prompt, info, resolution):
+        calls.append(prompt)
+        return {**info, "source": "Delhi"}
+
+    monkeypatch.setattr(agent_core, "_extract_flight_info_with_model", fake_model)
+    local = asyncio.run(extract_flight_info_from_prompt("Flights from Chennai to Kolkata tomorrow"))
+    assert (local["source"], local["destination"], local["cabin_class"]) == ("Chennai", "Kolkata", "economy")
+    assert calls == []
+
+    escalated = asyncio.run(extract_flight_info_from_prompt("cheapest way to fly home to Goa"))
+    assert calls == ["cheapest way to fly home to Goa"]
+    assert (escalated["source"], escalated["destination"]) == ("Delhi", "Goa")
+
+
+def test_flight_fast_path_serves_cached_flights():
+    """Test that a confident flight query is answered from a cached flight response"""
+    cache = ResultCache()
+    cache.store_response(FLIGHTS)
+    response = try_flight_fast_path("Flights from DEL to Goa on 18 April 2025", cache.lookup_flights)
+    assert response is not None and response["flights"][0]["flight_number"] == "6E 2041"
+    assert try_flight_fast_path("Flights from Delhi to Pune on 18 April 2025", cache.lookup_flights) is None
+
+
+def test_bare_business_resolves_or_escalates():
+    """Test that "in business" picks the cabin and other bare business/first mentions go to the agent"""
+    info, resolution = resolve_flight_info("fly from Mumbai to Delhi in business")
+    assert info["cabin_class"] == "business" and flight_info_complete(info, resolution)
+    for query in ("fly from Mumbai to Delhi in business on friday", "first flight from BLR to DEL friday"):
+        assert not flight_info_complete(*resolve_flight_info(query)), query
+
+
+def test_flight_dates_without_on_are_resolved():
+    """Test that a bare weekday or ISO date is used instead of tomorrow"""
+    info, resolution = resolve_flight_info("flight from BLR to DEL friday")
+    assert date.fromisoformat(info["date"]).weekday() == 4 and resolution["date_parsed"]
+    assert resolve_flight_info("flight from BLR to DEL 2026-11-20")[0]["date"] == "2026-11-20"
@@ -0,0 +1,67 @@
+import asyncio
+import io
+import json
+
+import pytest
+
+from batch import RateLimiter, parse_query_line, run_batch
+
+
+async def _fake_agent(query):
+    # Later queries finish first so completion order differs from input order
+    await asyncio.sleep(0.01 * (3 - int(query[-1])))
+    if query.endswith("2"):
+        raise RuntimeError("boom")
+    return {"echo": query}
+
+
+def _run(ordered):
+    lines = [json.dumps({"id": f"q{i}", "query": f"query {i}"}) + "\n" for i in range(4)]
+    out = io.StringIO()
+    summary = asyncio.run(run_batch(lines, _fake_agent, out, concurrency=4, ordered=ordered))
+    return summary, [json.loads(line) for line in out.getvalue().splitlines()]
+
+
+def test_batch_ordered_output():
+    """Test that --ordered mode writes results in input order and records errors"""
+    summary, records = _run(ordered=True)
+    assert summary == {"total": 4, "ok": 3, "failed": 1}
+    assert [r["id"] for r in records] == ["q0", "q1", "q2", "q3"]
+    assert records[2]["error"] == "RuntimeError: boom"
+    assert records[0]["response"] == {"echo": "query 0"}
+
+
+def test_batch_completion_order_output():
+    """Test that the default mode writes results as soon as they complete"""
+    _, records = _run(ordered=False)
+    assert [r["id"] for r in records][0] == "q3", "Fastest query should be written first"
+
+
+def test_non_object_lines_are_rejected_without_aborting_the_batch():
+    """Test that JSON numbers, lists and null are reported per line instead of crashing the batch"""
+    for line in ("5", "[1]", "null"):
+        with pytest.raises(ValueError, match="expected an object or string"):
+            parse_query_line(line, 0)
+    lines = ["5\n", json.dumps({"id": "q1", "query": "query 1"}) + "\n"]
+    out = io.StringIO()
+    summary = asyncio.run(run_batch(lines, _fake_agent, out, ordered=True))
+    records = [json.loads(line) for line in out.getvalue().splitlines()]
+    assert summary == {"total": 2, "ok": 1, "failed": 1}
+    assert "expected an object or string" in records[0]["error"]
+
+
+def test_rate_limiter_spaces_requests():
+    """Test that the RPM limiter delays requests once the burst budget is spent"""
+    now = [0.0]
+    limiter = RateLimiter(requests_per_minute=60, clock=lambda: now[0])
+    limiter._request_budget = 1
+
+    async def scenario():
+        await limiter.acquire()
+        task = asyncio.create_task(limiter.acquire())
+        await asyncio.sleep(0)
+        assert not task.done(), "Second request should wait for the bucket to refill"
+        now[0] += 1.0
+        await asyncio.wait_for(task, timeout=2)
+
+    asyncio.run(scenario())
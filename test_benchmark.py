@@ -0,0 +1,63 @@
+import asyncio
+import os
+
+from benchmark import generate_workload, install_fake_provider, percentile, run_benchmark, uninstall_fake_provider
+
+
+def test_percentile_interpolates():
+    """Test that percentiles interpolate between ranked samples"""
+    values = [10.0, 20.0, 30.0, 40.0, 50.0]
+    assert percentile(values, 50) == 30.0
+    assert percentile(values, 95) == 48.0
+    assert percentile([], 99) == 0.0
+
+
+def test_benchmark_runs_offline_with_fake_model():
+    """Test that the offline agent runs end to end against the fake provider without network access"""
+    os.environ.setdefault("OPENAI_API_KEY", "offline-benchmark")
+    import railway_agent_openai_without_websearch as offline
+
+    model = install_fake_provider(latency_ms=1)
+    try:
+        workload = generate_workload(12, model_share=0.5, seed=1)
+        results = asyncio.run(run_benchmark(workload, offline.railway_agent, concurrency=4))
+        streamed = asyncio.run(_collect(offline.stream_railway_agent("any way to reach Pune starting at Mumbai?")))
+    finally:
+        uninstall_fake_provider()
+
+    assert results["errors"] == 0
+    assert results["fast_path"] + results["model_path"] == 12
+    assert results["model_path"] and model.turns == 2 * results["model_path"] + 2
+    assert {"model_turn", "extraction", "validation"} <= set(results["stages_ms"])
+    assert streamed[-1]["type"] == "done" and streamed[-1]["response"]["destination"] == "Pune"
+
+
+async def _collect(events):
+    return [event async for event in events]
+
+
+def test_web_agent_answers_train_queries_in_one_model_turn():
+    """Test that train queries reach the slim train agent with resolved parameters and skip the tool turn"""
+    os.environ.setdefault("OPENAI_API_KEY", "offline-benchmark")
+    import travel_agent_openai as web
+
+    model = install_fake_provider(latency_ms=0)
+    try:
+        response = asyncio.run(web.railway_agent("any trains to Pune from Mumbai around next friday?"))
+    finally:
+        uninstall_fake_provider()
+
+    assert response["source"] == "Mumbai" and response["destination"] == "Pune"
+    assert model.turns == 1 and model.input_tokens > 0
+
+
+def test_uninstalling_the_fake_provider_restores_tracing():
+    """Test that install/uninstall_fake_provider leave the global tracing setting as they found it"""
+    from agents.tracing import GLOBAL_TRACE_PROVIDER
+
+    before = GLOBAL_TRACE_PROVIDER._disabled
+    install_fake_provider(latency_ms=0)
+    install_fake_provider(latency_ms=0)
+    assert GLOBAL_TRACE_PROVIDER._disabled
+    uninstall_fake_provider()
+    assert GLOBAL_TRACE_PROVIDER._disabled == before
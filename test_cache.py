@@ -0,0 +1,120 @@
+import os
+
+import pytest
+
+from cache import (
+    FLIGHT_AVAILABILITY,
+    TRAIN_AVAILABILITY,
+    ResultCache,
+    SharedMemoryCacheTier,
+    SQLiteCacheTier,
+    TTLLRUCache,
+    make_key,
+)
+
+RESPONSE = {
+    "source": "Delhi",
+    "destination": "Mumbai",
+    "date": "2025-04-18",
+    "class": "3A",
+    "trains": [],
+}
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_key_ignores_case_and_spacing():
+    """Test that keys are built from normalized fields, not raw text"""
+    other = {"source": " delhi", "destination": "MUMBAI", "date": "2025-04-18", "class_type": "3a"}
+    assert make_key(TRAIN_AVAILABILITY, RESPONSE) == make_key(TRAIN_AVAILABILITY, other)
+
+
+def test_ttl_and_lru_eviction():
+    """Test per-mode expiry and least-recently-used eviction"""
+    clock = FakeClock()
+    memory = TTLLRUCache(max_entries=2, ttls={TRAIN_AVAILABILITY: 10, FLIGHT_AVAILABILITY: 100}, clock=clock)
+    memory.set(("train_availability", "a"), 1)
+    memory.set(("flight_availability", "b"), 2)
+    clock.now = 11
+    assert memory.get(("train_availability", "a")) is None, "Availability entry should have expired"
+    assert memory.get(("flight_availability", "b")) == 2, "Flight entry should still be live"
+
+    memory.set(("flight_availability", "c"), 3)
+    memory.set(("flight_availability", "d"), 4)
+    assert memory.get(("flight_availability", "b")) is None, "Oldest entry should have been evicted"
+    assert memory.evictions == 1
+
+
+def test_result_cache_counts_and_persists(tmp_path):
+    """Test hit/miss counters and that the SQLite tier survives a new cache instance"""
+    path = str(tmp_path / "cache.db")
+    cache = ResultCache(persistent=SQLiteCacheTier(path))
+    assert cache.lookup_trains(RESPONSE) is None
+    cache.store_response(RESPONSE)
+    assert cache.lookup_trains(RESPONSE) == []
+    assert cache.snapshot()["hits"] == {TRAIN_AVAILABILITY: 1}
+    assert cache.snapshot()["misses"] == {TRAIN_AVAILABILITY: 1}
+    cache.close()
+
+    restarted = ResultCache(persistent=SQLiteCacheTier(path))
+    assert restarted.lookup_trains(RESPONSE) == []
+    assert restarted.snapshot()["persistent_hits"] == 1
+    restarted.close()
+
+
+@pytest.mark.skipif(not hasattr(os, "fork"), reason="needs fork")
+def test_shared_tier_is_visible_across_forked_workers():
+    """Test that a response stored by one forked worker is a hit in another worker's cache"""
+    shared = SharedMemoryCacheTier(1024 * 1024)
+    pid = os.fork()
+    if pid == 0:
+        ResultCache(persistent=shared).store_response(RESPONSE)
+        os._exit(0)
+    os.waitpid(pid, 0)
+    other_worker = ResultCache(persistent=shared)
+    assert other_worker.lookup_trains(RESPONSE) == []
+    assert other_worker.snapshot()["persistent_hits"] == 1
+
+
+def test_shared_tier_replaces_the_entry_expiring_first():
+    """Test bucket replacement, expiry and that oversized values are not shared"""
+    shared = SharedMemoryCacheTier(4 * 512, slot_size=512, ways=4)
+    for n in range(5):
+        shared.set(("train_availability", str(n)), {"n": n}, ttl=10 + n)
+    assert shared.get(("train_availability", "0")) is None, "the entry expiring first was replaced"
+    assert shared.get(("train_availability", "4"))[1] == {"n": 4}
+    shared.set(("train_availability", "4"), {"n": 40}, ttl=-1)
+    assert shared.get(("train_availability", "4")) is None
+    assert shared.get_stale(("train_availability", "4"), 60)[1] == {"n": 40}
+    shared.set(("train_availability", "big"), {"x": "y" * 1024}, ttl=10)
+    assert shared.get(("train_availability", "big")) is None and shared.oversized == 1
+
+
+def test_ttl_remaining_sees_entries_refreshed_by_other_workers():
+    """Test that ttl_remaining falls back to the shared tier when the memory tier misses"""
+    shared = SharedMemoryCacheTier(1024 * 1024)
+    ResultCache(persistent=shared).store_response(RESPONSE)
+    other_worker = ResultCache(persistent=shared)
+    assert other_worker.ttl_remaining(TRAIN_AVAILABILITY, RESPONSE) > 0
+    assert ResultCache().ttl_remaining(TRAIN_AVAILABILITY, RESPONSE) is None
+
+
+def test_shared_tier_skips_a_bucket_whose_lock_is_held():
+    """Test that a lock held by a dead worker turns into a miss and a skipped write, not a hang"""
+    shared = SharedMemoryCacheTier(4 * 512, slot_size=512, ways=4, lock_timeout=0.01)
+    key = (TRAIN_AVAILABILITY, "delhi")
+    shared.set(key, {"n": 1}, ttl=60)
+    shared._locks[0].acquire()
+    try:
+        assert shared.get(key) is None
+        shared.set(key, {"n": 2}, ttl=60)
+        assert shared.purge_expired() == 0
+    finally:
+        shared._locks[0].release()
+    assert shared.get(key)[1] == {"n": 1} and shared.lock_timeouts == 3
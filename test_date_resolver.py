@@ -0,0 +1,47 @@
+from datetime import date
+
+from agent_core import resolve_train_travel_info
+from date_resolver import WEEKDAY_PATTERN, resolve_date
+
+SATURDAY = date(2026, 10, 17)
+
+
+def test_common_forms_resolve_locally():
+    """Test ISO, relative, weekday and day-month phrases against a fixed reference day"""
+    assert resolve_date("2026-12-01", SATURDAY) == "2026-12-01"
+    assert resolve_date("tomorrow", SATURDAY) == "2026-10-18"
+    assert resolve_date("day after tomorrow", SATURDAY) == "2026-10-19"
+    assert resolve_date("saturday", SATURDAY) == "2026-10-17"
+    assert resolve_date("next saturday", SATURDAY) == "2026-10-24"
+    assert resolve_date("15 Aug", SATURDAY) == "2027-08-15", "Past day-month should roll to next year"
+
+
+def test_greedy_capture_is_trimmed():
+    """Test that trailing words from a greedy 'on ...' capture are ignored"""
+    assert resolve_date("friday in sleeper class", SATURDAY) == "2026-10-23"
+
+
+def test_unknown_phrase_returns_none():
+    """Test that non-dates fall through dateparser and return None"""
+    assert resolve_date("gibberish text", SATURDAY) is None
+
+
+def test_weekday_prefixes_do_not_match_other_words():
+    """Test that "month", "monsoon" and "sunset" are not read as Monday or Sunday"""
+    assert WEEKDAY_PATTERN.match("next month") is None
+    assert resolve_date("monsoon", SATURDAY) is None
+    assert resolve_date("sunset", SATURDAY) is None
+    assert resolve_date("tues", SATURDAY) == "2026-10-20"
+    info, resolution = resolve_train_travel_info("Trains from Delhi to Mumbai next month")
+    assert not resolution["date_parsed"]
+    assert not resolve_train_travel_info("Trains from Delhi to Mumbai this sunset")[1]["date_cue"]
+
+
+def test_date_text_without_on_is_resolved():
+    """Test that bare weekdays, ISO dates and "tonight" resolve and only date-free queries assume tomorrow"""
+    assert resolve_train_travel_info("Trains from Delhi to Mumbai 2026-11-20")[0]["date"] == "2026-11-20"
+    assert resolve_train_travel_info("Trains from Delhi to Mumbai 5th december")[1]["date_parsed"]
+    for query in ("Trains from Delhi to Mumbai friday", "Trains from Delhi to Mumbai tonight"):
+        assert resolve_train_travel_info(query)[1]["date_parsed"], query
+    assert not resolve_train_travel_info("Marathon runners from Delhi to Mumbai")[1]["date_cue"], \
+        "marathon is not March"
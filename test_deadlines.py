@@ -0,0 +1,92 @@
+import asyncio
+import os
+import time
+
+import pytest
+
+from cache import TRAIN_AVAILABILITY, ResultCache, TTLLRUCache
+from deadlines import DeadlinePolicy, budget_scope, stream_within_budget, within_budget
+
+FAST = DeadlinePolicy(timeout=0.3, reserve=0.05)
+TRAIN = {"train_number": "12951", "train_name": "Mumbai Rajdhani", "departure": "16:25", "arrival": "08:15",
+         "duration": "15h 50m", "availability": "Available 42", "fare": 1985}
+
+
+def test_work_past_the_budget_is_cancelled_for_the_fallback():
+    """Test that slow work is cancelled at the deadline and the local answer is returned instead"""
+    cancelled = []
+
+    async def slow():
+        try:
+            await asyncio.sleep(5)
+        except asyncio.CancelledError:
+            cancelled.append(True)
+            raise
+
+    async def fallback():
+        return {"trains": [], "partial": True}
+
+    async def run():
+        with budget_scope("trains", policy=FAST):
+            started = time.perf_counter()
+            response = await within_budget(slow(), fallback)
+            return response, time.perf_counter() - started
+
+    response, elapsed = asyncio.run(run())
+    assert response["partial"] and cancelled == [True]
+    assert elapsed < 0.3, "the reserve is kept back for the degraded answer"
+
+    async def strict():
+        with budget_scope("trains", policy=DeadlinePolicy(timeout=0.05, degrade=False)):
+            return await within_budget(slow(), fallback)
+
+    with pytest.raises(asyncio.TimeoutError):
+        asyncio.run(strict())
+
+
+def test_streams_end_with_the_fallback_answer():
+    """Test that a stalled stream keeps the events already sent and finishes with a degraded done event"""
+    async def events():
+        yield {"type": "status", "stage": "agent_started"}
+        await asyncio.sleep(5)
+        yield {"type": "done", "response": {}}
+
+    async def fallback():
+        return {"source": "Delhi", "destination": "Mumbai", "trains": [TRAIN], "partial": True}
+
+    async def run():
+        with budget_scope("stream", policy=FAST):
+            return [event async for event in stream_within_budget(events(), fallback)]
+
+    received = asyncio.run(run())
+    assert received[0]["stage"] == "agent_started" and received[1]["stage"] == "deadline_degraded"
+    assert received[-1]["type"] == "done" and received[-1]["response"]["partial"]
+
+
+def test_agent_degrades_to_an_expired_cache_entry():
+    """Test that a hung provider yields the stale cached trains, flagged partial and stale"""
+    os.environ.setdefault("OPENAI_API_KEY", "offline-benchmark")
+    import travel_agent_openai as web
+    from cache import get_result_cache, set_result_cache
+    from providers import ProviderPool, StaticProvider, set_provider_pool
+
+    now = [0.0]
+    cache = ResultCache(memory=TTLLRUCache(ttls={TRAIN_AVAILABILITY: 60}, clock=lambda: now[0], stale_ttl=600))
+    cache.store_response({"source": "Delhi", "destination": "Mumbai", "date": "2025-04-18", "class": "3A",
+                          "trains": [TRAIN]})
+    now[0] = 120.0
+    previous = get_result_cache()
+    set_result_cache(cache)
+    set_provider_pool(ProviderPool([StaticProvider("hung", delay=5)]))
+    try:
+        async def run():
+            with budget_scope("trains", policy=FAST):
+                return await web.railway_agent("Trains from Delhi to Mumbai in 3A on 2025-04-18")
+        response = asyncio.run(run())
+    finally:
+        set_provider_pool(None)
+        set_result_cache(previous)
+
+    assert response["trains"] == [TRAIN]
+    assert response["partial"] is True and response["stale"] is True
+    assert cache.lookup_trains(response) is None, "expired entries never serve ordinary lookups"
@@ -0,0 +1,94 @@
+import asyncio
+import os
+import time
+from datetime import date
+
+from agent_core import resolve_train_travel_info
+from date_resolver import date_range_phrase, resolve_date, resolve_date_range
+from flexible_dates import range_decision, search_dates
+
+
+def test_range_phrases_expand_to_dates():
+    """Test weekend, week, next-N-days and day-range phrases against a Wednesday"""
+    wednesday = date(2026, 10, 14)
+    assert resolve_date_range("any sleeper train Chennai to Bangalore this weekend", wednesday) == [
+        "2026-10-17", "2026-10-18"]
+    assert len(resolve_date_range("cheapest 3A next week", wednesday)) == 7
+    assert resolve_date_range("next week", wednesday)[0] == "2026-10-19", "next week starts on Monday"
+    assert resolve_date_range("in the next 3 days", wednesday) == ["2026-10-15", "2026-10-16", "2026-10-17"]
+    assert resolve_date_range("18-20 oct", wednesday) == ["2026-10-18", "2026-10-19", "2026-10-20"]
+    assert resolve_date_range("on friday", wednesday) is None
+
+
+def test_a_named_day_inside_a_range_is_a_single_date():
+    """Test that "on Friday this week" searches Friday only, not the rest of the week"""
+    query = "trains from Delhi to Mumbai on Friday this week"
+    for reference in (date(2026, 10, 17), date(2026, 10, 19)):
+        assert resolve_date_range(query, reference) is None
+    assert date_range_phrase(query) is None
+    assert resolve_train_travel_info(query)[0]["date"] == resolve_date("friday")
+    assert resolve_date_range("trains from Delhi to Mumbai this week", date(2026, 10, 19))[-1] == "2026-10-25"
+
+
+def test_dates_are_looked_up_concurrently_and_summarized():
+    """Test that per-date lookups overlap and the summary picks the cheapest and fastest rows"""
+    async def lookup(info):
+        await asyncio.sleep(0.1)
+        if info["date"].endswith("3"):
+            return None
+        fare = int(info["date"][-1]) * 100
+        return {**info, "trains": [
+            {"train_number": "1", "train_name": "A", "departure": "10:00", "arrival": "20:00",
+             "duration": "10h 00m", "availability": "WL 3", "fare": fare},
+            {"train_number": "2", "train_name": "B", "departure": "11:00", "arrival": "18:00",
+             "duration": "7h 00m", "availability": "Available 8", "fare": fare + 50},
+        ]}
+
+    dates = [f"2026-10-1{day}" for day in range(7)]
+    decision = range_decision("Trains from Chennai to Bangalore in sleeper class next week")
+    started = time.perf_counter()
+    response = asyncio.run(search_dates(dates, decision.info, lookup))
+    assert time.perf_counter() - started < 0.5
+    assert response["dates"] == dates and response["class"] == "SL"
+    summary = {row["date"]: row for row in response["summary"]}
+    assert summary["2026-10-11"] == {"date": "2026-10-11", "results": 2, "available": 1, "cheapest_fare": 100,
+                                     "cheapest": "1", "fastest_minutes": 420}
+    assert "error" in summary["2026-10-13"] and "2026-10-13" not in response["by_date"]
+
+
+def test_offline_agent_answers_a_weekend_from_the_timetable():
+    """Test that a range query is answered per date without the model"""
+    os.environ.setdefault("OPENAI_API_KEY", "offline-benchmark")
+    import railway_agent_openai_without_websearch as offline
+
+    response = asyncio.run(offline.railway_agent("Trains from Delhi to Mumbai this weekend"))
+    assert len(response["dates"]) in (1, 2)
+    assert all(response["by_date"][d]["date"] == d for d in response["dates"])
+
+
+def test_web_agent_shares_providers_and_cache_across_dates():
+    """Test that concurrent range queries coalesce per date and later ones are served from the cache"""
+    os.environ.setdefault("OPENAI_API_KEY", "offline-benchmark")
+    import travel_agent_openai as web
+    from cache import ResultCache, get_result_cache, set_result_cache
+    from providers import ProviderPool, StaticProvider, set_provider_pool
+
+    dates = resolve_date_range("next 3 days")
+    stub = StaticProvider("stub", [
+        {"source": "Delhi", "destination": "Mumbai", "date": d, "class": "3A", "trains": []} for d in dates
+    ], delay=0.05)
+    previous = get_result_cache()
+    set_result_cache(ResultCache())
+    set_provider_pool(ProviderPool([stub]))
+    try:
+        async def scenario():
+            query = "Trains from Delhi to Mumbai in the next 3 days"
+            first = await asyncio.gather(web.railway_agent(query), web.railway_agent(query))
+            return first, await web.railway_agent(query)
+        (one, two), again = asyncio.run(scenario())
+    finally:
+        set_provider_pool(None)
+        set_result_cache(previous)
+
+    assert one["dates"] == dates and one == two == again
+    assert stub.calls == 3, "one provider call per date, shared by both requests and reused from the cache"
@@ -0,0 +1,27 @@
+from gazetteer import get_gazetteer
+
+
+def _route(query):
+    source, destination = get_gazetteer().resolve_route(query)
+    return (source and source.place.code, destination and destination.place.code)
+
+
+def test_cues_assign_roles():
+    """Test that from/to/between cues decide source and destination"""
+    assert _route("Find trains from Delhi to Mumbai") == ("NDLS", "CSMT")
+    assert _route("to Pune from Bombay tomorrow") == ("CSMT", "PUNE")
+    assert _route("Any trains between Madras and Bengaluru?") == ("MAS", "SBC")
+
+
+def test_station_codes_need_capitals():
+    """Test that short codes only match when written as codes"""
+    assert _route("NDLS to SBC in 3A") == ("NDLS", "SBC")
+    assert _route("escape to madras") == (None, "MAS"), "'sc' inside a word or lowercase must not match"
+
+
+def test_match_positions_and_longest_alias():
+    """Test that the longest alias wins and positions point into the query"""
+    query = "trains from Mumbai Central to Old Delhi"
+    matches = get_gazetteer().find_places(query)
+    assert [m.place.code for m in matches] == ["MMCT", "DLI"]
+    assert query[matches[0].start:matches[0].end] == "Mumbai Central"
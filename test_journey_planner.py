@@ -0,0 +1,53 @@
+from journey_planner import JourneyPlanner, attach_itineraries
+from timetable import DEFAULT_TIMETABLE_PATH, Timetable, compile_timetable
+
+CSV = """train_number,train_name,runs_on,stop_sequence,station_code,station_name,arrival,departure,day_offset,distance_km
+200,Feeder,1111111,1,PUNE,Pune Junction,,07:00,0,0
+200,Feeder,1111111,2,CSMT,Mumbai CST,10:00,,0,190
+300,Tight Link,1111111,1,CSMT,Mumbai CST,,10:15,0,0
+300,Tight Link,1111111,2,NDLS,New Delhi,09:00,,1,1500
+400,Cross City,1111111,1,MMCT,Mumbai Central,,17:00,0,0
+400,Cross City,1111111,2,NDLS,New Delhi,08:30,,1,1384
+"""
+
+
+def test_transfers_respect_minimum_connection_times():
+    """Test that a 15-minute change is rejected and a cross-city change is used instead"""
+    timetable = Timetable(compile_timetable(CSV))
+    planner = JourneyPlanner(timetable)
+    itineraries = planner.plan_for({"source": "Pune", "destination": "Delhi", "date": "2026-10-20", "class": "SL"})
+    assert itineraries, "expected a connection via Mumbai"
+    best = itineraries[0]
+    assert [leg["train_number"] for leg in best["legs"]] == ["200", "400"]
+    assert (best["departure"], best["arrival"]) == ("2026-10-20T07:00", "2026-10-21T08:30")
+    assert best["changes"] == 1
+    assert best["fare"] == sum(leg["fare"] for leg in best["legs"])
+
+
+def test_connections_are_ranked_by_arrival():
+    """Test that itineraries from the bundled timetable arrive in non-decreasing order"""
+    planner = JourneyPlanner(Timetable.from_csv(DEFAULT_TIMETABLE_PATH))
+    itineraries = planner.plan_for({"source": "Pune", "destination": "Delhi", "date": "2026-10-20"})
+    arrivals = [itinerary["arrival"] for itinerary in itineraries]
+    assert arrivals and arrivals == sorted(arrivals)
+    assert all(itinerary["changes"] >= 1 for itinerary in itineraries)
+    assert all(itinerary["legs"][0]["departure_date"] == "2026-10-20" for itinerary in itineraries)
+
+
+def test_places_without_stations_stay_empty():
+    """Test that Delhi to Leh keeps an empty train list and gets no itineraries"""
+    response = {"source": "Delhi", "destination": "Leh", "date": "2026-10-20", "class": "3A", "trains": []}
+    assert attach_itineraries(response) == response
+
+
+def test_dominated_itineraries_are_dropped():
+    """Test that Pune to Delhi returns only non-dominated itineraries, each with as few changes as possible"""
+    planner = JourneyPlanner(Timetable.from_csv(DEFAULT_TIMETABLE_PATH))
+    itineraries = planner.plan_for({"source": "Pune", "destination": "Delhi", "date": "2026-10-20"})
+    routes = [[leg["train_number"] for leg in itinerary["legs"]] for itinerary in itineraries]
+    assert ["12124", "12953"] in routes, "12953 also calls at Mumbai Central: no change at Kota needed"
+    august_kranti = itineraries[routes.index(["12124", "12953"])]
+    assert august_kranti["changes"] == 1 and august_kranti["arrival"] == "2026-10-21T10:15"
+    assert all(itinerary["changes"] == 1 for itinerary in itineraries)
+    assert all(itinerary["departure"] == "2026-10-20T07:15" for itinerary in itineraries), \
+        "the 14:15 departure reaching Delhi a day later is dominated"
@@ -0,0 +1,102 @@
+import asyncio
+import json
+
+import metrics
+from stages import stage
+
+
+def test_disabled_metrics_record_nothing():
+    """Test that counters and traces are no-ops while metrics are disabled"""
+    metrics.disable()
+    metrics.reset()
+
+    @metrics.traced("agent")
+    async def agent(query):
+        with stage("validation"):
+            return {"query": query}
+
+    metrics.inc("cache_lookups_total", mode="train", result="hit")
+    assert asyncio.run(agent("q")) == {"query": "q"}
+    assert metrics.get_registry().snapshot() == {"counters": {}, "histograms": {}}
+
+
+def test_traced_requests_export_spans_tokens_and_prometheus_text(tmp_path):
+    """Test that a traced request writes a JSONL record and renders counters and histograms"""
+    path = tmp_path / "trace.jsonl"
+    metrics.reset()
+    metrics.enable(str(path))
+    try:
+        @metrics.traced("agent")
+        async def agent(query):
+            with stage("json_cleanup"):
+                pass
+            metrics.record_usage(120, 30)
+            metrics.inc("plain_text_fallbacks_total")
+            return {"error": "Agent did not return valid JSON."}
+
+        asyncio.run(agent("q"))
+        text = metrics.get_registry().render_prometheus()
+    finally:
+        metrics.disable()
+
+    record = json.loads(path.read_text().splitlines()[0])
+    assert record["name"] == "agent" and record["status"] == "error"
+    assert record["tokens"] == {"input": 120, "output": 30}
+    assert len(record["spans"]["json_cleanup"]) == 1
+    assert 'travel_agent_requests_total{agent="agent",status="error"} 1' in text
+    assert 'travel_agent_tokens_total{kind="input"} 120' in text
+    assert "travel_agent_plain_text_fallbacks_total 1" in text
+    assert 'travel_agent_request_duration_ms_bucket{agent="agent",le="+Inf"} 1' in text
+
+
+def test_traced_generator_survives_steps_in_separate_tasks(tmp_path):
+    """Test that a traced generator driven with asyncio.wait_for (one task per step) is traced"""
+    path = tmp_path / "trace.jsonl"
+    metrics.reset()
+    metrics.enable(str(path))
+    try:
+        @metrics.traced("stream")
+        async def stream():
+            for index in range(2):
+                with stage("step"):
+                    metrics.record_usage(1, 1)
+                yield index
+
+        async def consume():
+            events = stream()
+            items = []
+            while True:
+                try:
+                    items.append(await asyncio.wait_for(events.__anext__(), 1))
+                except StopAsyncIteration:
+                    return items
+
+        assert asyncio.run(consume()) == [0, 1]
+    finally:
+        metrics.disable()
+
+    record = json.loads(path.read_text().splitlines()[0])
+    assert record["status"] == "ok"
+    assert record["tokens"] == {"input": 2, "output": 2}
+    assert len(record["spans"]["step"]) == 2
+
+
+def test_each_worker_serves_metrics_on_its_own_port(monkeypatch):
+    """Test that maybe_serve_metrics(worker) serves this process's registry on METRICS_PORT + worker"""
+    import socket
+    import urllib.request
+
+    with socket.socket() as probe:
+        probe.bind(("127.0.0.1", 0))
+        base = probe.getsockname()[1]
+    monkeypatch.setenv("METRICS_PORT", str(base - 1))
+    metrics.reset()
+    metrics.enable()
+    try:
+        metrics.inc("plain_text_fallbacks_total")
+        metrics.maybe_serve_metrics(1)
+        with urllib.request.urlopen(f"http://127.0.0.1:{base}/metrics", timeout=5) as response:
+            text = response.read().decode()
+    finally:
+        metrics.disable()
+    assert "travel_agent_plain_text_fallbacks_total 1" in text
@@ -0,0 +1,86 @@
+import asyncio
+import os
+from datetime import date
+
+from cache import TRAIN_AVAILABILITY, ResultCache, TTLLRUCache
+from prewarm import PopularityTracker, Prewarmer
+
+TODAY = date(2026, 10, 17)
+
+
+def _info(source, destination, day="2026-10-18", travel_class="3A"):
+    return {"source": source, "destination": destination, "date": day, "class": travel_class,
+            "source_code": "", "destination_code": ""}
+
+
+def test_tracker_ranks_recent_traffic_above_old_traffic():
+    """Test that counts decay with the half-life and never underestimate"""
+    now = [0.0]
+    tracker = PopularityTracker(half_life=60, clock=lambda: now[0])
+    old, new = ("train", "A", "B", 1, "3a"), ("train", "C", "D", 1, "3a")
+    for _ in range(8):
+        tracker.add(old, {})
+    assert tracker.estimate(old) >= 8
+    now[0] = 180.0   # three half-lives: 8 -> 1
+    for _ in range(3):
+        tracker.add(new, {})
+    assert [key for _, key, _ in tracker.top(2)] == [new, old]
+    assert abs(tracker.estimate(old) - 1.0) < 0.01
+
+
+def test_prewarmer_refreshes_hot_routes_within_budget_and_counts_hits():
+    """Test top-N refresh ahead of expiry, the per-cycle request cap and prewarmed-hit reporting"""
+    now = [0.0]
+    cache = ResultCache(memory=TTLLRUCache(ttls={TRAIN_AVAILABILITY: 60}, clock=lambda: now[0]))
+    prewarmer = Prewarmer(cache=cache, top_n=3, max_requests=2, refresh_ahead=20, today=lambda: TODAY)
+    for source, destination, hits in (("Delhi", "Mumbai", 5), ("Chennai", "Bangalore", 3), ("Pune", "Nagpur", 1)):
+        for _ in range(hits):
+            prewarmer.observe("train", _info(source, destination), cached=False)
+    refreshed = []
+
+    async def refresh(mode, info):
+        refreshed.append(info["source"])
+        response = {**info, "trains": []}
+        cache.store_response(response)
+        return response
+
+    assert asyncio.run(prewarmer.prewarm_once(refresh)) == 2
+    assert refreshed == ["Delhi", "Chennai"] and prewarmer.stats["over_budget"] == 1
+
+    now[0] = 50.0    # Delhi and Chennai expire within refresh_ahead: due again, hottest first
+    asyncio.run(prewarmer.prewarm_once(refresh))
+    assert refreshed[2:] == ["Delhi", "Chennai"]
+
+    prewarmer.observe("train", _info("Delhi", "Mumbai"), cached=True)
+    prewarmer.observe("train", _info("Pune", "Nagpur"), cached=True)
+    assert prewarmer.stats["served"] == 1, "only entries the prewarmer stored count"
+
+
+def test_web_agent_serves_prewarmed_entries():
+    """Test that tracked user traffic is prewarmed through the providers and then served from the cache"""
+    os.environ.setdefault("OPENAI_API_KEY", "offline-benchmark")
+    import travel_agent_openai as web
+    from cache import get_result_cache, set_result_cache
+    from prewarm import set_prewarmer
+    from providers import ProviderPool, StaticProvider, set_provider_pool
+
+    query = "Trains from Delhi to Mumbai in 3A on 2026-10-18"
+    stub = StaticProvider("stub", [{**_info("Delhi", "Mumbai"), "trains": []}])
+    previous = get_result_cache()
+    cache = ResultCache()
+    prewarmer = Prewarmer(cache=cache, today=lambda: TODAY)
+    set_result_cache(cache)
+    set_prewarmer(prewarmer)
+    set_provider_pool(ProviderPool([stub]))
+    try:
+        asyncio.run(web.railway_agent(query))
+        cache.memory.clear()
+        assert asyncio.run(prewarmer.prewarm_once(web.prewarm_refresh)) == 1
+        asyncio.run(web.railway_agent(query))
+    finally:
+        set_provider_pool(None)
+        set_prewarmer(None)
+        set_result_cache(previous)
+
+    assert stub.calls == 2, "one user miss and one prewarm; the second query is a cache hit"
+    assert prewarmer.stats["served"] == 1
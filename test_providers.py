@@ -0,0 +1,111 @@
+import asyncio
+import os
+import time
+
+from providers import MERGE, CircuitBreaker, ProviderPool, StaticProvider, TimetableProvider, set_provider_pool
+
+INFO = {"source": "Delhi", "destination": "Mumbai", "date": "2025-04-18", "class": "3A",
+        "source_code": "NDLS", "destination_code": "CSMT"}
+
+
+def _response(*numbers, availability="Available 10"):
+    return {"source": "Delhi", "destination": "Mumbai", "date": "2025-04-18", "class": "3A",
+            "trains": [{"train_number": n, "train_name": f"Train {n}", "departure": f"{10 + i}:00",
+                        "arrival": "23:00", "duration": "12h", "availability": availability, "fare": 900}
+                       for i, n in enumerate(numbers)]}
+
+
+def _lookup(pool):
+    async def run():
+        started = time.perf_counter()
+        result = await pool.lookup("train", "Delhi to Mumbai", INFO)
+        return result, time.perf_counter() - started
+    return asyncio.run(run())
+
+
+def test_hedge_after_delay_returns_first_valid_answer():
+    """Test that a slow primary is hedged to the next provider and the loser is cancelled"""
+    slow = StaticProvider("slow", [_response("1")], delay=1.0)
+    fast = StaticProvider("fast", [_response("2")], delay=0.01)
+    result, elapsed = _lookup(ProviderPool([slow, fast], hedge_delay=0.05))
+    assert result.providers == ["fast"] and result.results[0]["train_number"] == "2"
+    assert elapsed < 0.5
+
+    result, _ = _lookup(ProviderPool([StaticProvider("quick", [_response("3")]), fast], hedge_delay=0.05))
+    assert result.providers == ["quick"] and fast.calls == 1, "no hedge when the primary answers in time"
+
+
+def test_failures_and_timeouts_fall_through_without_waiting():
+    """Test that an error or per-provider timeout moves on to the next provider at once"""
+    broken = StaticProvider("broken", error=RuntimeError("HTTP 500"))
+    stuck = StaticProvider("stuck", [_response("1")], delay=5, timeout=0.05)
+    backup = StaticProvider("backup", [_response("9")])
+    result, elapsed = _lookup(ProviderPool([broken, stuck, backup], hedge_delay=10))
+    assert result.providers == ["backup"]
+    assert set(result.errors) == {"broken", "stuck"}
+    assert elapsed < 1.0
+    assert _lookup(ProviderPool([StaticProvider("empty")]))[0] is None, "no data anywhere is None, not an error"
+
+
+def test_schedule_only_data_never_races_live_availability():
+    """Test that the timetable is not a hedge, empty answers do not win, and schedule rows are not live"""
+    os.environ.setdefault("OPENAI_API_KEY", "offline-benchmark")
+    import travel_agent_openai as web
+    from cache import ResultCache
+
+    pune = {**INFO, "source": "Pune", "destination": "Delhi", "source_code": "", "destination_code": ""}
+    web_answer = {**_response("12124"), "source": "Pune", "destination": "Delhi"}
+
+    async def lookup(pool):
+        return await pool.lookup("train", "Pune to Delhi", pune)
+
+    slow_web = StaticProvider("web", [web_answer], delay=0.2)
+    result = asyncio.run(lookup(ProviderPool([slow_web, TimetableProvider()], hedge_delay=0.05)))
+    assert result.providers == ["web"] and result.live
+
+    empty = StaticProvider("empty", [{**web_answer, "trains": []}])
+    result = asyncio.run(lookup(ProviderPool([empty, StaticProvider("slow", [web_answer], delay=0.1)],
+                                             hedge_delay=0.01)))
+    assert result.providers == ["slow"], "an empty list does not win while another provider may have rows"
+
+    pool = ProviderPool([StaticProvider("web", error=RuntimeError("down")), TimetableProvider()])
+    result = asyncio.run(lookup(pool))
+    assert result.providers == ["timetable"] and not result.live
+    assert "web" in result.errors
+
+    cache = ResultCache()
+    set_provider_pool(pool)
+    try:
+        asyncio.run(web.lookup_providers("train", "Pune to Delhi", pune, cache))
+    finally:
+        set_provider_pool(None)
+    assert cache.lookup_trains(pune) is None, "schedule-only answers are never cached as availability"
+
+
+def test_circuit_breaker_skips_failing_provider_until_reset():
+    """Test that repeated failures open the breaker and one trial call is let through after the reset"""
+    now = [0.0]
+    breaker = CircuitBreaker(failure_threshold=2, reset_timeout=30, clock=lambda: now[0])
+    broken = StaticProvider("broken", error=RuntimeError("down"), breaker=breaker)
+    pool = ProviderPool([broken, StaticProvider("backup", [_response("9")])], hedge_delay=10)
+    for _ in range(3):
+        _lookup(pool)
+    assert broken.calls == 2 and breaker.state == "open"
+
+    now[0] = 31.0
+    broken.error = None
+    broken.add(_response("1"))
+    assert _lookup(pool)[0].providers == ["broken"]
+    assert breaker.state == "closed"
+
+
+def test_merge_combines_rows_preferring_earlier_providers():
+    """Test that merge mode queries every provider and de-duplicates by train number"""
+    live = StaticProvider("live", [_response("12951", availability="WL 4")])
+    schedule = TimetableProvider()
+    result, _ = _lookup(ProviderPool([live, schedule], strategy=MERGE))
+    assert result.providers == ["live", "timetable"]
+    assert not result.live, "merged schedule rows make the answer uncacheable"
+    rows = {row["train_number"]: row for row in result.results}
+    assert rows["12951"]["availability"] == "WL 4"
+    assert len(rows) > 1, "timetable trains are merged in"
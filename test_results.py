@@ -0,0 +1,85 @@
+import random
+
+import pytest
+
+from results import (
+    AVAILABLE, MISSING, NOT_AVAILABLE, RAC, UNKNOWN, WAITLIST, ResultQuery, ResultSet,
+    parse_availability, parse_clock, parse_duration, parse_fare,
+)
+
+TRAINS = [
+    {"train_number": "12951", "train_name": "Mumbai Rajdhani", "departure": "16:25", "arrival": "08:15",
+     "duration": "15h 50m", "availability": "Available 42", "fare": 1985},
+    {"train_number": "12953", "train_name": "August Kranti", "departure": "17:40", "arrival": "10:55",
+     "duration": "17h 15m", "availability": "GNWL12/WL5", "fare": 1740},
+    {"train_number": "22209", "train_name": "Duronto", "departure": "23:00", "arrival": "15:55",
+     "duration": "", "availability": "RAC 3", "fare": 0},
+]
+
+
+def test_parsers_normalize_display_strings():
+    """Test that availability, times, durations and fares parse into ints"""
+    assert parse_availability("Available 42") == (AVAILABLE, 42)
+    assert parse_availability("AVAILABLE-0042") == (AVAILABLE, 42)
+    assert parse_availability("GNWL12/WL5") == (WAITLIST, 5), "the current status comes last"
+    assert parse_availability("RAC 3") == (RAC, 3)
+    assert parse_availability("CNF") == (AVAILABLE, MISSING)
+    assert parse_availability("Confirmed") == (AVAILABLE, MISSING)
+    assert parse_availability("CNF/B2/45")[0] == AVAILABLE
+    assert parse_availability("Regret") == (NOT_AVAILABLE, 0)
+    assert parse_availability("Unknown")[0] == UNKNOWN
+    assert parse_clock("16:25") == 985 and parse_clock("2023-10-01T10:00:00") == 600
+    assert parse_clock("4:25 PM") == 985
+    assert parse_duration("15h 50m") == 950 and parse_duration("1d 2h") == 1560 and parse_duration("x") == -1
+    assert parse_fare("₹1,985") == 1985 and parse_fare(0) == -1
+
+
+def test_queries_rank_filter_and_keep_the_json_shape():
+    """Test cheapest, fastest, departs-after and available-only over the original records"""
+    results = ResultSet(TRAINS)
+    assert results.duration[2] == (15 * 60 + 55) - (23 * 60) + 24 * 60, "missing durations come from the times"
+    assert [r.record["train_number"] for r in results.cheapest(3)] == ["12953", "12951", "22209"]
+    assert results.fastest().to_list() == [TRAINS[0]]
+    assert [r["train_number"] for r in results.departs_after("17:00").to_list()] == ["12953", "22209"]
+    assert results.available_only().to_list() == [TRAINS[0]]
+    assert len(results.available_only(include_rac=True)) == 2
+    assert results.sort_by("fare", reverse=True).to_list()[-1] is TRAINS[2], "unknown fares stay last"
+
+
+def test_bulk_top_k_matches_a_full_sort():
+    """Test that top-k over thousands of rows agrees with sorting everything"""
+    rng = random.Random(3)
+    rows = [{"train_number": str(i), "departure": f"{rng.randrange(24):02d}:{rng.randrange(60):02d}",
+             "arrival": "12:00", "duration": f"{rng.randrange(30)}h {rng.randrange(60)}m",
+             "availability": rng.choice(["Available 3", "WL 4", "Regret"]), "fare": rng.randrange(1, 5000)}
+            for i in range(5000)]
+    results = ResultSet(rows)
+    expected = sorted(rows, key=lambda row: row["fare"])[:10]
+    assert [row["fare"] for row in results.top_k(10, "cheapest").to_list()] == [row["fare"] for row in expected]
+    assert all(r.status == AVAILABLE for r in results.available_only())
+
+
+def test_result_query_from_params():
+    """Test that server query parameters filter a response and reject bad input"""
+    query = ResultQuery.from_params({"sort": ["cheapest"], "limit": ["1"], "available": ["1"]})
+    response = {"source": "Delhi", "destination": "Mumbai", "date": "2025-04-18", "class": "3A", "trains": TRAINS}
+    assert query.apply(response)["trains"] == [TRAINS[0]]
+    assert ResultQuery.from_params({}).apply(response) is response
+    with pytest.raises(ValueError):
+        ResultQuery.from_params({"sort": ["comfiest"]})
+    with pytest.raises(ValueError):
+        ResultQuery.from_params({"after": ["late"]})
+
+
+def test_queries_apply_to_each_date_of_a_ranged_response():
+    """Test that ?available_only=1 filters every date of a flexible-date response and its summary"""
+    from flexible_dates import summarize_date
+
+    by_date = {day: {"source": "Delhi", "destination": "Mumbai", "date": day, "class": "3A", "trains": TRAINS}
+               for day in ("2026-10-24", "2026-10-25")}
+    response = {"source": "Delhi", "destination": "Mumbai", "class": "3A", "dates": list(by_date),
+                "summary": [summarize_date(day, answer) for day, answer in by_date.items()], "by_date": by_date}
+    refined = ResultQuery(available_only=True).apply(response)
+    assert [t["train_number"] for t in refined["by_date"]["2026-10-24"]["trains"]] == ["12951"]
+    assert [entry["results"] for entry in refined["summary"]] == [1, 1]
+    assert [entry["results"] for entry in response["summary"]] == [3, 3], "the input is not modified"
@@ -0,0 +1,91 @@
+from datetime import date
+
+from router import NO_DATE_REASON, classify_mode, score_flight_query, score_train_query, try_fast_path
+
+
+def _lookup(info):
+    return [] if info["source"] == "Delhi" else None
+
+
+def test_confident_query_scores_high():
+    """Test that a fully resolved train query is eligible for the fast path"""
+    decision = score_train_query("Find trains from Delhi to Mumbai in sleeper class")
+    assert decision.is_confident(), f"Expected a confident score, got {decision.score} ({decision.reasons})"
+    assert decision.info["source"] == "Delhi"
+    assert decision.info["destination"] == "Mumbai"
+    assert decision.info["class"] == "SL"
+
+
+def test_flight_query_is_not_fast_pathed():
+    """Test that flight keywords always route to the agent"""
+    decision = score_train_query("Any flights from Delhi to Mumbai tomorrow")
+    assert decision.score == 0.0, f"Flight queries should score 0, got {decision.score}"
+
+
+def test_ambiguous_places_lower_the_score():
+    """Test that greedy free-text captures such as 'some town in sleeper class' are not trusted"""
+    decision = score_train_query("Trains between Chennai and some town in sleeper class")
+    assert not decision.is_confident(), f"Ambiguous query should not be confident, got {decision.score}"
+
+
+def test_gazetteer_places_are_trusted():
+    """Test that known stations resolve cleanly even with trailing qualifiers"""
+    decision = score_train_query("Trains between Chennai and Bangalore in sleeper class")
+    assert decision.is_confident(), f"Expected a confident score, got {decision.score} ({decision.reasons})"
+    assert decision.info["source_code"] == "MAS"
+    assert decision.info["destination_code"] == "SBC"
+
+
+def test_try_fast_path_uses_lookup():
+    """Test that the fast path answers locally and defers when the lookup has no data"""
+    response = try_fast_path("Find trains from Delhi to Mumbai", _lookup)
+    assert response is not None, "Confident query with local data should be answered"
+    assert response["class"] == "3A"
+    assert response["trains"] == []
+
+    assert try_fast_path("Find trains from Pune to Goa", _lookup) is None
+    assert try_fast_path("Find trains from Delhi to Mumbai", None) is None
+
+
+def test_classify_mode_routes_flights_and_prefers_trains():
+    """Test that only flight-only wording selects the flight agent"""
+    assert classify_mode("Cheapest flight from Delhi to Goa on Friday") == "flight"
+    assert classify_mode("Should I fly or take the train to Jaipur?") == "train"
+    assert classify_mode("Delhi to Mumbai tomorrow") == "train"
+
+
+def test_slim_agents_carry_only_their_own_tools():
+    """Test that the train agent prompt is smaller than the old combined prompt and has no extraction tool"""
+    from agent_core import create_flight_agent, create_train_agent, extract_train_travel_info, prompt_size, train_agent_input
+
+    query = "Trains from Delhi to Mumbai in sleeper class"
+    train, flight = create_train_agent(), create_flight_agent()
+    assert [tool.name for tool in train.tools] == ["web_search_preview"]
+    assert "extract_flight_info_from_prompt" in [tool.name for tool in flight.tools]
+
+    size = prompt_size(train, train_agent_input(query, extract_train_travel_info(query)))
+    assert '"class": "SL"' in train_agent_input(query, extract_train_travel_info(query))
+    assert 0 < size["estimated_tokens"] < 300
+
+
+def test_unparsed_month_and_day_count_phrases_are_not_confident():
+    """Test that "in November", "first week of November" and "in 3 days" do not silently become tomorrow"""
+    for phrase in ("in November", "in first week of November", "in 3 days"):
+        for score in (score_train_query, score_flight_query):
+            mode = "Trains" if score is score_train_query else "Flights"
+            decision = score(f"{mode} from Delhi to Mumbai {phrase}")
+            assert not decision.is_confident(), f"{phrase!r} scored {decision.score}"
+            assert "date phrase not understood" in decision.reasons
+    assert score_train_query("Trains from Delhi to Mumbai on 18 November").is_confident()
+    assert score_train_query("May I see trains from Delhi to Mumbai tomorrow").is_confident()
+
+
+def test_fast_path_uses_the_date_the_query_names():
+    """Test that bare weekdays, ISO dates and "tonight" are resolved, and "next month" goes to the agent"""
+    friday = score_train_query("trains from Delhi to Mumbai friday")
+    assert friday.is_confident() and date.fromisoformat(friday.info["date"]).weekday() == 4
+    assert score_train_query("trains from Delhi to Mumbai 2026-11-20").info["date"] == "2026-11-20"
+    assert score_train_query("trains from Delhi to Mumbai tonight").info["date"] == date.today().isoformat()
+    assert not score_train_query("trains from Delhi to Mumbai next month").is_confident()
+    no_date = score_train_query("trains from Delhi to Mumbai")
+    assert no_date.is_confident() and no_date.score < 1.0 and NO_DATE_REASON in no_date.reasons
@@ -0,0 +1,141 @@
+import asyncio
+import json
+
+from server import RestartPolicy, ServerConfig, TravelServer, _worker
+
+
+async def _slow_agent(query):
+    await asyncio.sleep(float(query))
+    return {"query": query, "trains": []}
+
+
+async def _stream(query):
+    yield {"type": "status", "stage": "agent_started"}
+    yield {"type": "done", "response": {"query": query}}
+
+
+async def _request(port, path, headers=None, reader_writer=None):
+    reader, writer = reader_writer or await asyncio.open_connection("127.0.0.1", port)
+    lines = [f"GET {path} HTTP/1.1", "Host: test"] + [f"{k}: {v}" for k, v in (headers or {}).items()]
+    writer.write(("\r\n".join(lines) + "\r\n\r\n").encode())
+    head = (await reader.readuntil(b"\r\n\r\n")).decode()
+    status = int(head.split(" ")[1])
+    fields = dict(line.split(": ", 1) for line in head.split("\r\n")[1:] if line)
+    if "Content-Length" in fields:
+        body = await reader.readexactly(int(fields["Content-Length"]))
+    else:
+        body = await reader.read()
+    return status, fields, body, (reader, writer)
+
+
+def _serve(scenario, **config):
+    async def run():
+        server = TravelServer(_slow_agent, _stream, config=ServerConfig(port=0, **config))
+        await server.start()
+        try:
+            return await scenario(server)
+        finally:
+            await server.shutdown()
+    return asyncio.run(run())
+
+
+def test_keep_alive_and_streaming():
+    """Test that one connection serves several requests and /stream sends chunked NDJSON"""
+    async def scenario(server):
+        status, fields, body, connection = await _request(server.port, "/trains?q=0")
+        again, _, _, connection = await _request(server.port, "/trains?q=0.01", reader_writer=connection)
+        connection[1].close()
+        _, stream_fields, stream_body, _ = await _request(server.port, "/stream?q=0", {"Connection": "close"})
+        return status, fields, body, again, stream_fields, stream_body
+
+    status, fields, body, again, stream_fields, stream_body = _serve(scenario)
+    assert status == 200 and again == 200
+    assert fields["Connection"] == "keep-alive"
+    assert json.loads(body) == {"query": "0", "trains": []}
+    assert stream_fields["Transfer-Encoding"] == "chunked"
+    assert b'"type": "done"' in stream_body
+
+
+def test_saturation_and_deadlines():
+    """Test fast 429 when the queue is full, 503 for queue timeouts and 504 for slow queries"""
+    async def scenario(server):
+        busy = asyncio.ensure_future(_request(server.port, "/trains?q=0.3"))
+        await asyncio.sleep(0.05)
+        queued = asyncio.ensure_future(_request(server.port, "/trains?q=0", {"X-Timeout": "0.1"}))
+        await asyncio.sleep(0.02)
+        rejected = await _request(server.port, "/trains?q=0")
+        results = [rejected[0], (await queued)[0], (await busy)[0]]
+        results.append((await _request(server.port, "/trains?q=1", {"X-Timeout": "0.05"}))[0])
+        return results, rejected[1]
+
+    statuses, rejected_headers = _serve(scenario, max_concurrency=1, max_queue=1)
+    assert statuses == [429, 503, 200, 504]
+    assert rejected_headers["Retry-After"] == "1"
+
+
+def test_invalid_client_timeouts_are_rejected():
+    """Test that X-Timeout values that are negative, zero, nan or infinite get 400"""
+    async def scenario(server):
+        return [(await _request(server.port, "/trains?q=0", {"X-Timeout": value}))[0]
+                for value in ("-1", "0", "nan", "inf", "soon", "0.5")]
+
+    assert _serve(scenario) == [400, 400, 400, 400, 400, 200]
+
+
+def test_graceful_drain_finishes_running_requests():
+    """Test that shutdown waits for an in-flight query before closing"""
+    async def scenario(server):
+        running = asyncio.ensure_future(_request(server.port, "/trains?q=0.2"))
+        await asyncio.sleep(0.05)
+        await server.shutdown()
+        return (await running)[0]
+
+    assert _serve(scenario, drain_timeout=2) == 200
+
+
+def test_background_jobs_run_in_the_first_worker_only():
+    """Test that pre-forked workers other than worker 0 drop background jobs such as prewarming"""
+    started = []
+
+    class FakeServer:
+        def __init__(self):
+            self.background = [lambda: None]
+
+        async def serve_until_signalled(self, sock):
+            started.append(len(self.background))
+
+    async def cleanup():
+        pass
+
+    for index in (0, 1, 2):
+        _worker(FakeServer, None, cleanup, index)
+    assert started == [1, 0, 0]
+
+
+def test_routes_reject_queries_of_the_other_mode():
+    """Test that /trains and /flights answer their own mode and send mismatched queries to the other route"""
+    async def echo(query):
+        return {"query": query}
+
+    async def run():
+        server = TravelServer(echo, flights=echo, config=ServerConfig(port=0))
+        await server.start()
+        try:
+            flight = "q=flights+from+London+to+Paris"
+            return [(await _request(server.port, f"{path}?{query}", {"Connection": "close"}))[::2]
+                    for path, query in [("/trains", flight), ("/flights", flight), ("/flights", "q=0")]]
+        finally:
+            await server.shutdown()
+
+    (misrouted, message), (status, _), (train_on_flights, _) = asyncio.run(run())
+    assert misrouted == 400 and b"/flights" in message
+    assert status == 200 and train_on_flights == 400
+
+
+def test_restarts_back_off_and_stop_on_a_crash_loop():
+    """Test that worker restarts wait exponentially longer and a crash-looping worker is not restarted"""
+    policy = RestartPolicy(backoff=0.5, max_backoff=4, max_restarts=5, window=60)
+    delays = [policy.delay(0, now) for now in range(6)]
+    assert delays == [0.5, 1, 2, 4, 4, None]
+    assert policy.delay(1, 5) == 0.5
+    assert policy.delay(0, 200) == 0.5
@@ -0,0 +1,72 @@
+import asyncio
+
+from results import ResultQuery
+from session import FollowUp, Session, answer_in_session
+
+TRAINS = [
+    {"train_number": "12951", "train_name": "Mumbai Rajdhani", "departure": "16:25", "arrival": "08:15",
+     "duration": "15h 50m", "availability": "Available 42", "fare": 1985},
+    {"train_number": "12953", "train_name": "August Kranti", "departure": "17:40", "arrival": "10:55",
+     "duration": "17h 15m", "availability": "WL 5", "fare": 1740},
+]
+
+
+def _recording_answer(asked):
+    async def answer(query):
+        asked.append(query)
+        return {"source": "Delhi", "destination": "Mumbai", "date": "2025-04-18", "class": "3A", "trains": TRAINS}
+    return answer
+
+
+def test_follow_ups_rewrite_only_what_changed():
+    """Test that class, date, direction, place and mode follow-ups reuse the last turn's parameters"""
+    session = Session()
+    session.record("Trains from Delhi to Mumbai in 3A on 2025-04-18",
+                   {"source": "Delhi", "destination": "Mumbai", "date": "2025-04-18", "class": "3A", "trains": TRAINS})
+    assert session.follow_up("what about sleeper?").query == "Trains from Delhi to Mumbai in SL on 2025-04-18"
+    assert session.follow_up("the return trip?").query == "Trains from Mumbai to Delhi in 3A on 2025-04-18"
+    assert session.follow_up("what about Pune?").query == "Trains from Delhi to Pune in 3A on 2025-04-18"
+    assert session.follow_up("and flights?").query == "Flights from Delhi to Mumbai in economy class on 2025-04-18"
+    assert session.follow_up("and this weekend?").query == "Trains from Delhi to Mumbai in 3A this weekend"
+    assert session.follow_up("and on 20 april").query.endswith("-04-20")
+    assert session.follow_up("Trains from Pune to Nagpur tomorrow") is None, "a complete route is a new query"
+    assert session.follow_up("hello there") is None
+    assert session.follow_up("and sunday?").query.startswith("Trains from Delhi to Mumbai in 3A on ")
+
+
+def test_time_refinements_are_not_read_as_dates():
+    """Test that "after 6pm" and "now" refine the last results instead of moving the date to today"""
+    session = Session()
+    session.record("Trains from Delhi to Mumbai in 3A on 2025-04-18",
+                   {"source": "Delhi", "destination": "Mumbai", "date": "2025-04-18", "class": "3A", "trains": TRAINS})
+    assert session.follow_up("after 6pm") == FollowUp(None, ResultQuery(departs_after="18:00"))
+    assert session.follow_up("now") is None
+
+
+def test_refinements_are_answered_from_the_last_results():
+    """Test that "which is cheapest?" re-ranks the previous answer without another lookup"""
+    asked = []
+    session = Session()
+
+    async def run():
+        await answer_in_session(session, "Trains from Delhi to Mumbai in 3A on 2025-04-18", _recording_answer(asked))
+        cheapest = await answer_in_session(session, "which is cheapest?", _recording_answer(asked))
+        available = await answer_in_session(session, "only available after 4 pm", _recording_answer(asked))
+        sleeper = await answer_in_session(session, "cheapest in sleeper?", _recording_answer(asked))
+        return cheapest, available, sleeper
+
+    cheapest, available, sleeper = asyncio.run(run())
+    assert [t["train_number"] for t in cheapest["trains"]] == ["12953", "12951"]
+    assert [t["train_number"] for t in available["trains"]] == ["12951"]
+    assert asked == ["Trains from Delhi to Mumbai in 3A on 2025-04-18", "Trains from Delhi to Mumbai in SL on 2025-04-18"]
+    assert sleeper["trains"][0]["train_number"] == "12953", "a rewritten query is refined too"
+
+
+def test_session_keeps_a_bounded_history_of_answered_turns():
+    """Test that errors are not recorded and old turns are evicted"""
+    session = Session(max_turns=2)
+    session.record("q", {"error": "No trains found"})
+    assert session.last is None and session.follow_up("what about sleeper?") is None
+    for date in ("2025-04-18", "2025-04-19", "2025-04-20"):
+        session.record(date, {"source": "Delhi", "destination": "Mumbai", "date": date, "class": "3A", "trains": []})
+    assert [turn.query for turn in session.turns] == ["2025-04-19", "2025-04-20"]
@@ -0,0 +1,74 @@
+import asyncio
+
+import pytest
+
+from singleflight import SingleFlight, request_key
+
+
+def test_concurrent_callers_share_one_run():
+    """Test that equivalent concurrent calls run once and share the result or the error"""
+    async def scenario():
+        flight = SingleFlight()
+        calls = []
+
+        async def work():
+            calls.append(1)
+            await asyncio.sleep(0.01)
+            return {"trains": []}
+
+        async def failing():
+            calls.append(1)
+            await asyncio.sleep(0.01)
+            raise RuntimeError("search failed")
+
+        results = await asyncio.gather(*(flight.do("k", work) for _ in range(5)))
+        errors = await asyncio.gather(*(flight.do("e", failing) for _ in range(3)), return_exceptions=True)
+        return flight, calls, results, errors
+
+    flight, calls, results, errors = asyncio.run(scenario())
+    assert len(calls) == 2
+    assert all(result == {"trains": []} for result in results)
+    assert results[1] is not results[0], "joiners get their own copy"
+    assert all(isinstance(error, RuntimeError) for error in errors)
+    assert flight.stats.as_dict() == {"started": 2, "joined": 6, "abandoned": 0}
+    assert not flight.in_flight("k")
+
+
+def test_cancellation_only_stops_the_run_when_every_waiter_leaves():
+    """Test that a cancelled leader does not fail joiners, and that abandoning all waiters cancels the run"""
+    async def scenario():
+        flight = SingleFlight()
+        finished = []
+
+        async def work():
+            await asyncio.sleep(0.05)
+            finished.append(1)
+            return "ok"
+
+        leader = asyncio.ensure_future(flight.do("k", work))
+        await asyncio.sleep(0)
+        follower = asyncio.ensure_future(flight.do("k", work))
+        await asyncio.sleep(0)
+        leader.cancel()
+        shared = await follower
+
+        lonely = asyncio.ensure_future(flight.do("k2", work))
+        await asyncio.sleep(0.01)
+        lonely.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await lonely
+        await asyncio.sleep(0.06)
+        return flight, finished, shared
+
+    flight, finished, shared = asyncio.run(scenario())
+    assert shared == "ok"
+    assert len(finished) == 1, "the abandoned run must not complete"
+    assert flight.stats.abandoned == 1
+    assert not flight.in_flight("k2")
+
+
+def test_request_key_normalizes_equivalent_queries():
+    """Test that rephrasings resolving to the same parameters share a key"""
+    assert request_key("trains from Delhi to Mumbai tomorrow in sleeper") == \
+        request_key("Show SL trains from New Delhi to Bombay tomorrow")
+    assert request_key("Any  way to reach Pune?") == request_key("any way to reach pune?")
@@ -0,0 +1,34 @@
+import json
+
+from streaming import IncrementalRecordParser
+
+RESPONSE = {
+    "source": "Delhi",
+    "destination": "Mumbai",
+    "date": "2025-04-18",
+    "class": "3A",
+    "trains": [
+        {"train_number": "12951", "train_name": "Mumbai {Rajdhani}", "departure": "16:25",
+         "arrival": "08:15", "duration": "15h 50m", "availability": "Available 42", "fare": 1985},
+        {"train_number": "12953", "train_name": 'August Kranti "Rajdhani"', "departure": "17:15",
+         "arrival": "10:05", "duration": "16h 50m", "availability": "WL 12", "fare": 1890},
+    ],
+}
+
+
+def test_records_are_emitted_before_the_document_completes():
+    """Test that each train is yielded as soon as its object closes, fences included"""
+    text = "```json\n" + json.dumps(RESPONSE, indent=2) + "\n```"
+    parser = IncrementalRecordParser()
+    events = []
+    first_record_at = None
+    for index in range(0, len(text), 7):
+        new_events = parser.feed(text[index:index + 7])
+        if first_record_at is None and any(e["type"] == "train" for e in new_events):
+            first_record_at = index
+        events.extend(new_events)
+
+    assert events[0] == {"type": "params", "params": {k: v for k, v in RESPONSE.items() if k != "trains"}}
+    records = [e["record"] for e in events if e["type"] == "train"]
+    assert records == RESPONSE["trains"], "Braces and escaped quotes inside strings must not confuse the scanner"
+    assert first_record_at < len(text) - 200, "First train should be parsed well before the stream ends"
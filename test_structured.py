@@ -0,0 +1,74 @@
+import asyncio
+import json
+import os
+
+import pytest
+from pydantic import ValidationError
+
+from models.models import FlightAvailability, TrainAvailability
+from models.validators import get_validator, validate_output
+
+FLIGHT = {"source": "Delhi", "destination": "Goa", "date": "2026-10-20", "cabin_class": "economy", "flights": []}
+
+
+def test_validate_output_dispatches_and_reuses_validators():
+    """Test that one cached validator turns fenced JSON text or dicts into the right model"""
+    assert isinstance(validate_output('```json\n{"source": "Delhi", "destination": "Mumbai", '
+                                      '"date": "2026-10-20", "class": "SL", "trains": []}\n```'), TrainAvailability)
+    assert isinstance(validate_output(FLIGHT), FlightAvailability)
+    assert get_validator(TrainAvailability) is get_validator(TrainAvailability)
+    with pytest.raises(ValidationError) as excinfo:
+        validate_output("Sorry, I could not find any trains.")
+    assert excinfo.value.errors()[0]["type"] == "json_invalid"
+
+
+def test_invalid_structured_output_gets_one_repair_pass():
+    """Test that prose around the JSON is repaired once instead of failing the request"""
+    os.environ.setdefault("OPENAI_API_KEY", "offline-benchmark")
+    import railway_agent_openai_without_websearch as offline
+    from benchmark import install_fake_provider, uninstall_fake_provider
+
+    model = install_fake_provider(latency_ms=0, invalid_rate=1.0)
+    try:
+        response = asyncio.run(offline.railway_agent("any way to reach Pune starting at Mumbai?"))
+    finally:
+        uninstall_fake_provider()
+
+    assert "error" not in response
+    assert response["destination"] == "Pune"
+    assert model.turns == 3, "tool call, rejected answer, repair"
+
+
+def test_only_schema_failures_count_as_invalid_output():
+    """Test that invalid output is recognised by its cause, not by the SDK's message text"""
+    from agents.exceptions import ModelBehaviorError
+
+    from structured import is_invalid_output
+
+    def raised(cause, message="Model did not return valid output"):
+        try:
+            raise ModelBehaviorError(message) from cause
+        except ModelBehaviorError as e:
+            return e
+
+    with pytest.raises(ValidationError) as excinfo:
+        validate_output("Sorry, I could not find any trains.")
+    assert is_invalid_output(raised(excinfo.value))
+    assert is_invalid_output(raised(json.JSONDecodeError("Expecting value", "", 0)))
+    assert not is_invalid_output(raised(None, "Invalid JSON when parsing a tool name"))
+    assert not is_invalid_output(raised(KeyError("lookup_trains"), "Tool lookup_trains not found"))
+
+
+def test_rejected_text_comes_from_the_validation_error():
+    """Test that the repair prompt quotes the rejected reply from the cause's input, not the SDK message"""
+    from agents.exceptions import ModelBehaviorError
+
+    from structured import _rejected_text
+
+    reply = "Sorry, I could not find any trains for TypeAdapter(x)."
+    with pytest.raises(ValidationError) as excinfo:
+        validate_output(reply)
+    try:
+        raise ModelBehaviorError("Model output was rejected") from excinfo.value
+    except ModelBehaviorError as e:
+        assert _rejected_text(e) == reply
@@ -0,0 +1,46 @@
+import mmap
+from datetime import date
+
+from timetable import DEFAULT_TIMETABLE_PATH, Timetable, compile_timetable, get_timetable, share_timetable
+
+CSV = """train_number,train_name,runs_on,stop_sequence,station_code,station_name,arrival,departure,day_offset,distance_km
+100,Night Mail,1000000,1,NDLS,New Delhi,,22:00,0,0
+100,Night Mail,1000000,2,KOTA,Kota Junction,03:00,03:10,1,465
+100,Night Mail,1000000,3,MMCT,Mumbai Central,12:00,,1,1384
+"""
+
+
+def test_intermediate_stops_are_indexed(tmp_path):
+    """Test that boarding or alighting at an intermediate stop is found via the memory-mapped file"""
+    path = tmp_path / "mini.ttb"
+    path.write_bytes(compile_timetable(CSV))
+    timetable = Timetable.open(str(path))
+    trains = timetable.lookup_trains({"source": "Kota", "destination": "Mumbai", "class": "SL"})
+    assert [t["train_number"] for t in trains] == ["100"]
+    assert trains[0]["departure"] == "03:10"
+    assert trains[0]["duration"] == "8h 50m"
+    assert trains[0]["fare"] == round((1384 - 465) * 0.45)
+
+
+def test_running_days_follow_the_origin_date():
+    """Test that a Monday-night train is found on Tuesday at a next-day stop only"""
+    timetable = Timetable(compile_timetable(CSV))
+    kota, mumbai = timetable.station_index("KOTA"), timetable.station_index("MMCT")
+    assert timetable.find_trains([kota], [mumbai], date(2026, 10, 20)), "Tuesday boarding at Kota should run"
+    assert not timetable.find_trains([kota], [mumbai], date(2026, 10, 19)), "Monday boarding at Kota should not"
+
+
+def test_known_place_without_station_has_no_trains():
+    """Test that Leh resolves as a place with no trains while free text is unknown"""
+    timetable = Timetable.from_csv(DEFAULT_TIMETABLE_PATH)
+    assert timetable.lookup_trains({"source": "Delhi", "destination": "Leh"}) == []
+    assert timetable.lookup_trains({"source": "Delhi", "destination": "Nowhere Town"}) is None
+
+
+def test_shared_timetable_is_one_anonymous_mapping(monkeypatch):
+    """Test that share_timetable compiles the CSV into a shared mapping that get_timetable returns"""
+    monkeypatch.setattr("timetable._timetable", None)
+    monkeypatch.delenv("TIMETABLE_PATH", raising=False)
+    shared = share_timetable()
+    assert isinstance(shared._buffer, mmap.mmap) and get_timetable() is shared
+    assert shared.lookup_trains({"source": "Delhi", "destination": "Leh"}) == []
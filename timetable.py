@@ -0,0 +1,342 @@
+import argparse
+import csv
+import io
+import json
+import mmap
+import os
+import struct
+import time
+from array import array
+from bisect import bisect_left, bisect_right
+from datetime import date
+from typing import Any, Dict, List, Optional, Tuple
+
+from gazetteer import get_gazetteer
+
+# -------------------------------
+# Offline timetable engine
+# -------------------------------
+# A CSV of stop times (one row per train per stop) is compiled into a compact
+# columnar file: fixed-width arrays for every stop plus a sorted
+# (from_station, to_station) pair index covering intermediate stops. The
+# file is memory-mapped, so route lookups are a binary search over shared
+# read-only pages and cost microseconds.
+
+MAGIC = b"TTB1"
+DEFAULT_TIMETABLE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "timetable.csv")
+MINUTES_PER_DAY = 24 * 60
+
+# Approximate fare per km by class, with a floor per ticket
+FARE_PER_KM = {"1A": 3.0, "2A": 1.8, "3A": 1.25, "SL": 0.45, "CC": 1.0, "2S": 0.3}
+MIN_FARE = 60
+OFFLINE_AVAILABILITY = "Unknown"
+
+# name -> typecode of each section, in file order
+SECTIONS = (
+    ("trip_offsets", "I"),   # first stop index of each trip (+1 sentinel)
+    ("trip_runs_on", "B"),   # weekday bitmask, bit 0 = Monday
+    ("stop_station", "I"),
+    ("stop_arrival", "i"),   # minutes since 00:00 of the origin day (-1 = none)
+    ("stop_departure", "i"),
+    ("stop_distance", "i"),  # km from origin
+    ("pair_keys", "I"),      # from_station * n_stations + to_station, sorted
+    ("pair_from_stop", "I"),
+    ("pair_to_stop", "I"),
+)
+
+
+def _minutes(value: str, day_offset: int) -> int:
+    if not value:
+        return -1
+    hours, minutes = value.split(":")
+    return day_offset * MINUTES_PER_DAY + int(hours) * 60 + int(minutes)
+
+
+def _clock(minutes: int) -> str:
+    minutes %= MINUTES_PER_DAY
+    return f"{minutes // 60:02d}:{minutes % 60:02d}"
+
+
+def _duration(minutes: int) -> str:
+    return f"{minutes // 60}h {minutes % 60:02d}m"
+
+
+def compile_timetable(csv_text: str) -> bytes:
+    """Compile stop-time CSV text into the binary columnar format."""
+    rows = sorted(
+        csv.DictReader(io.StringIO(csv_text)),
+        key=lambda row: (row["train_number"], int(row["stop_sequence"])),
+    )
+    station_codes: List[str] = []
+    station_names: List[str] = []
+    station_index: Dict[str, int] = {}
+    trip_numbers: List[str] = []
+    trip_names: List[str] = []
+    columns = {name: array(typecode) for name, typecode in SECTIONS}
+
+    previous_train = None
+    last_time = -1
+    for row in rows:
+        code = row["station_code"].strip().upper()
+        if code not in station_index:
+            station_index[code] = len(station_codes)
+            station_codes.append(code)
+            station_names.append(row["station_name"].strip())
+        if row["train_number"] != previous_train:
+            previous_train = row["train_number"]
+            trip_numbers.append(row["train_number"])
+            trip_names.append(row["train_name"])
+            columns["trip_offsets"].append(len(columns["stop_station"]))
+            columns["trip_runs_on"].append(
+                sum(1 << day for day, flag in enumerate(row["runs_on"].strip()) if flag == "1")
+            )
+            last_time = -1
+        day = int(row["day_offset"] or 0)
+        arrival = _minutes(row["arrival"].strip(), day)
+        departure = _minutes(row["departure"].strip(), day)
+        for stamp in (arrival, departure):
+            if stamp != -1:
+                if stamp < last_time:
+                    raise ValueError(f"Train {row['train_number']} goes back in time at {code}")
+                last_time = stamp
+        columns["stop_station"].append(station_index[code])
+        columns["stop_arrival"].append(arrival)
+        columns["stop_departure"].append(departure)
+        columns["stop_distance"].append(int(row["distance_km"] or 0))
+    columns["trip_offsets"].append(len(columns["stop_station"]))
+
+    n_stations = len(station_codes)
+    if n_stations * n_stations >= 2 ** 32:
+        raise ValueError("Too many stations for 32-bit pair keys")
+
+    pairs: List[Tuple[int, int, int, int]] = []
+    offsets = columns["trip_offsets"]
+    for trip in range(len(trip_numbers)):
+        start, end = offsets[trip], offsets[trip + 1]
+        for board in range(start, end - 1):
+            if columns["stop_departure"][board] == -1:
+                continue
+            for alight in range(board + 1, end):
+                if columns["stop_arrival"][alight] == -1:
+                    continue
+                key = columns["stop_station"][board] * n_stations + columns["stop_station"][alight]
+                pairs.append((key, columns["stop_departure"][board] % MINUTES_PER_DAY, board, alight))
+    pairs.sort()
+    for key, _, board, alight in pairs:
+        columns["pair_keys"].append(key)
+        columns["pair_from_stop"].append(board)
+        columns["pair_to_stop"].append(alight)
+
+    body = io.BytesIO()
+    layout = {}
+    for name, _ in SECTIONS:
+        data = columns[name].tobytes()
+        layout[name] = [body.tell(), len(columns[name])]
+        body.write(data)
+        body.write(b"\0" * (-body.tell() % 4))
+
+    header = json.dumps({
+        "station_codes": station_codes,
+        "station_names": station_names,
+        "trip_numbers": trip_numbers,
+        "trip_names": trip_names,
+        "sections": layout,
+    }).encode("utf-8")
+    header += b" " * (-(len(header) + 8) % 4)
+    return MAGIC + struct.pack("<I", len(header)) + header + body.getvalue()
+
+
+class Timetable:
+    """Read-only view over a compiled timetable (bytes or a memory-mapped file)."""
+
+    def __init__(self, buffer, source: str = "") -> None:
+        self.source = source
+        self._buffer = buffer
+        view = memoryview(buffer)
+        if bytes(view[:4]) != MAGIC:
+            raise ValueError(f"{source or 'buffer'} is not a compiled timetable")
+        (header_length,) = struct.unpack("<I", view[4:8])
+        header = json.loads(bytes(view[8:8 + header_length]))
+        body = 8 + header_length
+
+        self.station_codes: List[str] = header["station_codes"]
+        self.station_names: List[str] = header["station_names"]
+        self.trip_numbers: List[str] = header["trip_numbers"]
+        self.trip_names: List[str] = header["trip_names"]
+        self._station_index = {code: index for index, code in enumerate(self.station_codes)}
+        self._names = {name.lower(): index for index, name in enumerate(self.station_names)}
+        for name, typecode in SECTIONS:
+            offset, length = header["sections"][name]
+            size = array(typecode).itemsize
+            section = view[body + offset:body + offset + length * size].cast(typecode)
+            setattr(self, name, section)
+        self.n_stations = len(self.station_codes)
+
+    @classmethod
+    def from_csv(cls, path: str) -> "Timetable":
+        with open(path, encoding="utf-8") as f:
+            return cls(compile_timetable(f.read()), source=path)
+
+    @classmethod
+    def open(cls, path: str) -> "Timetable":
+        """Memory-map a compiled .ttb file (pages are shared between processes)."""
+        with open(path, "rb") as f:
+            mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        return cls(mapped, source=path)
+
+    @classmethod
+    def load(cls, path: str) -> "Timetable":
+        return cls.from_csv(path) if path.endswith(".csv") else cls.open(path)
+
+    # -------------------------------
+    # Lookups
+    # -------------------------------
+    def station_index(self, code: str) -> Optional[int]:
+        return self._station_index.get(code.upper())
+
+    def resolve_stations(self, name: str, code: str = "") -> Optional[List[int]]:
+        """Station indexes for a place: its city's stations, a code, or a station name.
+
+        Returns [] for places known to have no station here (e.g. Leh) and
+        None when the place is not recognised at all.
+        """
+        place = get_gazetteer().lookup(code) if code else None
+        place = place or (get_gazetteer().lookup(name) if name else None)
+        if place is not None:
+            return [self._station_index[c] for c in get_gazetteer().station_codes(place) if c in self._station_index]
+        cleaned = " ".join(name.split()).lower()
+        direct = self.station_index(code or cleaned)
+        if direct is not None:
+            return [direct]
+        matches = [index for station, index in self._names.items()
+                   if station == cleaned or station.startswith(cleaned + " ")]
+        return matches or None
+
+    def trips_between(self, from_station: int, to_station: int) -> List[Tuple[int, int]]:
+        """(boarding stop, alighting stop) for every train serving the pair, by departure time."""
+        key = from_station * self.n_stations + to_station
+        low = bisect_left(self.pair_keys, key)
+        high = bisect_right(self.pair_keys, key, low)
+        return [(self.pair_from_stop[i], self.pair_to_stop[i]) for i in range(low, high)]
+
+    def trip_of_stop(self, stop: int) -> int:
+        return bisect_right(self.trip_offsets, stop) - 1
+
+    def runs_on(self, trip: int, board_stop: int, travel_date: date) -> bool:
+        # The train leaves its origin `day` days before it reaches the boarding stop
+        day = self.stop_departure[board_stop] // MINUTES_PER_DAY
+        origin_weekday = (travel_date.weekday() - day) % 7
+        return bool(self.trip_runs_on[trip] >> origin_weekday & 1)
+
+    def train_info(self, board: int, alight: int, travel_class: str = "3A") -> Dict[str, Any]:
+        trip = self.trip_of_stop(board)
+        departure = self.stop_departure[board]
+        arrival = self.stop_arrival[alight]
+        distance = self.stop_distance[alight] - self.stop_distance[board]
+        rate = FARE_PER_KM.get(travel_class, FARE_PER_KM["3A"])
+        return {
+            "train_number": self.trip_numbers[trip],
+            "train_name": self.trip_names[trip],
+            "departure": _clock(departure),
+            "arrival": _clock(arrival),
+            "duration": _duration(arrival - departure),
+            "availability": OFFLINE_AVAILABILITY,
+            "fare": max(MIN_FARE, round(distance * rate)),
+        }
+
+    def find_trains(
+        self,
+        from_stations: List[int],
+        to_stations: List[int],
+        travel_date: Optional[date] = None,
+        travel_class: str = "3A",
+    ) -> List[Dict[str, Any]]:
+        """TrainInfo-shaped dicts for every direct train between any of the stations."""
+        found = []
+        for from_station in from_stations:
+            for to_station in to_stations:
+                for board, alight in self.trips_between(from_station, to_station):
+                    if travel_date is not None and not self.runs_on(self.trip_of_stop(board), board, travel_date):
+                        continue
+                    found.append((self.stop_departure[board] % MINUTES_PER_DAY, board, alight))
+        found.sort()
+        return [self.train_info(board, alight, travel_class) for _, board, alight in found]
+
+    def lookup_trains(self, info: Dict[str, Any]) -> Optional[List[Dict[str, Any]]]:
+        """TrainLookup for the fast path; None when either place is unknown."""
+        from_stations = self.resolve_stations(info.get("source", ""), info.get("source_code", ""))
+        to_stations = self.resolve_stations(info.get("destination", ""), info.get("destination_code", ""))
+        if from_stations is None or to_stations is None:
+            return None
+        travel_date = None
+        if info.get("date"):
+            try:
+                travel_date = date.fromisoformat(info["date"])
+            except ValueError:
+                pass
+        return self.find_trains(from_stations, to_stations, travel_date, info.get("class", "3A"))
+
+
+_timetable: Optional[Timetable] = None
+
+
+def get_timetable() -> Timetable:
+    """Return the process-wide timetable (TIMETABLE_PATH, .csv or compiled .ttb)."""
+    global _timetable
+    if _timetable is None:
+        _timetable = Timetable.load(os.getenv("TIMETABLE_PATH", DEFAULT_TIMETABLE_PATH))
+    return _timetable
+
+
+def share_timetable() -> Timetable:
+    """Call before forking workers so they all read one copy of the timetable.
+
+    A compiled .ttb file is memory-mapped already. A .csv is compiled here
+    into an anonymous shared mapping, which children inherit without copying.
+    """
+    global _timetable
+    path = os.getenv("TIMETABLE_PATH", DEFAULT_TIMETABLE_PATH)
+    if not path.endswith(".csv"):
+        return get_timetable()
+    with open(path, encoding="utf-8") as f:
+        compiled = compile_timetable(f.read())
+    mapped = mmap.mmap(-1, len(compiled))
+    mapped.write(compiled)
+    _timetable = Timetable(mapped, source=path)
+    return _timetable
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Compile or query the offline timetable")
+    commands = parser.add_subparsers(dest="command", required=True)
+    compile_parser = commands.add_parser("compile", help="Compile a stop-times CSV to a .ttb file")
+    compile_parser.add_argument("csv_path")
+    compile_parser.add_argument("output")
+    query_parser = commands.add_parser("query", help="List direct trains between two places")
+    query_parser.add_argument("source")
+    query_parser.add_argument("destination")
+    query_parser.add_argument("--date", default=None)
+    query_parser.add_argument("--class", dest="travel_class", default="3A")
+    query_parser.add_argument("--timetable", default=os.getenv("TIMETABLE_PATH", DEFAULT_TIMETABLE_PATH))
+    args = parser.parse_args()
+
+    if args.command == "compile":
+        with open(args.csv_path, encoding="utf-8") as f:
+            compiled = compile_timetable(f.read())
+        with open(args.output, "wb") as f:
+            f.write(compiled)
+        print(f"✅ Wrote {len(compiled)} bytes to {args.output}")
+        return
+
+    timetable = Timetable.load(args.timetable)
+    info = {"source": args.source, "destination": args.destination,
+            "date": args.date or "", "class": args.travel_class}
+    started = time.perf_counter()
+    trains = timetable.lookup_trains(info)
+    elapsed_us = (time.perf_counter() - started) * 1_000_000
+    print(json.dumps({**info, "trains": trains or []}, indent=2))
+    print(f"⏱️  {elapsed_us:.0f} µs")
+
+
+if __name__ == "__main__":
+    main()
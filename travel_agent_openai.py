@@ -1,13 +1,38 @@
+import argparse
 import asyncio
 import os
 import json
 from datetime import datetime, timedelta
 from dotenv import load_dotenv
-from typing import Dict, Any, List
-from pydantic import ValidationError
-from agent_core import create_agent
-from agents import Runner
-from models.models import FlightAvailability, TrainAvailability
+from typing import TYPE_CHECKING, Dict, Any, AsyncIterator, List, Optional, Tuple
+from agent_core import (
+    create_flight_agent, create_train_agent, extract_train_travel_info, flight_agent_input, flight_info_complete,
+    prompt_size, resolve_flight_info, train_agent_input,
+)
+import metrics
+from agent_registry import get_agent, get_run_config, shutdown
+from batch import add_batch_arguments, run_batch_cli
+from server import add_server_arguments, run_server_cli
+from startup import profile_startup
+from router import (
+    FLIGHT_MODE, TrainLookup, classify_mode, score_flight_query, score_train_query, try_fast_path,
+    try_flight_fast_path,
+)
+from models.modes import RESULT_FIELDS
+from providers import CACHE_MODES, get_provider_pool
+from flexible_dates import range_decision, search_dates
+from date_resolver import resolve_date_range
+from cache import ResultCache, get_result_cache, make_key
+from stages import stage
+from singleflight import get_single_flight, request_key
+from structured import run_structured
+from streaming import print_stream_event, response_events, stream_agent_events
+from session import Session, explicit_query, stream_in_session
+from prewarm import get_prewarmer
+from deadlines import budget_scope, degraded_response, stream_within_budget, within_budget
+
+if TYPE_CHECKING:
+    from agents import Agent
 
 # Load OpenAI key
 load_dotenv()
@@ -16,59 +41,273 @@ os.environ["OPENAI_API_KEY"] = os.getenv("OPENAI_API_KEY")
 # -------------------------------
 # Main Agent Logic
 # -------------------------------
-async def railway_agent(user_query: str) -> Dict[str, Any]:
-    agent = create_agent()
-    result = await Runner.run(agent, user_query)
-    output = result.final_output
+@metrics.traced("transport")
+async def railway_agent(user_query: str, train_lookup: Optional[TrainLookup] = None) -> Dict[str, Any]:
+    # ⏱️ Under a request budget, work still running near the deadline is cancelled for a local answer
+    cache = get_result_cache()
+    return await within_budget(answer_query(user_query, train_lookup, cache),
+                               lambda: degraded_answer(user_query, train_lookup, cache))
+
+async def answer_query(
+    user_query: str, train_lookup: Optional[TrainLookup], cache: ResultCache
+) -> Dict[str, Any]:
+    # ⚡ Confident queries answered by the cache (or another local source) skip the agent entirely
+    ranged = await date_range_answer(user_query, train_lookup, cache)
+    if ranged is not None:
+        return ranged
+
+    fast = local_answer(user_query, train_lookup, cache)
+    track_query(user_query, served_locally=fast is not None)
+    if fast is not None:
+        return fast
+
+    # 🔁 Equivalent queries already being answered share that agent run (and its web searches)
+    key = ("transport", request_key(user_query))
+    return await get_single_flight().do(key, lambda: run_agent(user_query, cache))
+
+def local_answer(
+    user_query: str, train_lookup: Optional[TrainLookup], cache: ResultCache
+) -> Optional[Dict[str, Any]]:
+    if classify_mode(user_query) == FLIGHT_MODE:
+        return try_flight_fast_path(user_query, cache.lookup_flights)
+    return try_fast_path(user_query, train_lookup or cache.lookup_trains)
+
+def track_query(user_query: str, served_locally: bool) -> None:
+    # 📈 Resolved queries feed the popularity tracker behind background prewarming
+    resolved = resolved_params(user_query)
+    if resolved is not None:
+        get_prewarmer().observe(*resolved, cached=served_locally)
+
+async def prewarm_refresh(mode: str, info: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    """Look up one hot combination the way a user query would; the response lands in the cache."""
+    cache = get_result_cache()
+    key = ("transport", make_key(CACHE_MODES[mode], info))
+    return await get_single_flight().do(
+        key, lambda: lookup_providers(mode, explicit_query(mode, info), info, cache))
+
+def select_agent(user_query: str) -> Tuple["Agent", str]:
+    """The slim train or flight agent for this query, and the input to run it with."""
+    mode = classify_mode(user_query)
+    if mode == FLIGHT_MODE:
+        agent, agent_input = get_agent("flight", create_flight_agent), user_query
+        with stage("extraction"):
+            info, resolution = resolve_flight_info(user_query)
+        # Only prompts the airport index cannot resolve leave extraction to the agent's tool
+        if flight_info_complete(info, resolution):
+            agent_input = flight_agent_input(user_query, info)
+    else:
+        # Train parameters are resolved here, so the agent needs no extraction tool turn
+        agent = get_agent("train", create_train_agent)
+        agent_input = train_agent_input(user_query, extract_train_travel_info(user_query))
+    if metrics.enabled():
+        size = prompt_size(agent, agent_input)
+        metrics.annotate(mode=mode, prompt=size)
+        metrics.observe("prompt_tokens_estimated", size["estimated_tokens"], mode=mode)
+    return agent, agent_input
+
+def resolved_params(user_query: str) -> Optional[Tuple[str, Dict[str, Any]]]:
+    """(mode, parameters) when the query resolves confidently, else None."""
+    mode = classify_mode(user_query)
+    decision = score_flight_query(user_query) if mode == FLIGHT_MODE else score_train_query(user_query)
+    return (mode, decision.info) if decision.is_confident() else None
+
+async def provider_answer(user_query: str, cache: ResultCache) -> Optional[Dict[str, Any]]:
+    # 🌐 Resolved queries go straight to the availability providers (hedged, with timeouts)
+    resolved = resolved_params(user_query)
+    if resolved is None:
+        return None
+    mode, info = resolved
+    return await lookup_providers(mode, user_query, info, cache)
+
+async def lookup_providers(
+    mode: str, user_query: str, info: Dict[str, Any], cache: ResultCache
+) -> Optional[Dict[str, Any]]:
+    found = await get_provider_pool().lookup(mode, user_query, info)
+    if found is None:
+        return None
+    metrics.annotate(providers=found.providers, provider_errors=found.errors)
+    # Schedule-only rows (offline timetable) are an answer, but never cached as availability
+    return finalize_output({**info, RESULT_FIELDS[mode]: found.results}, cache if found.live else None)
+
+async def date_range_answer(
+    user_query: str, train_lookup: Optional[TrainLookup], cache: ResultCache
+) -> Optional[Dict[str, Any]]:
+    # 📅 "this weekend" / "next week": one concurrent lookup per date, sharing cache, coalescing and providers
+    dates = resolve_date_range(user_query)
+    if not dates:
+        return None
+    decision = range_decision(user_query)
+    if not decision.is_confident():
+        return None
+    mode = classify_mode(user_query)
+    local = cache.lookup_flights if mode == FLIGHT_MODE else (train_lookup or cache.lookup_trains)
+
+    async def lookup(info: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        with stage("lookup"):
+            results = local(info)
+        if results is not None:
+            return finalize_output({**info, RESULT_FIELDS[mode]: results}, None)
+        key = ("transport", make_key(CACHE_MODES[mode], info))
+        return await get_single_flight().do(key, lambda: lookup_providers(mode, user_query, info, cache))
+
+    return await search_dates(dates, decision.info, lookup)
+
+async def degraded_answer(
+    user_query: str, train_lookup: Optional[TrainLookup], cache: ResultCache
+) -> Optional[Dict[str, Any]]:
+    """Locally extracted parameters with cached (possibly expired) or offline timetable results."""
+    from timetable import get_timetable
+
+    mode = classify_mode(user_query)
+    offline = train_lookup or get_timetable().lookup_trains
+    dates = resolve_date_range(user_query)
+    decision = range_decision(user_query) if dates else (
+        score_flight_query(user_query) if mode == FLIGHT_MODE else score_train_query(user_query))
+    if not decision.info.get("source") or not decision.info.get("destination"):
+        return None
+    if not dates:
+        return degraded_response(mode, decision.info, cache, offline)
+
+    async def lookup(info: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        return degraded_response(mode, info, cache, offline)
+
+    ranged = await search_dates(dates, decision.info, lookup)
+    return {**ranged, "partial": True, "stale": any(r.get("stale") for r in ranged["by_date"].values())}
+
+async def run_agent(user_query: str, cache: ResultCache) -> Dict[str, Any]:
+    response = await provider_answer(user_query, cache)
+    if response is not None:
+        return response
+    agent, agent_input = select_agent(user_query)
+    output = await run_structured(agent, agent_input, get_run_config(), metrics.run_hooks())
+    return finalize_output(output, cache)
+
+@metrics.traced("transport_stream")
+async def stream_railway_agent(
+    user_query: str, train_lookup: Optional[TrainLookup] = None
+) -> AsyncIterator[Dict[str, Any]]:
+    """Streaming variant of railway_agent: yields progress events and records as they arrive."""
+    cache = get_result_cache()
+    events = stream_answer(user_query, train_lookup, cache)
+    async for event in stream_within_budget(events, lambda: degraded_answer(user_query, train_lookup, cache)):
+        yield event
+
+async def stream_answer(
+    user_query: str, train_lookup: Optional[TrainLookup], cache: ResultCache
+) -> AsyncIterator[Dict[str, Any]]:
+    fast = await date_range_answer(user_query, train_lookup, cache)
+    if fast is None:
+        fast = local_answer(user_query, train_lookup, cache)
+        track_query(user_query, served_locally=fast is not None)
+    if fast is not None:
+        for event in response_events(fast):
+            yield event
+        return
+
+    key = ("transport", request_key(user_query))
+    # Provider lookups return whole responses, so there is nothing to stream incrementally
+    if get_single_flight().in_flight(key) or resolved_params(user_query) is not None:
+        shared = await get_single_flight().do(key, lambda: run_agent(user_query, cache))
+        for event in response_events(shared):
+            yield event
+        return
+
+    agent, agent_input = select_agent(user_query)
+    async for event in stream_agent_events(agent, agent_input, run_config=get_run_config()):
+        if event["type"] == "final_output":
+            yield {"type": "done", "response": finalize_output(event["output"], cache)}
+        else:
+            yield event
+
+def finalize_output(output: Any, cache: Optional[ResultCache]) -> Dict[str, Any]:
+    # Structured runs hand back a validated model; text (a failed repair, or a model
+    # without structured output) goes through the same prebuilt validator from raw JSON
+    from pydantic import ValidationError
+    from models.validators import validate_output
+
+    try:
+        with stage("validation"):
+            response = validate_output(output).model_dump(by_alias=True)
+    except ValidationError as ve:
+        return invalid_output(output, ve)
+    if cache is not None:
+        cache.store_response(response)
+    return response
+
+def invalid_output(output: Any, error: Any) -> Dict[str, Any]:
+    from models.validators import strip_code_fence
 
     if isinstance(output, str):
-        output = output.strip()
-        if output.startswith("```json"):
-            output = output.replace("```json", "").replace("```", "").strip()
-        elif output.startswith("```"):
-            output = output.replace("```", "").strip()
-
-        try:
-            output = json.loads(output)
-        except json.JSONDecodeError:
+        if error.errors()[0]["type"] == "json_invalid":
             print("🔴 Agent returned plain text:\n", output)
+            metrics.inc("plain_text_fallbacks_total")
             return {
                 "error": "Agent did not return valid JSON.",
                 "raw_output": output
             }
+        output = json.loads(strip_code_fence(output))
 
-    # Determine if it's a train response or flight response based on known fields
-    if isinstance(output, dict):
-        if "trains" in output:
-            try:
-                validated = TrainAvailability.parse_obj(output)
-                return validated.dict(by_alias=True)
-            except ValidationError as ve:
-                print("❌ Train validation error:", ve)
-            return {"error": "Invalid train response", "raw_output": output}
-        elif "flights" in output:
-            try:
-                validated = FlightAvailability.parse_obj(output)
-                return validated.dict(by_alias=True)
-            except ValidationError as ve:
-                print("❌ Flight validation error:", ve)
-            return {"error": "Invalid flight response", "raw_output": output}
-        else:
-            return {"error": "Unknown response format", "raw_output": output}
-    else:
+    # Determine if it was meant as a train response or flight response based on known fields
+    if not isinstance(output, dict):
         return {"error": "Agent returned non-dict output", "raw_output": output}
+    if "trains" in output:
+        print("❌ Train validation error:", error)
+        metrics.inc("validation_failures_total", kind="train")
+        return {"error": "Invalid train response", "raw_output": output}
+    if "flights" in output:
+        print("❌ Flight validation error:", error)
+        metrics.inc("validation_failures_total", kind="flight")
+        return {"error": "Invalid flight response", "raw_output": output}
+    return {"error": "Unknown response format", "raw_output": output}
 
 # -------------------------------
 # Manual CLI for Debugging
 # -------------------------------
 async def main():
     print("🧳 Travel Assistant 🧳")
-    while True:
-        query = input("\nAsk me about trains or flights (or type 'exit'): ")
-        if query.lower() in ["exit", "quit"]:
-            break
-        response = await railway_agent(query)
-        print(json.dumps(response, indent=2))
+    session = Session()
+    try:
+        while True:
+            query = input("\nAsk me about trains or flights (or type 'exit'): ")
+            if query.lower() in ["exit", "quit"]:
+                break
+            with budget_scope("chat"):
+                async for event in stream_in_session(session, query, stream_railway_agent):
+                    print_stream_event(event)
+    finally:
+        await shutdown()
+
+def cli() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--profile-startup", action="store_true",
+                        help="Print an import/warm-up time breakdown before starting")
+    subcommands = parser.add_subparsers(dest="command")
+    subcommands.add_parser("chat", help="Interactive prompt (default)")
+    add_batch_arguments(subcommands.add_parser("batch", help="Run queries from a JSONL file concurrently"))
+    serve = subcommands.add_parser("serve", help="Serve /trains, /flights and /stream over HTTP")
+    add_server_arguments(serve)
+    serve.add_argument("--prewarm", action="store_true", default=os.getenv("PREWARM_ENABLED", "0") == "1",
+                       help="Refresh the most requested routes in the background (PREWARM_* settings)")
+    args = parser.parse_args()
+
+    if args.profile_startup:
+        profile_startup()
+    if args.command != "serve":
+        # Server workers start their own endpoint after forking
+        metrics.maybe_serve_metrics()
+
+    if args.command == "batch":
+        async def run() -> None:
+            try:
+                await run_batch_cli(args, railway_agent)
+            finally:
+                await shutdown()
+        asyncio.run(run())
+    elif args.command == "serve":
+        background = [lambda: get_prewarmer().run(prewarm_refresh)] if args.prewarm else []
+        run_server_cli(args, railway_agent, stream_railway_agent, railway_agent, shutdown, background)
+    else:
+        asyncio.run(main())
 
 if __name__ == "__main__":
-    asyncio.run(main())
+    cli()